@@ -0,0 +1,52 @@
+"""
+Bytes on the wire and CPU cost of compressing contact list responses of different sizes,
+for the gzip levels and Brotli qualities accepted by ``CompressionMiddleware``.
+Use it to choose ``COMPRESSION_MINIMUM_SIZE``, ``GZIP_LEVEL`` and ``BROTLI_QUALITY``::
+
+    python benchmarks/bench_compression.py --sizes 1 10 100 1000 10000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_serialization import make_contacts
+from src.middleware.compression import BrotliCompressor, GzipCompressor, brotli
+from src.schemas import contact_list_adapter
+
+
+def compress(compressor, body: bytes) -> bytes:
+    return compressor.compress(body) + compressor.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--gzip-levels", type=int, nargs="+", default=[1, 6, 9])
+    parser.add_argument("--brotli-qualities", type=int, nargs="+", default=[1, 4, 6, 11])
+    args = parser.parse_args()
+
+    codecs = [(f"gzip-{level}", lambda level=level: GzipCompressor(level)) for level in args.gzip_levels]
+    if brotli is not None:
+        codecs += [(f"br-{quality}", lambda quality=quality: BrotliCompressor(quality))
+                   for quality in args.brotli_qualities]
+    else:
+        print("brotli is not installed, only gzip is measured\n")
+
+    print(f"{'items':>6} {'codec':<8} {'raw bytes':>10} {'wire bytes':>10} {'ratio':>6} {'ms/resp':>8} {'MB/s':>7}")
+    for size in args.sizes:
+        body = contact_list_adapter.dump_json(
+            contact_list_adapter.validate_python(make_contacts(size), from_attributes=True))
+        for name, factory in codecs:
+            wire = len(compress(factory(), body))
+            timer = timeit.Timer(lambda: compress(factory(), body))
+            number, seconds = timer.autorange()
+            per_response = min(timer.repeat(repeat=3, number=number)) / number
+            print(f"{size:>6} {name:<8} {len(body):>10} {wire:>10} {len(body) / wire:6.1f} "
+                  f"{per_response * 1000:8.3f} {len(body) / per_response / 1e6:7.1f}")
+
+
+if __name__ == "__main__":
+    main()
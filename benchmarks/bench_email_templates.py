@@ -0,0 +1,60 @@
+"""
+Rendering speed of the confirmation email template:
+
+* ``per message`` - what ``send_email`` did with fastapi-mail: a new Jinja environment and a fresh template
+  compile for every email;
+* ``cached`` - ``render`` of the shared, precompiled environment in ``src.services.email_templates``;
+* ``render_many`` - the bulk API for mass sends.
+
+Needs the settings of the project (.env)::
+
+    python benchmarks/bench_email_templates.py --count 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Environment, FileSystemLoader
+
+from src.services.email_templates import TEMPLATE_FOLDER, load_templates, render, render_many
+
+
+def contexts(count: int):
+    return ({"host": "http://localhost:8000/", "username": f"user{i}", "token": f"token{i}"} for i in range(count))
+
+
+def per_message(count: int):
+    for context in contexts(count):
+        Environment(loader=FileSystemLoader(TEMPLATE_FOLDER)).get_template("email_template.html").render(context)
+
+
+def cached(count: int):
+    for context in contexts(count):
+        render("email_template.html", **context)
+
+
+def bulk(count: int):
+    for _ in render_many("email_template.html", contexts(count)):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=10000, help="emails to render per method")
+    args = parser.parse_args()
+
+    load_templates()
+    print(f"{'method':<12} {'emails/s':>10} {'us/email':>9}")
+    for name, func in (("per message", per_message), ("cached", cached), ("render_many", bulk)):
+        count = args.count // 10 if func is per_message else args.count
+        start = time.perf_counter()
+        func(count)
+        seconds = time.perf_counter() - start
+        print(f"{name:<12} {count / seconds:10.0f} {seconds * 1e6 / count:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
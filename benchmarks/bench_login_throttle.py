@@ -0,0 +1,121 @@
+"""
+Load test of ``POST /api/auth/login`` under a credential-stuffing attack.
+
+Legitimate clients log in with their own passwords from their own IPs while attackers send wrong passwords
+for real and made-up accounts from a small pool of IPs. The app runs in-process on a temporary SQLite
+database with an in-memory Redis; the script prints the throughput of legitimate logins and of attack requests:
+
+* ``no attack`` - the baseline;
+* ``attack, no throttle`` - the allowances of ``LoginThrottle`` are so high that nobody is blocked, every
+  attack request costs a database query and a bcrypt check;
+* ``attack, throttle`` - attack IPs, and the targeted accounts for those IPs, are blocked after their allowance
+  and rejected with 429 before the database and bcrypt; logins into the targeted accounts are delayed, while
+  legitimate clients keep logging in from their own IPs. The IP allowance is lowered to ``--ip-free-attempts`` (10), so a short run
+  gets past it; the account allowance is ``LOGIN_ACCOUNT_FREE_ATTEMPTS``.
+
+Needs the settings of the project (.env)::
+
+    python benchmarks/bench_login_throttle.py --duration 20 --users 4 --attackers 32
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakeredis
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from main import app
+from src.database.db import get_db, get_read_db
+from src.conf.config import settings
+from src.database.models import Base, User
+from src.services.auth import auth_service
+from src.services.login_throttle import login_throttle
+
+
+def create_database(path: str, users: int, victims: int, password: str):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    hashed = auth_service.get_password_hash(password)
+    with session_factory() as db:
+        db.add_all(User(username=f"{kind}{i}", email=f"{kind}{i}@example.com", password=hashed, confirmed=True)
+                   for kind, count in (("user", users), ("victim", victims)) for i in range(count))
+        db.commit()
+    return session_factory
+
+
+async def legitimate(client: httpx.AsyncClient, i: int, password: str, deadline: float, statuses: Counter):
+    while time.monotonic() < deadline:
+        response = await client.post("/api/auth/login", data={"username": f"user{i}@example.com", "password": password},
+                                     headers={"X-Forwarded-For": f"192.168.0.{i}"})
+        statuses[response.status_code] += 1
+
+
+async def attacker(client: httpx.AsyncClient, victims: int, ips: int, deadline: float, statuses: Counter):
+    while time.monotonic() < deadline:
+        email = random.choice([f"victim{random.randrange(victims)}@example.com",
+                               f"nobody{random.randrange(10 ** 6)}@example.com"])
+        response = await client.post("/api/auth/login", data={"username": email, "password": "123456"},
+                                     headers={"X-Forwarded-For": f"10.0.0.{random.randrange(ips)}"})
+        statuses[response.status_code] += 1
+
+
+async def scenario(args, password: str, attackers: int) -> tuple[Counter, Counter]:
+    login_throttle.r.flushall()
+    legit, attack = Counter(), Counter()
+    deadline = time.monotonic() + args.duration
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await asyncio.gather(*(legitimate(client, i, password, deadline, legit) for i in range(args.users)),
+                             *(attacker(client, args.victims, args.attack_ips, deadline, attack)
+                               for _ in range(attackers)))
+    return legit, attack
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per scenario")
+    parser.add_argument("--users", type=int, default=4, help="concurrent legitimate clients")
+    parser.add_argument("--attackers", type=int, default=32, help="concurrent attack clients")
+    parser.add_argument("--victims", type=int, default=20, help="real accounts targeted by the attack")
+    parser.add_argument("--attack-ips", type=int, default=4, help="IPs the attack comes from")
+    parser.add_argument("--ip-free-attempts", type=int, default=10, help="failures allowed per IP")
+    args = parser.parse_args()
+
+    password = "correct horse battery staple"
+    with tempfile.TemporaryDirectory() as tmp:
+        session_factory = create_database(os.path.join(tmp, "bench.db"), args.users, args.victims, password)
+
+        async def override_get_db():  # асинхронна залежність - без пулу потоків, міряємо лише логін
+            with session_factory() as db:
+                yield db
+
+        app.dependency_overrides[get_db] = app.dependency_overrides[get_read_db] = override_get_db
+        # ASGITransport підключається з 127.0.0.1 - як наш проксі, тож IP клієнтів беруться з X-Forwarded-For
+        settings.trusted_proxies = ["127.0.0.1"]
+        fake_redis = fakeredis.FakeStrictRedis()
+        auth_service.r = login_throttle.r = fake_redis
+        allowances = {"account": login_throttle.free_attempts["account"], "ip": args.ip_free_attempts}
+        total_allowance = login_throttle.account_total_free_attempts
+
+        print(f"{'scenario':<22} {'logins/s':>9} {'attack req/s':>13}  attack statuses")
+        for name, attackers, throttled in (("no attack", 0, True), ("attack, no throttle", args.attackers, False),
+                                           ("attack, throttle", args.attackers, True)):
+            login_throttle.free_attempts = allowances if throttled else {kind: 10 ** 9 for kind in allowances}
+            login_throttle.account_total_free_attempts = total_allowance if throttled else 10 ** 9
+            legit, attack = asyncio.run(scenario(args, password, attackers))
+            print(f"{name:<22} {legit[200] / args.duration:9.1f} {sum(attack.values()) / args.duration:13.1f}  "
+                  f"{dict(sorted(attack.items()))}")
+
+
+if __name__ == "__main__":
+    main()
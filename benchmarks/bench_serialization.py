@@ -0,0 +1,70 @@
+"""
+Micro-benchmark of contact list serialization across response sizes:
+
+* ``fastapi default`` - what FastAPI does for ``response_model=List[ContactResponse]``:
+  per-item validation, ``jsonable_encoder`` and stdlib ``json``;
+* ``orjson response`` - the same validation and encoding, rendered by ``ORJSONResponse``;
+* ``type adapter`` - ``contact_list_adapter`` validation plus ``dump_json`` (what the contacts routes use).
+
+Runs without a database or settings file::
+
+    python benchmarks/bench_serialization.py --sizes 10 100 1000 10000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+
+from src.database.models import Contact
+from src.schemas import ContactResponse, contact_list_adapter
+
+
+def make_contacts(size: int) -> list[Contact]:
+    return [Contact(id=i, first_name=f"Name{i}", last_name=f"Last{i}", email=f"contact{i}@example.com",
+                    phone="+380501234567", birthday=date(1990, 1, 1 + i % 28),
+                    additional_info="Some street 1, Some city", created_at=datetime(2024, 1, 1, 12, 0),
+                    owner_id=1)
+            for i in range(size)]
+
+
+def fastapi_default(contacts):
+    validated = [ContactResponse.model_validate(contact) for contact in contacts]
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def orjson_response(contacts):
+    validated = [ContactResponse.model_validate(contact) for contact in contacts]
+    return ORJSONResponse(jsonable_encoder(validated)).body
+
+
+def type_adapter(contacts):
+    return contact_list_adapter.dump_json(contact_list_adapter.validate_python(contacts, from_attributes=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds to spend per measurement")
+    args = parser.parse_args()
+
+    print(f"{'items':>7} {'method':<16} {'ms/response':>12} {'us/item':>9}")
+    for size in args.sizes:
+        contacts = make_contacts(size)
+        for name, func in (("fastapi default", fastapi_default), ("orjson response", orjson_response),
+                           ("type adapter", type_adapter)):
+            timer = timeit.Timer(lambda: func(contacts))
+            number, _ = timer.autorange()
+            number = max(1, int(number * args.min_time / 0.2))
+            seconds = min(timer.repeat(repeat=3, number=number)) / number
+            print(f"{size:>7} {name:<16} {seconds * 1000:12.3f} {seconds * 1e6 / size:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
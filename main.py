@@ -1,13 +1,24 @@
-import redis.asyncio as redis
-from fastapi import FastAPI, Depends
-from fastapi_limiter import FastAPILimiter
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse # для обсл.favicon.ico
+import os
 
-from src.routes import contacts, auth, users
+from fastapi import FastAPI, Depends, Request, status
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse # для обсл.favicon.ico
+from fastapi.staticfiles import StaticFiles
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from src.middleware.admission import AdmissionMiddleware, admission_controller
+from src.middleware.compression import CompressionMiddleware
+from src.middleware.metrics import MetricsMiddleware
+from src.routes import contacts, auth, users, metrics
 from src.conf.config import settings
+from src.database.db import slow_query_log
+from src.services.metrics import instrumented_async_redis
+from src.services.rate_limit import rate_limit_backend
+from src.services.revocation import revocation_list
+from src.services.storage import shutdown_resize_pool
+from src.services.rate_limit_policy import rate_limit
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # щоб не випадало повідомлення "GET /favicon.ico HTTP/1.1" 404 Not Found:
 @app.get("/favicon.ico", include_in_schema=False)
@@ -27,7 +38,22 @@ origins = [
     "http://localhost:3000"
     ]
 
-# Додаємо CORSMiddleware у застосунок
+# Стискання відповідей (Brotli, якщо встановлено пакет brotli, інакше gzip)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    gzip_level=settings.gzip_level,
+    brotli_quality=settings.brotli_quality,
+)
+
+# Контроль допуску: обмежує кількість одночасних запитів і скидає низькопріоритетні при перевантаженні
+app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+
+# Метрики Prometheus (GET /api/metrics): зовнішніше за допуск, щоб латентність включала й чергу.
+# При DEBUG=True - ще й заголовки Server-Timing і попередження про N+1 запити
+app.add_middleware(MetricsMiddleware, debug=settings.debug, n_plus_one_threshold=settings.n_plus_one_threshold)
+
+# CORSMiddleware додаємо останнім - він зовнішній, тож заголовки CORS мають і відповіді 503 контролю допуску
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -40,31 +66,67 @@ app.add_middleware(
 app.include_router(auth.router, prefix='/api')
 app.include_router(contacts.router, prefix='/api') 
 app.include_router(users.router, prefix='/api')
+app.include_router(metrics.router, prefix='/api')
+
+if settings.avatar_storage == "local": # аватарки з локальної теки роздає сам застосунок
+    os.makedirs(settings.avatar_local_dir, exist_ok=True)
+    app.mount(settings.avatar_base_url, StaticFiles(directory=settings.avatar_local_dir), name="avatars")
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    """
+    Answers with 503 instead of 500 when no database connection became free within ``DB_POOL_TIMEOUT``.
+
+    :param request: The request that could not get a connection.
+    :type request: Request
+    :param exc: The pool timeout error.
+    :type exc: sqlalchemy.exc.TimeoutError
+    :return: A 503 response with a ``Retry-After`` header.
+    :rtype: JSONResponse
+    """
+    return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        content={"detail": "Database is busy, try again later"},
+                        headers={"Retry-After": "1"})
 
 @app.on_event("startup")
 async def startup():
     """
     Initializes the application on startup.
 
-    Connects to the Redis database and configures the FastAPILimiter for rate limiting.
+    Connects to the Redis database, starts the Redis sync of the in-process rate limiter and
+    the listener of revoked access tokens.
 
     :raises redis.exceptions.ConnectionError: If there is an issue connecting to Redis.
     """
     print("Attempting to connect to Redis...")
-    r = await redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0, encoding="utf-8",
-                          decode_responses=True)
+    r = instrumented_async_redis(host=settings.redis_host, port=settings.redis_port, db=0, encoding="utf-8",
+                                 decode_responses=True)
     print("Redis connection established.")
-    await FastAPILimiter.init(r)
-    print("FastAPILimiter initialized.")
+    await rate_limit_backend.init(r)
+    print("Rate limiter initialized.")
+    await revocation_list.init(r)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """
+    Reports the remaining rate-limit hits to Redis, stops the sync task, the revocation listener,
+    the avatar resize processes and the slow-query EXPLAIN thread.
+    """
+    await rate_limit_backend.close()
+    await revocation_list.close()
+    shutdown_resize_pool()
+    slow_query_log.close()
 
 
-@app.get("/") 
+@app.get("/", dependencies=[Depends(rate_limit("root"))])
 async def root():
     """
     Root endpoint of the application.
 
     Provides a welcome message for users visiting the base URL. 
-    Available 2 times per 5 second as limit maximum.
+    Rate-limited by the "root" policy (2 requests per 5 seconds by default).
 
     :return: A dictionary with a welcome message.
     :rtype: dict
@@ -0,0 +1,120 @@
+"""Contacts hash partitioning
+
+Optional migration: re-creates the ``contacts`` table as a PostgreSQL table
+partitioned by ``HASH (owner_id)``. It only does anything when a partition count
+of 2 or more is configured, either through ``CONTACTS_PARTITIONS`` in ``.env`` or
+on the command line::
+
+    alembic -x contacts_partitions=16 upgrade head
+
+For other databases, or with the default ``CONTACTS_PARTITIONS=0``, the migration is a no-op.
+
+Partitioned tables need the partition key in every unique index, so the primary key
+becomes ``(id, owner_id)`` and contact emails are unique per owner instead of
+across the whole table. ``owner_id`` becomes NOT NULL: the upgrade stops with an error
+while contacts without an owner exist - assign or delete them first.
+
+The downgrade restores a plain table, but ``ix_contacts_email`` is re-created as a
+non-unique index, because after the upgrade two owners may have contacts with the same email.
+
+Revision ID: 7c2e5d1f9a04
+Revises: 4bf22d83cea2
+Create Date: 2026-10-19 10:12:41.530219
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+from src.conf.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e5d1f9a04'
+down_revision: Union[str, None] = '4bf22d83cea2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "id, first_name, last_name, email, phone, birthday, additional_info, created_at, owner_id"
+
+
+def _partitions() -> int:
+    return int(context.get_x_argument(as_dictionary=True).get("contacts_partitions", settings.contacts_partitions))
+
+
+def _is_partitioned() -> bool:
+    return bool(op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'contacts'::regclass"
+    )).scalar())
+
+
+def upgrade() -> None:
+    partitions = _partitions()
+    if op.get_bind().dialect.name != "postgresql" or partitions < 2 or _is_partitioned():
+        return
+
+    ownerless = op.get_bind().execute(sa.text("SELECT count(*) FROM contacts WHERE owner_id IS NULL")).scalar()
+    if ownerless:
+        raise RuntimeError(f"{ownerless} contacts have no owner and cannot be placed in a partition; "
+                           f"assign them to a user or delete them, then run the migration again")
+
+    op.execute("""
+        CREATE TABLE contacts_partitioned (
+            id INTEGER NOT NULL DEFAULT nextval('contacts_id_seq'),
+            first_name VARCHAR,
+            last_name VARCHAR,
+            email VARCHAR,
+            phone VARCHAR,
+            birthday DATE,
+            additional_info VARCHAR,
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            owner_id INTEGER NOT NULL REFERENCES users (id),
+            PRIMARY KEY (id, owner_id)
+        ) PARTITION BY HASH (owner_id)
+    """)
+    for remainder in range(partitions):
+        op.execute(f"CREATE TABLE contacts_p{remainder} PARTITION OF contacts_partitioned "
+                   f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})")
+
+    op.execute(f"INSERT INTO contacts_partitioned ({COLUMNS}) "
+               f"SELECT {COLUMNS} FROM contacts")
+    op.execute("ALTER SEQUENCE contacts_id_seq OWNED BY NONE")
+    op.drop_table('contacts')
+    op.rename_table('contacts_partitioned', 'contacts')
+    op.execute("ALTER SEQUENCE contacts_id_seq OWNED BY contacts.id")
+
+    # індекси створюються на батьківській таблиці і автоматично - на кожній партиції
+    op.create_index('ix_contacts_owner_email', 'contacts', ['owner_id', 'email'], unique=True)
+    op.create_index('ix_contacts_owner_first_name', 'contacts', ['owner_id', 'first_name'], unique=False)
+    op.create_index('ix_contacts_owner_last_name', 'contacts', ['owner_id', 'last_name'], unique=False)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql" or not _is_partitioned():
+        return
+
+    op.create_table('contacts_heap',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('contacts_id_seq')"), nullable=False),
+    sa.Column('first_name', sa.String(), nullable=True),
+    sa.Column('last_name', sa.String(), nullable=True),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('phone', sa.String(), nullable=True),
+    sa.Column('birthday', sa.Date(), nullable=True),
+    sa.Column('additional_info', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('owner_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(f"INSERT INTO contacts_heap ({COLUMNS}) SELECT {COLUMNS} FROM contacts")
+    op.execute("ALTER SEQUENCE contacts_id_seq OWNED BY NONE")
+    op.drop_table('contacts')  # партиції видаляються разом з батьківською таблицею
+    op.rename_table('contacts_heap', 'contacts')
+    op.execute("ALTER SEQUENCE contacts_id_seq OWNED BY contacts.id")
+
+    # не унікальний: після upgrade однаковий email можуть мати контакти різних власників
+    op.create_index(op.f('ix_contacts_email'), 'contacts', ['email'], unique=False)
+    op.create_index(op.f('ix_contacts_first_name'), 'contacts', ['first_name'], unique=False)
+    op.create_index(op.f('ix_contacts_id'), 'contacts', ['id'], unique=False)
+    op.create_index(op.f('ix_contacts_last_name'), 'contacts', ['last_name'], unique=False)
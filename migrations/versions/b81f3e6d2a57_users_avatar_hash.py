@@ -0,0 +1,28 @@
+"""Users avatar hash
+
+Revision ID: b81f3e6d2a57
+Revises: 9d4b6a2c8e13
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81f3e6d2a57'
+down_revision: Union[str, None] = '9d4b6a2c8e13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('avatar_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_users_avatar_hash'), 'users', ['avatar_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_users_avatar_hash'), table_name='users')
+    op.drop_column('users', 'avatar_hash')
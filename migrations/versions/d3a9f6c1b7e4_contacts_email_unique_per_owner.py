@@ -0,0 +1,48 @@
+"""Contacts email unique per owner
+
+Replaces the global unique ``ix_contacts_email`` with the unique ``(owner_id, email)`` index,
+which the hash-partitioned table (7c2e5d1f9a04) already has. A partitioned table is left as is.
+
+The downgrade re-creates ``ix_contacts_email`` as a non-unique index: by then two owners
+may have contacts with the same email.
+
+Revision ID: d3a9f6c1b7e4
+Revises: b81f3e6d2a57
+Create Date: 2026-10-20 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a9f6c1b7e4'
+down_revision: Union[str, None] = 'b81f3e6d2a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _indexes() -> set[str]:
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes('contacts')}
+
+
+def upgrade() -> None:
+    indexes = _indexes()
+    if 'ix_contacts_owner_email' in indexes:  # партиційована таблиця
+        return
+    if 'ix_contacts_email' in indexes:
+        op.drop_index(op.f('ix_contacts_email'), table_name='contacts')
+    op.create_index('ix_contacts_owner_email', 'contacts', ['owner_id', 'email'], unique=True)
+
+
+def downgrade() -> None:
+    indexes = _indexes()
+    if 'ix_contacts_owner_email' not in indexes:
+        return
+    if op.get_bind().dialect.name == "postgresql" and op.get_bind().execute(sa.text(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'contacts'::regclass")).scalar():
+        return  # індекс належить партиціюванню, його прибирає downgrade 7c2e5d1f9a04
+    op.drop_index('ix_contacts_owner_email', table_name='contacts')
+    op.create_index(op.f('ix_contacts_email'), 'contacts', ['email'], unique=False)
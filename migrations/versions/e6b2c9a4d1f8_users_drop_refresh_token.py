@@ -0,0 +1,28 @@
+"""Users drop refresh token
+
+Refresh tokens live in Redis as token families, the column is no longer read or written.
+
+Revision ID: e6b2c9a4d1f8
+Revises: d3a9f6c1b7e4
+Create Date: 2026-10-20 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b2c9a4d1f8'
+down_revision: Union[str, None] = 'd3a9f6c1b7e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_column('users', 'refresh_token')
+
+
+def downgrade() -> None:
+    op.add_column('users', sa.Column('refresh_token', sa.String(length=225), nullable=True))
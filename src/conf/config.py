@@ -1,6 +1,20 @@
-from pydantic import EmailStr
+from pydantic import BaseModel, EmailStr
 from pydantic_settings import BaseSettings
 
+
+class RateLimitPolicy(BaseModel):
+    times: int # запитів за вікно
+    seconds: int # довжина вікна
+    burst: int = 0 # скільки запитів понад times можна зробити одразу (розмір сплеску)
+
+
+class JwtKey(BaseModel):
+    kid: str # id ключа в заголовку токена
+    algorithm: str = 'HS256' # HS256, ES256, RS256...
+    key: str | None = None # секрет (HS*) або приватний ключ PEM; без нього ключ лише перевіряє підписи
+    public_key: str | None = None # публічний ключ PEM (ES*/RS*), якщо key не заданий
+
+
 class Settings(BaseSettings):
     sqlalchemy_database_url: str
     postgres_db: str
@@ -21,7 +35,74 @@ class Settings(BaseSettings):
     cloudinary_name: str
     cloudinary_api_key: str
     cloudinary_api_secret: str
-    
+    avatar_storage: str = 'cloudinary' # де зберігати аватарки: cloudinary або local
+    avatar_local_dir: str = 'media' # тека для аватарок при AVATAR_STORAGE=local
+    avatar_base_url: str = '/media' # звідки роздаються аватарки при AVATAR_STORAGE=local
+    avatar_resize_workers: int = 2 # скільки процесів зменшують завантажені аватарки
+    avatar_max_bytes: int = 5 * 1024 * 1024 # максимальний розмір файлу аватарки
+    avatar_variant_sizes: list[int] = [32, 64, 128, 250] # розміри аватарок (px), які отримують клієнти
+    debug: bool = False # заголовки Server-Timing і попередження про N+1 запити (не для продакшену)
+    n_plus_one_threshold: int = 5 # скільки разів той самий SQL в одному запиті вважається N+1
+    slow_query_threshold_ms: float = 200 # SQL, довший за цей час, потрапляє в журнал повільних запитів
+    slow_query_sample_rate: float = 1.0 # частка повільних запитів, що записуються; 0 - журнал вимкнено
+    slow_query_explain_first: int = 3 # для скількох перших повторів одного запиту знімати EXPLAIN
+    slow_query_log_size: int = 100 # скільки останніх повільних запитів тримати в пам'яті
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 10 # скільки секунд запит чекає на вільне з'єднання, далі - 503
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    sqlalchemy_replica_url: str | None = None # опціональна репліка для запитів на читання
+    replica_sticky_seconds: int = 5 # скільки секунд після запису клієнт читає з основної бази
+    compression_minimum_size: int = 1000 # відповіді менші за цей розмір (байт) не стискаються
+    gzip_level: int = 6
+    brotli_quality: int = 4
+    rate_limit_overshoot: int = 5 # скільки запитів понад ліміт воркер може пропустити до синхронізації з Redis
+    rate_limit_sync_interval: float = 1.0 # як часто (секунд) локальні лічильники синхронізуються з Redis
+    trusted_proxies: list[str] = [] # IP/мережі проксі, яким довіряємо X-Forwarded-For; порожній - заголовок ігнорується
+    rate_limit_policies: dict[str, RateLimitPolicy] = { # ліміти для кожного юзера по роутах; JSON у .env
+        "root": RateLimitPolicy(times=2, seconds=5),
+        "contacts:list": RateLimitPolicy(times=10, seconds=60, burst=5),
+        "contacts:create": RateLimitPolicy(times=5, seconds=60, burst=2),
+    }
+    admission_max_in_flight: int = 64 # скільки запитів групи (auth, contacts, users) обробляється одночасно
+    admission_target_delay: float = 0.05 # при більшій затримці в черзі (с) низькопріоритетні запити отримують 503
+    admission_max_queue_time: float = 5.0 # максимальний час очікування в черзі (с), далі - 503
+    admission_low_priority: list[str] = ["/api/contacts/birthdays", "/api/users/avatar"]
+    email_template_cache_dir: str | None = None # тека для байткоду шаблонів листів (None - тимчасова тека системи)
+    mail_pool_size: int = 2 # скільки постійних SMTP-з'єднань тримає воркер
+    mail_batch_size: int = 20 # скільки листів відправляється через одне з'єднання за раз
+    mail_queue_size: int = 1000 # скільки листів може чекати в черзі, далі відправники чекають
+    mail_idle_timeout: float = 30 # через скільки секунд простою SMTP-з'єднання закривається
+    outbox_batch_size: int = 50 # скільки листів воркер outbox забирає за раз
+    outbox_poll_interval: float = 2.0 # пауза (с) між опитуваннями порожнього outbox
+    outbox_lease_seconds: int = 300 # через скільки секунд лист, що "завис" у воркера, забирається знову
+    outbox_max_attempts: int = 8 # після стількох невдалих спроб лист отримує статус failed
+    outbox_backoff_base: float = 30 # пауза (с) перед другою спробою, далі подвоюється
+    outbox_backoff_max: float = 3600 # максимальна пауза (с) між спробами
+    birthday_digest_days: int = 7 # за скільки днів наперед розсилка нагадує про дні народження
+    birthday_digest_chunk_size: int = 1000 # скільки власників контактів обробляється одним запитом
+    jwt_keys: list[JwtKey] = [] # кільце ключів підпису токенів; порожнє - один ключ SECRET_KEY/ALGORITHM
+    jwt_active_kid: str | None = None # яким ключем підписувати нові токени (None - першим з JWT_KEYS)
+    metrics_token: str = '' # bearer-токен для /api/metrics/* (Prometheus); порожній - доступ лише адмінам
+    admin_emails: list[str] = [] # юзери з доступом до службових даних /api/metrics/*
+    bcrypt_rounds: int = 12 # вартість bcrypt (2^rounds ітерацій); підбирається: python -m src.services.password_cost
+    login_account_free_attempts: int = 5 # скільки невдалих логінів в акаунт з однієї IP дозволено до блокування
+    login_ip_free_attempts: int = 50 # скільки невдалих логінів з однієї IP дозволено до блокування
+    login_account_total_free_attempts: int = 20 # скільки невдалих логінів в акаунт з усіх IP до сповільнення (не блокування)
+    login_account_delay_max: float = 5.0 # найдовша затримка (с) логіну в акаунт під розподіленою атакою
+    login_backoff_base: float = 1.0 # перше блокування (с), далі подвоюється з кожною невдачею
+    login_backoff_max: float = 900 # найдовше блокування (с)
+    login_failure_window: int = 3600 # через скільки секунд після останньої невдачі лічильник забувається
+    refresh_token_ttl: int = 7 * 24 * 3600 # скільки секунд живе refresh-токен (і сесія без оновлень)
+    revocation_bloom_capacity: int = 100000 # скільки відкликаних access-токенів очікуємо одночасно (розмір фільтра Блума)
+    revocation_bloom_error_rate: float = 0.001 # частка хибних спрацювань фільтра, для яких іде запит у Redis
+    revocation_rebuild_interval: float = 900 # як часто (с) фільтр перебудовується з Redis без прострочених id
+    user_cache_ttl: int = 900 # скільки секунд юзер живе в кеші Redis
+    user_cache_early_refresh_beta: float = 1.0 # як рано (ймовірнісно) оновлювати кеш до закінчення TTL; 0 - вимкнено
+    user_cache_lock_ms: int = 0 # короткий Redis-лок на завантаження юзера з бази між воркерами (0 - без лока)
+    contacts_partitions: int = 0 # кількість hash-партицій таблиці contacts за owner_id (0 - без партиціювання)
+
 
     class Config:
         env_file = ".env"
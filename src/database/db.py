@@ -1,18 +1,175 @@
-from sqlalchemy import create_engine
+import hashlib
+
+import redis
+from fastapi import Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from src.conf.config import settings
+from src.database.pool import instrument, pool_options
+from src.database.slow_queries import SlowQueryLog
+from src.services.metrics import instrumented_redis
 
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+slow_query_log = SlowQueryLog(settings.slow_query_threshold_ms / 1000, settings.slow_query_sample_rate,
+                              settings.slow_query_explain_first, settings.slow_query_log_size)
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **pool_options())
+instrument(engine)
+slow_query_log.attach(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Репліка для читання - опціональна, без SQLALCHEMY_REPLICA_URL всі запити йдуть на основну базу
+replica_engine = create_engine(settings.sqlalchemy_replica_url, **pool_options()) if settings.sqlalchemy_replica_url else None
+if replica_engine is not None:
+    instrument(replica_engine)
+    slow_query_log.attach(replica_engine, "replica")
+
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine) if replica_engine else None
+
+sticky_redis = instrumented_redis(host=settings.redis_host, port=settings.redis_port, db=0)
+
+
+def sticky_key(request: Request) -> str:
+    """
+    Builds the Redis key that marks a client as "recently wrote" for read-your-writes routing.
+
+    The client is identified by its Authorization header (one key per token), falling back to its IP address.
+
+    :param request: The incoming HTTP request.
+    :type request: Request
+    :return: The Redis key for the client.
+    :rtype: str
+    """
+    identity = request.headers.get("Authorization") or (request.client.host if request.client else "")
+    return "rw_sticky:" + hashlib.sha1(identity.encode()).hexdigest()
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def mark_write(session) -> None:
+    """
+    Marks the client of a committed primary session as sticky to the primary database
+    for ``settings.replica_sticky_seconds``, so its next reads see its own writes.
+
+    :param session: The committed session.
+    :type session: Session
+    """
+    key = session.info.get("sticky_key")
+    if key is None:
+        return
+    try:
+        sticky_redis.set(key, 1, ex=settings.replica_sticky_seconds)
+    except redis.RedisError as err:
+        print(err)
+
+
+def is_sticky(key: str) -> bool:
+    """
+    Checks whether the client wrote to the primary database within the stickiness window.
+
+    If Redis is unavailable the client is treated as sticky, so reads fall back to the primary.
+
+    :param key: The Redis key built by :func:`sticky_key`.
+    :type key: str
+    :return: True if reads should go to the primary database.
+    :rtype: bool
+    """
+    try:
+        return bool(sticky_redis.exists(key))
+    except redis.RedisError:
+        return True
+
+
+class LazySession:
+    """
+    Proxy that creates the real session on first use.
+
+    Requests whose dependencies never touch the database (for example, when ``get_current_user``
+    finds the user in the Redis cache) then skip session setup, teardown and the pool checkout.
+    """
+    def __init__(self, factory):
+        """
+        :param factory: Callable that returns the real session.
+        :type factory: Callable[[], Session]
+        """
+        self._factory = factory
+        self._session = None
+
+    @property
+    def started(self) -> bool:
+        """
+        True once the real session has been created.
+        """
+        return self._session is not None
+
+    def __getattr__(self, name):
+        if self._session is None:
+            self._session = self._factory()
+        return getattr(self._session, name)
+
+    def close(self) -> None:
+        """
+        Closes the real session if it was ever created.
+        """
+        if self._session is not None:
+            self._session.close()
+
+
+def _primary_session(request: Request):
+    # одна сесія основної бази на запит: get_db маршруту і get_read_db у get_current_user ділять її
+    db = getattr(request.state, "primary_session", None)
+    if db is None:
+        db = request.state.primary_session = SessionLocal()
+        if ReplicaSessionLocal is not None:
+            db.info["sticky_key"] = sticky_key(request)
+    return db
+
+
+def _read_session(request: Request):
+    if ReplicaSessionLocal is None:  # без репліки не питаємо Redis про "липкість"
+        return _primary_session(request)
+    if is_sticky(sticky_key(request)):
+        return _primary_session(request)
+    return ReplicaSessionLocal()
+
+
 # Dependency
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    """
+    Yields a lazily opened session bound to the primary database. Use it for requests that write.
+    The real session is shared with :func:`get_read_db` of the same request when that one reads from the primary.
+
+    :param request: The incoming HTTP request.
+    :type request: Request
+    :return: The primary database session.
+    :rtype: LazySession
+    """
+    db = LazySession(lambda: _primary_session(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Dependency
+def get_read_db(request: Request):
+    """
+    Yields a lazily opened session for read-only requests.
+
+    The session is bound to the read replica when ``SQLALCHEMY_REPLICA_URL`` is configured,
+    unless the same client wrote within the last ``REPLICA_STICKY_SECONDS``;
+    otherwise it is the primary session of the request (shared with :func:`get_db`).
+    The choice is made on first use; without a replica Redis is not asked.
+
+    :param request: The incoming HTTP request.
+    :type request: Request
+    :return: The read-only database session.
+    :rtype: LazySession
+    """
+    db = LazySession(lambda: _read_session(request))
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
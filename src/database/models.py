@@ -1,6 +1,8 @@
 # для створення таблиць у базі даних, тому всі поля мають бути описані саме для ств.таблиці
 
-from sqlalchemy import Column, Integer, String, Date, func, ForeignKey, Boolean
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Date, func, ForeignKey, Boolean, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.sqltypes import DateTime
 from sqlalchemy.ext.declarative import declarative_base
@@ -15,7 +17,7 @@ class Contact(Base):
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String, index=True)
     last_name = Column(String, index=True)
-    email = Column(String, unique=True, index=True)
+    email = Column(String)
     phone = Column(String)
     birthday = Column(Date)
     additional_info = Column(String, nullable=True)
@@ -24,6 +26,11 @@ class Contact(Base):
     owner_id = Column(Integer, ForeignKey('users.id'))  # додавання зовнішнього ключа для зв'язку з User
     owner = relationship("User", back_populates="contacts")  # зв'язок з юзерами
 
+    # owner_id входить в ідентичність об'єкта, тож refresh/delete/lazy load теж фільтрують за ключем партиції
+    __mapper_args__ = {"primary_key": [id, owner_id]}
+    # email унікальний в межах власника - як у партиційованій таблиці, де унікальний індекс містить owner_id
+    __table_args__ = (Index("ix_contacts_owner_email", "owner_id", "email", unique=True),)
+
     
 class User(Base): # створила для авторизації
     __tablename__ = "users"
@@ -34,7 +41,24 @@ class User(Base): # створила для авторизації
     password = Column(String(255), nullable=False)
     created_at = Column('created_at', DateTime, default=func.now())
     avatar = Column(String(225), nullable=True)
-    refresh_token = Column(String(225), nullable=True)
+    avatar_hash = Column(String(64), nullable=True, index=True)  # sha256 завантаженого файлу аватарки
     confirmed = Column(Boolean, default=False)
 
     contacts = relationship("Contact", back_populates="owner")
+
+
+class EmailOutbox(Base): # листи записуються в тій же транзакції, що й юзер; відправляє їх src/workers/outbox.py
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)  # який лист будувати, напр. "confirm_email"
+    recipient = Column(String(250), nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)  # дані для шаблону листа
+    status = Column(String(20), nullable=False, default="pending")  # pending / sending / sent / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.now)
+    last_error = Column(String, nullable=True)
+    created_at = Column('created_at', DateTime, default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),)
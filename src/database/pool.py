@@ -0,0 +1,167 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+from src.conf.config import settings
+from src.services.metrics import observe_query
+
+
+class PoolStats:
+    """
+    Collects connection pool saturation metrics: checkout wait time, checkouts,
+    timeouts and the current in-use / overflow counts of the pool.
+    """
+    WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(self.WAIT_BUCKETS) + 1)
+        self.in_use_peak = 0
+        self.overflow_peak = 0
+
+    def observe_checkout(self, pool) -> None:
+        """
+        Updates the in-use and overflow peaks after a connection was checked out.
+
+        :param pool: The pool the connection was checked out from.
+        :type pool: QueuePool
+        """
+        with self.lock:
+            self.in_use_peak = max(self.in_use_peak, pool.checkedout())
+            self.overflow_peak = max(self.overflow_peak, pool.overflow())
+
+    def observe_wait(self, seconds: float, timed_out: bool = False) -> None:
+        """
+        Records how long a checkout waited for a free connection.
+
+        :param seconds: The wait time in seconds.
+        :type seconds: float
+        :param timed_out: True if the checkout failed with a pool timeout.
+        :type timed_out: bool
+        """
+        index = next((i for i, bound in enumerate(self.WAIT_BUCKETS) if seconds <= bound), len(self.WAIT_BUCKETS))
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.wait_buckets[index] += 1
+
+    def snapshot(self, pool) -> dict:
+        """
+        Returns the collected metrics together with the current state of the pool.
+
+        :param pool: The pool the metrics belong to.
+        :type pool: QueuePool
+        :return: The metrics as a JSON-serializable dictionary.
+        :rtype: dict
+        """
+        with self.lock:
+            waits = self.checkouts + self.timeouts
+            buckets = {f"le_{bound}": count for bound, count in zip(self.WAIT_BUCKETS, self.wait_buckets)}
+            buckets["le_inf"] = self.wait_buckets[-1]
+            stats = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_avg": self.wait_total / waits if waits else 0.0,
+                "wait_seconds_max": self.wait_max,
+                "wait_seconds_buckets": buckets,
+                "in_use_peak": self.in_use_peak,
+                "overflow_peak": self.overflow_peak,
+            }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "in_use": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+            })
+        return stats
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that measures how long each checkout waits for a free connection.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.observe_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.observe_wait(time.perf_counter() - start)
+        return connection
+
+
+def pool_options() -> dict:
+    """
+    Builds the ``create_engine`` pool arguments from the settings.
+
+    :return: Keyword arguments for ``create_engine``.
+    :rtype: dict
+    """
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def instrument(engine) -> None:
+    """
+    Subscribes the pool metrics of the engine to its ``checkout`` pool event, and the per-request
+    SQL statement counters (:func:`src.services.metrics.observe_query`) to its cursor events.
+
+    :param engine: The engine created with :func:`pool_options`.
+    :type engine: Engine
+    """
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool = engine.pool
+        stats = getattr(pool, "stats", None)
+        if stats is not None:
+            stats.observe_checkout(pool)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # час старту - на контексті виконання, він живе один запит і не лишається після помилки
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        observe_query(time.perf_counter() - context._query_start, statement)
+
+
+def pool_stats(engine) -> dict:
+    """
+    Returns the saturation metrics of the engine's pool.
+
+    :param engine: The engine to inspect.
+    :type engine: Engine
+    :return: The pool metrics, or an empty dictionary if the pool does not collect them.
+    :rtype: dict
+    """
+    stats = getattr(engine.pool, "stats", None)
+    return stats.snapshot(engine.pool) if stats is not None else {}
@@ -0,0 +1,224 @@
+import logging
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import NullPool
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\$\d+")  # плейсхолдери різних драйверів
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    """
+    Reduces an SQL statement to its shape: literals become ``?``, ``IN`` lists of any length become ``(?, ...)``
+    and whitespace is collapsed, so the same query with other values is one statement.
+
+    :param statement: The SQL text.
+    :type statement: str
+    :return: The normalized statement.
+    :rtype: str
+    """
+    statement = _STRING.sub("?", statement)
+    statement = _PLACEHOLDER.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _IN_LIST.sub("(?, ...)", statement)
+    return _SPACES.sub(" ", statement).strip()
+
+
+def parameters_shape(parameters, executemany: bool = False):
+    """
+    Describes the parameters of a statement by their types, without the values (they may be personal data).
+
+    :param parameters: The DBAPI parameters: a tuple, a dictionary, or a list of them for ``executemany``.
+    :param executemany: True if the statement ran once per parameter set.
+    :type executemany: bool
+    :return: The type names in the structure of the parameters.
+    """
+    if executemany:
+        rows = list(parameters or ())
+        return {"rows": len(rows), "row": parameters_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+class SlowQueryLog:
+    """
+    Records SQL statements slower than ``threshold`` seconds in a ring buffer of the last ``size`` entries.
+
+    Only a ``sample_rate`` share of the slow statements is recorded. For the first ``explain_first`` occurrences
+    of each normalized statement its plan is captured with ``EXPLAIN`` (``EXPLAIN QUERY PLAN`` on SQLite) on a
+    background thread, so the request that ran the statement is not delayed. ``EXPLAIN`` opens its own
+    connection outside the pool it measures (``NullPool``): slow queries come with an exhausted pool, and
+    the plan must not wait for, or take, a connection the requests need. The statement is not executed again:
+    PostgreSQL gets ``EXPLAIN (ANALYZE off)``. Slow statements are logged with :mod:`logging` as warnings.
+    """
+    def __init__(self, threshold: float, sample_rate: float = 1.0, explain_first: int = 3, size: int = 100):
+        """
+        :param threshold: The duration in seconds from which a statement is slow.
+        :type threshold: float
+        :param sample_rate: The share (0..1) of slow statements to record; 0 turns the log off.
+        :type sample_rate: float
+        :param explain_first: Occurrences of one normalized statement whose plan is captured.
+        :type explain_first: int
+        :param size: The number of entries kept.
+        :type size: int
+        """
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.explain_first = explain_first
+        self.entries: deque[dict] = deque(maxlen=size)
+        self.occurrences: OrderedDict[str, int] = OrderedDict()  # нормалізований SQL -> скільки разів був повільним
+        self.max_statements = size * 10
+        self.recorded = 0
+        self.lock = threading.Lock()
+        self.executor: ThreadPoolExecutor | None = None
+        self.pending = set()
+
+    def attach(self, engine, name: str = "primary") -> None:
+        """
+        Subscribes the log to the cursor events of the engine.
+
+        :param engine: The engine to watch.
+        :type engine: Engine
+        :param name: The name of the database in the entries, e.g. ``primary`` or ``replica``.
+        :type name: str
+        """
+        # окремий рушій без пулу і без цих подій: EXPLAIN не чекає на з'єднання запитів і не потрапляє в журнал
+        explain_engine = create_engine(engine.url, poolclass=NullPool)
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context._slow_query_start = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            seconds = time.perf_counter() - context._slow_query_start
+            self.observe(explain_engine, name, statement, parameters, executemany, seconds)
+
+    def observe(self, engine, name: str, statement: str, parameters, executemany: bool, seconds: float) -> None:
+        """
+        Records the statement if it is slow and sampled, and schedules its ``EXPLAIN`` if it is among
+        the first occurrences.
+
+        :param engine: The engine to run ``EXPLAIN`` on, connected to the database the statement ran on.
+        :type engine: Engine
+        :param name: The name of the database.
+        :type name: str
+        :param statement: The SQL text, with parameter placeholders.
+        :type statement: str
+        :param parameters: The DBAPI parameters.
+        :param executemany: True if the statement ran once per parameter set.
+        :type executemany: bool
+        :param seconds: The execution time.
+        :type seconds: float
+        """
+        if seconds < self.threshold or self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return
+        normalized = normalize(statement)
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "database": name,
+            "duration_ms": round(seconds * 1000, 3),
+            "statement": statement,
+            "normalized": normalized,
+            "parameters": parameters_shape(parameters, executemany),
+            "plan": None,
+        }
+        with self.lock:
+            count = self.occurrences.pop(normalized, 0) + 1
+            self.occurrences[normalized] = count
+            if len(self.occurrences) > self.max_statements:
+                self.occurrences.popitem(last=False)  # забуваємо найдавніший, щоб словник не ріс без меж
+            self.entries.append(entry)
+            self.recorded += 1
+        logger.warning("Slow query (%s ms, %s): %s params=%s", entry["duration_ms"], name, normalized,
+                       entry["parameters"])
+        if count <= self.explain_first and not executemany and normalized.upper().startswith(EXPLAINABLE):
+            self.submit(self.explain, engine, entry, statement, parameters)
+
+    def submit(self, fn, *args) -> None:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+            future = self.executor.submit(fn, *args)
+            self.pending.add(future)
+        future.add_done_callback(self.pending.discard)
+
+    @staticmethod
+    def explain(engine, entry: dict, statement: str, parameters) -> None:
+        """
+        Captures the plan of the statement into the entry, or the error if ``EXPLAIN`` fails.
+
+        :param engine: The engine to run ``EXPLAIN`` on.
+        :type engine: Engine
+        :param entry: The entry of the statement in the log.
+        :type entry: dict
+        :param statement: The SQL text, with parameter placeholders.
+        :type statement: str
+        :param parameters: The DBAPI parameters.
+        """
+        dialect = engine.dialect.name
+        prefix = {"sqlite": "EXPLAIN QUERY PLAN", "postgresql": "EXPLAIN (ANALYZE off)"}.get(dialect, "EXPLAIN")
+        try:
+            with engine.connect() as conn:
+                rows = conn.exec_driver_sql(f"{prefix} {statement}", parameters or ()).all()
+        except Exception as err:
+            entry["plan_error"] = str(err).splitlines()[0]
+            return
+        # у SQLite план у стовпці detail (останньому), у PostgreSQL - єдиний стовпець
+        entry["plan"] = [str(row[-1]) if dialect == "sqlite" else " ".join(map(str, row)) for row in rows]
+
+    def join(self, timeout: float | None = None) -> None:
+        """
+        Waits for the scheduled ``EXPLAIN`` queries.
+
+        :param timeout: The longest wait in seconds.
+        :type timeout: float | None
+        """
+        wait(list(self.pending), timeout=timeout)
+
+    def snapshot(self) -> dict:
+        """
+        Returns the settings of the log and its entries, newest first.
+
+        :return: The log as a JSON-serializable dictionary.
+        :rtype: dict
+        """
+        with self.lock:
+            entries = [dict(entry) for entry in reversed(self.entries)]
+            recorded = self.recorded
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "sample_rate": self.sample_rate,
+            "recorded": recorded,
+            "queries": entries,
+        }
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.occurrences.clear()
+            self.recorded = 0
+
+    def close(self) -> None:
+        """
+        Stops the ``EXPLAIN`` thread; queued plans are dropped.
+        """
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import math
+import time
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.conf.config import settings
+
+
+class RouteGroup:
+    """
+    Admission state of one route group: requests in flight, the waiting queue and recent delays.
+    """
+    DECAY_SECONDS = 1.0  # за скільки секунд без нових даних оцінка затримки зменшується в e разів
+    ALPHA = 0.2  # вага нового вимірювання в EWMA
+
+    def __init__(self, name: str, max_in_flight: int):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.waiting: list[asyncio.Future] = []
+        self.queue_delay = 0.0
+        self.updated = time.monotonic()
+        self.admitted = 0
+        self.shed = 0
+
+    def current_queue_delay(self, now: float) -> float:
+        """
+        Returns the recent queue delay (EWMA), decayed by the time since the last measurement.
+        """
+        return self.queue_delay * math.exp(-(now - self.updated) / self.DECAY_SECONDS)
+
+    def observe_wait(self, seconds: float, now: float) -> None:
+        self.queue_delay = self.current_queue_delay(now) * (1 - self.ALPHA) + seconds * self.ALPHA
+        self.updated = now
+
+    def release(self) -> None:
+        # слот передаємо першому в черзі, не зменшуючи in_flight
+        while self.waiting:
+            waiter = self.waiting.pop(0)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class AdmissionController:
+    """
+    Limits the number of requests in flight per route group (auth, contacts, users) and sheds low-priority
+    work when the group is overloaded.
+
+    Requests over ``max_in_flight`` of their group wait in a FIFO queue. Low-priority requests (birthdays,
+    avatar uploads) are rejected with 503 and ``Retry-After`` instead of queueing, and also when the
+    recent queue delay of the group exceeds ``target_delay``. Other requests wait up to ``max_queue_time``,
+    so critical reads keep their latency while slow work is dropped first.
+    """
+    GROUPS = {"/api/auth": "auth", "/api/contacts": "contacts", "/api/users": "users"}
+
+    def __init__(self, max_in_flight: int, target_delay: float, max_queue_time: float,
+                 low_priority: list[str]):
+        """
+        :param max_in_flight: Maximum number of requests processed at once per route group.
+        :type max_in_flight: int
+        :param target_delay: Queue delay (seconds) above which low-priority requests are shed.
+        :type target_delay: float
+        :param max_queue_time: Maximum time (seconds) a request waits for admission before 503.
+        :type max_queue_time: float
+        :param low_priority: Path prefixes or fragments of low-priority routes.
+        :type low_priority: list[str]
+        """
+        self.max_in_flight = max_in_flight
+        self.target_delay = target_delay
+        self.max_queue_time = max_queue_time
+        self.low_priority = low_priority
+        self.groups: dict[str, RouteGroup] = {}
+
+    def group(self, path: str) -> RouteGroup:
+        name = next((group for prefix, group in self.GROUPS.items() if path.startswith(prefix)), "other")
+        group = self.groups.get(name)
+        if group is None:
+            group = self.groups[name] = RouteGroup(name, self.max_in_flight)
+        return group
+
+    def is_low_priority(self, path: str) -> bool:
+        return any(fragment in path for fragment in self.low_priority)
+
+    async def admit(self, group: RouteGroup, low_priority: bool) -> float:
+        """
+        Waits for a free slot in the group.
+
+        :param group: The route group of the request.
+        :type group: RouteGroup
+        :param low_priority: True if the request may be shed.
+        :type low_priority: bool
+        :return: 0 if the request was admitted, otherwise the suggested ``Retry-After`` in seconds.
+        :rtype: float
+        """
+        now = time.monotonic()
+        delay = group.current_queue_delay(now)
+        if low_priority and (group.in_flight >= group.max_in_flight or delay > self.target_delay):
+            group.shed += 1
+            return max(delay, 1.0)
+        if group.in_flight < group.max_in_flight:
+            group.in_flight += 1
+            group.observe_wait(0.0, now)
+            group.admitted += 1
+            return 0.0
+
+        waiter = asyncio.get_running_loop().create_future()
+        group.waiting.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_queue_time)
+        except asyncio.TimeoutError:
+            if waiter.done():  # слот звільнився в останню мить - віддаємо його далі
+                group.release()
+            else:
+                waiter.cancel()
+            group.observe_wait(self.max_queue_time, time.monotonic())
+            group.shed += 1
+            return self.max_queue_time
+        except asyncio.CancelledError:  # клієнт відключився, поки чекав у черзі
+            if waiter.done():
+                group.release()
+            else:
+                waiter.cancel()
+            raise
+        group.observe_wait(time.monotonic() - now, time.monotonic())
+        group.admitted += 1
+        return 0.0
+
+    def snapshot(self) -> dict:
+        """
+        Returns the admission state of all route groups.
+
+        :return: In-flight and queued requests, queue delay (seconds), admitted and shed counters.
+        :rtype: dict
+        """
+        now = time.monotonic()
+        return {name: {"in_flight": group.in_flight,
+                       "queued": sum(not waiter.done() for waiter in group.waiting),
+                       "queue_delay": group.current_queue_delay(now),
+                       "admitted": group.admitted,
+                       "shed": group.shed}
+                for name, group in self.groups.items()}
+
+
+admission_controller = AdmissionController(
+    max_in_flight=settings.admission_max_in_flight,
+    target_delay=settings.admission_target_delay,
+    max_queue_time=settings.admission_max_queue_time,
+    low_priority=settings.admission_low_priority,
+)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that passes every HTTP request through an :class:`AdmissionController`.
+    """
+    def __init__(self, app: ASGIApp, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        group = self.controller.group(path)
+        retry_after = await self.controller.admit(group, self.controller.is_low_priority(path))
+        if retry_after:
+            await send_unavailable(send, retry_after)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            group.release()
+
+
+async def send_unavailable(send: Send, retry_after: float) -> None:
+    body = json.dumps({"detail": "Service is overloaded, try again later"}).encode()
+    await send({"type": "http.response.start", "status": 503,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode()),
+                            (b"retry-after", str(math.ceil(retry_after)).encode())]})
+    await send({"type": "http.response.body", "body": body})
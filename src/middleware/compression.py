@@ -0,0 +1,171 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # Brotli - опціональна залежність (poetry install -E brotli)
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class GzipCompressor:
+    """
+    Incremental gzip compressor.
+    """
+    encoding = "gzip"
+
+    def __init__(self, level: int):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        # порожній chunk після Z_SYNC_FLUSH zlib вважає помилкою буфера
+        return self.compressor.compress(data) if data else b""
+
+    def flush(self) -> bytes:
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    """
+    Incremental Brotli compressor.
+    """
+    encoding = "br"
+
+    def __init__(self, quality: int):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush()
+
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """
+    Parses the ``Accept-Encoding`` header, skipping encodings the client refused with ``q=0``.
+
+    :param accept_encoding: The value of the Accept-Encoding header.
+    :type accept_encoding: str
+    :return: The accepted encodings in lower case.
+    :rtype: set[str]
+    """
+    encodings = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if name and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            encodings.add(name)
+    return encodings
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with Brotli (when the ``brotli`` package is installed and the client accepts ``br``)
+    or gzip.
+
+    Responses smaller than ``minimum_size`` and responses that already have a ``Content-Encoding``
+    are sent as is. Streaming responses are compressed chunk by chunk; every chunk is flushed, so the client
+    receives data as soon as the application produces it.
+    """
+    def __init__(self, app: ASGIApp, minimum_size: int = 1000, gzip_level: int = 6, brotli_quality: int = 4):
+        """
+        :param app: The wrapped ASGI application.
+        :type app: ASGIApp
+        :param minimum_size: Responses with a smaller body are not compressed (bytes).
+        :type minimum_size: int
+        :param gzip_level: gzip compression level, 1-9.
+        :type gzip_level: int
+        :param brotli_quality: Brotli quality, 0-11.
+        :type brotli_quality: int
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def compressor(self, scope: Scope):
+        encodings = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in encodings:
+            return BrotliCompressor(self.brotli_quality)
+        if "gzip" in encodings:
+            return GzipCompressor(self.gzip_level)
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        compressor = self.compressor(scope) if scope["type"] == "http" else None
+        if compressor is None:
+            await self.app(scope, receive, send)
+            return
+        await CompressionResponder(self.app, compressor, self.minimum_size)(scope, receive, send)
+
+
+class CompressionResponder:
+    """
+    Compresses the response of a single request.
+    """
+    def __init__(self, app: ASGIApp, compressor, minimum_size: int):
+        self.app = app
+        self.compressor = compressor
+        self.minimum_size = minimum_size
+        self.send = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def set_encoding_headers(self) -> MutableHeaders:
+        headers = MutableHeaders(raw=self.initial_message["headers"])
+        headers["Content-Encoding"] = self.compressor.encoding
+        headers.add_vary_header("Accept-Encoding")
+        return headers
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # заголовки відправляємо разом з першою частиною тіла, коли вже знаємо, чи стискати
+            self.initial_message = message
+            self.passthrough = "content-encoding" in Headers(raw=message["headers"])
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.passthrough:
+            if not self.started:
+                self.started = True
+                await self.send(self.initial_message)
+            await self.send(message)
+        elif not self.started:
+            self.started = True
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+            headers = self.set_encoding_headers()
+            if more_body:
+                del headers["Content-Length"]
+                message["body"] = self.compressor.compress(body) + self.compressor.flush()
+            else:
+                message["body"] = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(message["body"]))
+            await self.send(self.initial_message)
+            await self.send(message)
+        else:
+            # спершу стискаємо частину, потім flush/finish - інакше вона застрягне до наступної
+            data = self.compressor.compress(body)
+            message["body"] = data + (self.compressor.flush() if more_body else self.compressor.finish())
+            await self.send(message)
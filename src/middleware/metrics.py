@@ -0,0 +1,70 @@
+import logging
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Returns the template of the matched route (``/api/contacts/{contact_id}``), so the metrics have one
+    series per route rather than per URL. Unmatched paths share one label.
+    """
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records the latency, status and database/Redis work of every HTTP request
+    in :data:`src.services.metrics.registry`.
+
+    In debug mode it also adds a ``Server-Timing`` header (database time and statements, Redis round trips,
+    total time) to every response, and logs a warning when a request runs the same SQL statement
+    ``n_plus_one_threshold`` times or more.
+    """
+    def __init__(self, app: ASGIApp, debug: bool = False, n_plus_one_threshold: int = 5):
+        """
+        :param app: The wrapped application.
+        :type app: ASGIApp
+        :param debug: Add ``Server-Timing`` headers and detect N+1 queries.
+        :type debug: bool
+        :param n_plus_one_threshold: Executions of one statement per request reported as N+1.
+        :type n_plus_one_threshold: int
+        """
+        self.app = app
+        self.debug = debug
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = metrics.RequestStats(track_statements=self.debug)
+        token = metrics.current_request.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.debug:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", stats.server_timing(time.perf_counter() - start))
+            await send(message)
+
+        metrics.http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.http_in_flight.dec()
+            metrics.current_request.reset(token)
+            route = route_template(scope)
+            metrics.observe_request(scope["method"], route, status, time.perf_counter() - start, stats)
+            for statement, count in stats.repeated_statements(self.n_plus_one_threshold).items():
+                logger.warning("N+1 suspected in %s %s: %s x %s", scope["method"], route, count, statement)
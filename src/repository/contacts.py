@@ -1,13 +1,13 @@
 # тут прописуємо функції, які використовуються в роутах у файлі src/routes/contacts.py
 from datetime import date, timedelta
-from typing import List
+from typing import AsyncIterator, List
 
 from sqlalchemy import extract
-from sqlalchemy import and_
+from sqlalchemy import Row, and_
 from sqlalchemy.orm import Session
 
 from src.database.models import Contact, User
-from src.schemas import ContactBase, ContactResponse, ContactUpdate
+from src.schemas import ContactBase, ContactUpdate
 
 
 # async def get_all_contacts(skip: int, limit: int, user: User, db: Session) -> List[Contact]: 
@@ -67,7 +67,7 @@ async def create_contact(body: ContactBase, user: User, db: Session) -> Contact:
     db.add(new_contact)
     db.commit()
     db.refresh(new_contact)
-    return ContactResponse.from_orm(new_contact)
+    return new_contact
 
 
 async def update_contact(contact_id: int, body: ContactUpdate, user: User, db: Session) -> Contact | None:
@@ -161,6 +161,79 @@ async def get_upcoming_birthdays(user: User, db: Session):
     return future_birthdays
 
 
+def birthday_keys(start: date, days: int) -> list[int]:
+    """
+    Returns the birthdays (as ``month * 100 + day``) that fall between ``start`` and ``start + days`` inclusive.
+
+    People born on February 29 are congratulated on February 28 in non-leap years.
+
+    :param start: The first day of the window.
+    :type start: date
+    :param days: The length of the window in days.
+    :type days: int
+    :return: The month-day keys of the window.
+    :rtype: list[int]
+    """
+    keys = []
+    for offset in range(days + 1):
+        day = start + timedelta(days=offset)
+        keys.append(day.month * 100 + day.day)
+        if day.month == 2 and day.day == 28 and (day + timedelta(days=1)).month == 3:
+            keys.append(229)
+    return keys
+
+
+async def iter_upcoming_birthdays_by_owner(db: Session, start: date, days: int = 7,
+                                           chunk_size: int = 1000) -> AsyncIterator[tuple[Row, list]]:
+    """
+    Finds the contacts of all users whose birthdays fall within the window, grouped per owner.
+
+    One set-based query per chunk of ``chunk_size`` owners (keyset pagination by ``owner_id``) replaces the
+    per-user scan of :func:`get_upcoming_birthdays`, so memory stays bounded by the chunk, not the table.
+    Only confirmed users are included. Owners are plain rows, not ORM objects, so the caller may commit
+    between them without expiring the owners of the chunk (a lazy reload per owner).
+
+    :param db: The database session.
+    :type db: Session
+    :param start: The first day of the window.
+    :type start: date
+    :param days: The length of the window in days.
+    :type days: int
+    :param chunk_size: Number of owners fetched per query.
+    :type chunk_size: int
+    :return: Pairs of the owner row (id, email, username) and the rows (first_name, last_name, email, birthday)
+        of their contacts.
+    :rtype: AsyncIterator[tuple[Row, list]]
+    """
+    birthday_key = extract('month', Contact.birthday) * 100 + extract('day', Contact.birthday)
+    in_window = birthday_key.in_(birthday_keys(start, days))
+    last_owner_id = 0
+    while True:
+        owner_ids = [owner_id for owner_id, in db.query(Contact.owner_id)
+                     .filter(Contact.owner_id > last_owner_id, in_window)
+                     .distinct()
+                     .order_by(Contact.owner_id)
+                     .limit(chunk_size)]
+        if not owner_ids:
+            return
+        last_owner_id = owner_ids[-1]
+        owners = {owner.id: owner for owner in db.query(User.id, User.email, User.username)
+                  .filter(User.id.in_(owner_ids), User.confirmed.is_(True))}
+        rows = (db.query(Contact.owner_id, Contact.first_name, Contact.last_name, Contact.email, Contact.birthday)
+                .filter(Contact.owner_id.in_(owner_ids), in_window)
+                .order_by(Contact.owner_id, Contact.id)
+                .all())
+        current_owner_id, contacts = None, []
+        for row in rows:
+            if row.owner_id != current_owner_id:
+                if contacts and current_owner_id in owners:
+                    yield owners[current_owner_id], contacts
+                current_owner_id, contacts = row.owner_id, []
+            contacts.append(row)
+        if contacts and current_owner_id in owners:
+            yield owners[current_owner_id], contacts
+
+
 async def get_contacts(db: Session, user: User, first_name: str = None, last_name: str = None, email: str = None): # вивести список всіх контактів чи для пошуку за іменем, прізвищем чи ємейлом
     """
     Retrieves a list of contacts for a specific user. Optionally filters the contacts by first name, last name, or email.
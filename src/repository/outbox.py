@@ -0,0 +1,148 @@
+# функції для таблиці email_outbox: запис листів у транзакції запиту і забір їх воркером src/workers/outbox.py
+import random
+from datetime import datetime, timedelta
+from typing import List, NamedTuple
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from src.database.models import EmailOutbox
+
+
+class ClaimedEmail(NamedTuple):
+    """
+    The fields of a claimed outbox row the worker needs, copied out of the session, so building the emails
+    doesn't reload the rows one by one.
+    """
+    id: int
+    recipient: str
+    kind: str
+    payload: dict
+    attempts: int
+
+
+def add_email(recipient: str, kind: str, payload: dict, db: Session) -> EmailOutbox:
+    """
+    Adds an email to the outbox in the current transaction, without committing it.
+
+    The email is sent by the outbox worker only if the transaction that created it commits.
+
+    :param recipient: The recipient's email address.
+    :type recipient: str
+    :param kind: The kind of email, which selects how the worker builds it (e.g. ``"confirm_email"``).
+    :type kind: str
+    :param payload: The data the email is built from.
+    :type payload: dict
+    :param db: The database session.
+    :type db: Session
+    :return: The new outbox row.
+    :rtype: EmailOutbox
+    """
+    email = EmailOutbox(recipient=recipient, kind=kind, payload=payload, status="pending", attempts=0,
+                        next_attempt_at=datetime.now())
+    db.add(email)
+    return email
+
+
+async def create_email(recipient: str, kind: str, payload: dict, db: Session) -> EmailOutbox:
+    """
+    Adds an email to the outbox and commits it.
+
+    :param recipient: The recipient's email address.
+    :type recipient: str
+    :param kind: The kind of email.
+    :type kind: str
+    :param payload: The data the email is built from.
+    :type payload: dict
+    :param db: The database session.
+    :type db: Session
+    :return: The new outbox row.
+    :rtype: EmailOutbox
+    """
+    email = add_email(recipient, kind, payload, db)
+    db.commit()
+    return email
+
+
+async def claim_emails(limit: int, lease_seconds: int, max_attempts: int, db: Session) -> List[ClaimedEmail]:
+    """
+    Claims a batch of due emails for delivery.
+
+    Rows are selected with ``FOR UPDATE SKIP LOCKED``, so concurrent workers get different rows, and are
+    marked ``sending`` until ``lease_seconds`` from now. If a worker dies while sending, the rows become due
+    again when the lease ends. Rows that have already used ``max_attempts`` (the worker crashed or hung on
+    them every time) are marked ``failed`` instead of being sent again. The batch is claimed with one
+    ``UPDATE`` per outcome and one commit.
+
+    :param limit: Maximum number of emails to claim.
+    :type limit: int
+    :param lease_seconds: How long the claimed emails stay reserved for this worker.
+    :type lease_seconds: int
+    :param max_attempts: Number of attempts after which an email is marked ``failed``.
+    :type max_attempts: int
+    :param db: The database session.
+    :type db: Session
+    :return: The claimed emails.
+    :rtype: List[ClaimedEmail]
+    """
+    now = datetime.now()
+    rows = (db.query(EmailOutbox.id, EmailOutbox.recipient, EmailOutbox.kind, EmailOutbox.payload,
+                     EmailOutbox.attempts)
+            .filter(and_(or_(EmailOutbox.status == "pending", EmailOutbox.status == "sending"),
+                         EmailOutbox.next_attempt_at <= now))
+            .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all())
+    exhausted = [row.id for row in rows if row.attempts >= max_attempts]
+    emails = [ClaimedEmail(row.id, row.recipient, row.kind, row.payload, row.attempts + 1)
+              for row in rows if row.attempts < max_attempts]
+    if exhausted:
+        db.execute(update(EmailOutbox).where(EmailOutbox.id.in_(exhausted))
+                   .values(status="failed", last_error=f"Gave up after {max_attempts} attempts: the lease expired"),
+                   execution_options={"synchronize_session": False})
+    if emails:
+        db.execute(update(EmailOutbox).where(EmailOutbox.id.in_([email.id for email in emails]))
+                   .values(status="sending", attempts=EmailOutbox.attempts + 1,
+                           next_attempt_at=now + timedelta(seconds=lease_seconds)),
+                   execution_options={"synchronize_session": False})
+    db.commit()
+    return emails
+
+
+async def record_results(results: List[tuple[ClaimedEmail, str | None]], max_attempts: int,
+                         backoff_base: float, backoff_max: float, db: Session) -> None:
+    """
+    Records the outcome of a delivered batch with one commit: sent emails in one ``UPDATE``, failed ones
+    in one bulk ``UPDATE`` by primary key. A failed email is retried with exponential backoff and jitter,
+    or marked ``failed`` after ``max_attempts``.
+
+    :param results: The claimed emails with None for a successful delivery or the error message.
+    :type results: List[tuple[ClaimedEmail, str | None]]
+    :param max_attempts: Number of attempts after which the email is marked ``failed``.
+    :type max_attempts: int
+    :param backoff_base: Delay before the second attempt, in seconds; doubles with every attempt.
+    :type backoff_base: float
+    :param backoff_max: Maximum delay between attempts, in seconds.
+    :type backoff_max: float
+    :param db: The database session.
+    :type db: Session
+    """
+    now = datetime.now()
+    sent = [email.id for email, error in results if error is None]
+    failed = []
+    for email, error in results:
+        if error is None:
+            continue
+        values = {"id": email.id, "last_error": error[:1000], "status": "failed", "next_attempt_at": now}
+        if email.attempts < max_attempts:
+            delay = min(backoff_max, backoff_base * 2 ** (email.attempts - 1))
+            values.update(status="pending", next_attempt_at=now + timedelta(seconds=delay * random.uniform(0.5, 1)))
+        failed.append(values)
+    if sent:
+        db.execute(update(EmailOutbox).where(EmailOutbox.id.in_(sent))
+                   .values(status="sent", sent_at=now, last_error=None),
+                   execution_options={"synchronize_session": False})
+    if failed:
+        db.execute(update(EmailOutbox), failed)  # executemany за первинним ключем
+    db.commit()
@@ -1,7 +1,11 @@
-from libgravatar import Gravatar
+import functools
+import hashlib
+
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
 from src.database.models import User
+from src.repository.outbox import add_email
 from src.schemas import UserModel
  
 
@@ -19,43 +23,72 @@ async def get_user_by_email(email: str, db: Session) -> User | None:
     return db.query(User).filter(User.email == email).first()
 
 
-async def create_user(body: UserModel, db: Session) -> User:
+# INSERT ... ON CONFLICT DO NOTHING є в PostgreSQL (робоча база) і SQLite (тести)
+INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+@functools.lru_cache(maxsize=10000)
+def gravatar_url(email: str) -> str:
+    """
+    Returns the Gravatar image URL of the email. It is computed locally (MD5 of the normalized email),
+    without any request to Gravatar.
+
+    :param email: The email of the user.
+    :type email: str
+    :return: The URL of the user's Gravatar image.
+    :rtype: str
+    """
+    return f"https://www.gravatar.com/avatar/{hashlib.md5(email.strip().lower().encode()).hexdigest()}"
+
+
+async def create_user(body: UserModel, db: Session, confirmation_host: str | None = None) -> User | None:
     """
     Creates a new user.
 
+    The user is inserted with a single ``INSERT ... ON CONFLICT (email) DO NOTHING RETURNING`` statement,
+    so an existing email is detected by the same round trip instead of a separate lookup.
+
+    If ``confirmation_host`` is given, a confirmation email is added to the outbox in the same transaction,
+    so it is sent if and only if the user is created.
+
     :param body: The data for the user to create.
     :type body: UserModel
     :param db: The database session.
     :type db: Session
-    :return: The newly created user.
-    :rtype: User
+    :param confirmation_host: The base URL for the confirmation link, or None to skip the email.
+    :type confirmation_host: str | None
+    :return: The newly created user, or None if a user with this email already exists.
+    :rtype: User | None
     """
-    avatar = None
-    try:
-        g = Gravatar(body.email)
-        avatar = g.get_image()
-    except Exception as e:
-        print(e)
-    new_user = User(**body.dict(), avatar=avatar)
-    db.add(new_user)
+    insert = INSERTS.get(db.get_bind().dialect.name, postgresql.insert)
+    statement = (insert(User)
+                 .values(**body.dict(), avatar=gravatar_url(body.email))
+                 .on_conflict_do_nothing(index_elements=[User.email])
+                 .returning(User))
+    new_user = db.scalars(statement).first()
+    if new_user is None:
+        db.rollback()
+        return None
+    if confirmation_host is not None:
+        add_email(new_user.email, "confirm_email", {"username": new_user.username, "host": confirmation_host}, db)
+    db.expunge(new_user)  # RETURNING вже дав усі поля - після commit не потрібен ще один SELECT
     db.commit()
-    db.refresh(new_user)
     return new_user
 
 
-async def update_token(user: User, token: str | None, db: Session) -> None:
+async def update_password(user: User, password_hash: str, db: Session) -> None:
     """
-    Updates the refresh token of the specified user in the current session.
+    Replaces the stored password hash of the user, e.g. with a hash of new bcrypt rounds.
 
-    :param user: The user whose refresh token will be updated.
+    :param user: The user whose password hash will be updated.
     :type user: User
-    :param token: The new refresh token for the user. Can be None to clear the token.
-    :type token: str | None
+    :param password_hash: The new password hash.
+    :type password_hash: str
     :param db: The database session.
     :type db: Session
     :return: None
     """
-    user.refresh_token = token
+    user.password = password_hash
     db.commit()
 
 
@@ -77,7 +110,21 @@ async def confirmed_email(email: str, db: Session) -> None:
     db.commit()
 
 
-async def update_avatar(email: str, url: str, db: Session) -> User:
+async def avatar_exists(avatar_hash: str, db: Session) -> bool:
+    """
+    Checks whether any user already has an avatar with this content hash (so it is already stored).
+
+    :param avatar_hash: SHA-256 hex digest of the avatar file.
+    :type avatar_hash: str
+    :param db: The database session.
+    :type db: Session
+    :return: True if the avatar is already in the storage.
+    :rtype: bool
+    """
+    return db.query(User.id).filter(User.avatar_hash == avatar_hash).first() is not None
+
+
+async def update_avatar(email: str, url: str, db: Session, avatar_hash: str | None = None) -> User:
     """
     Updates the avatar URL for the specified user.
 
@@ -87,6 +134,8 @@ async def update_avatar(email: str, url: str, db: Session) -> User:
     :type url: str
     :param db: The database session.
     :type db: Session
+    :param avatar_hash: SHA-256 hex digest of the uploaded avatar file.
+    :type avatar_hash: str | None
     :raises ValueError: If no user is found with the specified email.
     :return: The user whose avatar was updated.
     :rtype: User
@@ -95,5 +144,6 @@ async def update_avatar(email: str, url: str, db: Session) -> User:
     if not user: # added raise error during docstring adding
         raise ValueError(f"User with email {email} does not exist.")
     user.avatar = url
+    user.avatar_hash = avatar_hash
     db.commit()
     return user
\ No newline at end of file
@@ -1,14 +1,18 @@
+import asyncio
+import math
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Security, Request
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
 
 from src.database.db import get_db
 from src.schemas import UserModel, UserResponse, TokenModel, RequestEmail
 from src.repository import users as repository_users
-from src.services.auth import auth_service
 from src.services.email import send_email
+from src.services.auth import auth_service
+from src.services.login_throttle import login_throttle
+from src.services.rate_limit import client_ip
 
 router = APIRouter(prefix='/auth', tags=["auth"])
 security = HTTPBearer()
@@ -16,7 +20,6 @@ security = HTTPBearer()
 
 @router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def signup(body: UserModel, 
-                 background_tasks: BackgroundTasks, 
                  request: Request, 
                  db: Session = Depends(get_db)):
     """
@@ -26,8 +29,6 @@ async def signup(body: UserModel,
     :path: /signup
     :param body: The data required to create a new user.
     :type body: UserModel
-    :param background_tasks: Background tasks to handle post-signup actions (e.g., sending emails).
-    :type background_tasks: BackgroundTasks
     :param request: The HTTP request object, used to retrieve the base URL for constructing email links.
     :type request: Request
     :param db: The database session.
@@ -36,76 +37,118 @@ async def signup(body: UserModel,
     :return: A response containing the newly created user's details and a confirmation message.
     :rtype: UserResponse
     """
-    exist_user = await repository_users.get_user_by_email(body.email, db)
-    if exist_user:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
     body.password = auth_service.get_password_hash(body.password)
-    new_user = await repository_users.create_user(body, db)
-    background_tasks.add_task(send_email, new_user.email, new_user.username, request.base_url)
+    # лист з підтвердженням потрапляє в outbox в тій же транзакції, відправляє його окремий воркер
+    new_user = await repository_users.create_user(body, db, confirmation_host=str(request.base_url))
+    if new_user is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
     return {"user": new_user, "detail": "User successfully created. Check your email for confirmation."}
 
 
 @router.post("/login", response_model=TokenModel)
-async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(request: Request, body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """
     Authorizes the user and generates access and refresh tokens.
 
+    Failed attempts are counted per account and client IP pair and per client IP; over the allowance the login
+    is rejected with 429 before the user is loaded or the password is checked. An account attacked from many
+    IPs is not blocked, but every login into it is delayed.
+
     :http method: POST
     :path: /login
+    :param request: The incoming HTTP request.
+    :type request: Request
     :param body: Represents a form containing login credentials (`username` and `password`) used for OAuth2 authentication.
     :type body: OAuth2PasswordRequestForm
     :param db: The database session.
     :type db: Session
     :raise HTTPException:
+        - If the account (for this IP) or the IP is blocked after too many failed attempts.
         - If the email is not found in the database.
         - If the email is not confirmed.
         - If the password is incorrect.
     :return: A dictionary containing the access token, refresh token, and token type.
     :rtype: TokenModel
     """
+    ip = client_ip(request)
+    retry_after, delay = login_throttle.check(body.username, ip)
+    if retry_after:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many failed login attempts",
+                            headers={"Retry-After": str(math.ceil(retry_after))})
+    if delay:  # акаунт атакують з багатьох IP - сповільнюємо кожну спробу, але не блокуємо власника
+        await asyncio.sleep(delay)
     user = await repository_users.get_user_by_email(body.username, db)
     if user is None:
+        login_throttle.record_failure(body.username, ip)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email")
     if not user.confirmed:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not confirmed")
-    if not auth_service.verify_password(body.password, user.password):
+    valid, new_hash = auth_service.verify_and_update_password(body.password, user.password)
+    if not valid:
+        login_throttle.record_failure(body.username, ip)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
+    if new_hash is not None:  # хеш зі старими раундами bcrypt - зберігаємо новий, поки маємо пароль
+        await repository_users.update_password(user, new_hash, db)
+        auth_service.forget_user(user.email)
+    login_throttle.record_success(body.username, ip)
     # Generate JWT
-    access_token = await auth_service.create_access_token(data={"sub": user.email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
-    await repository_users.update_token(user, refresh_token, db)
+    access_token = await auth_service.create_access_token(data={"sub": user.email, "uid": user.id})
+    # refresh-токени живуть у Redis (окрема сесія на кожен логін), база тут не змінюється
+    refresh_token = await auth_service.issue_refresh_token(user.email, user.id)
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
 @router.get('/refresh_token', response_model=TokenModel)
-async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), 
-                        db: Session = Depends(get_db)):
+async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security)):
     """
     Refreshes the authentication tokens for the current user session.
 
+    The refresh token is rotated in Redis: the presented token stops working and a new one of the same
+    session is returned. Presenting an already used token revokes the whole session.
+
     :http method: GET
     :path: /refresh_token
     :param credentials: The user's authorization credentials containing the refresh token.
     :type credentials: HTTPAuthorizationCredentials
-    :param db: The database session.
-    :type db: Session
-    :raises HTTPException: If the provided refresh token is invalid or does not match the stored token.
+    :raises HTTPException: If the provided refresh token is invalid, already used or revoked.
     :return: A dictionary containing the access token, refresh token, and token type.
     :rtype: TokenModel
     """
-    token = credentials.credentials
-    email = await auth_service.decode_refresh_token(token)
-    user = await repository_users.get_user_by_email(email, db)
-    if user.refresh_token != token:
-        await repository_users.update_token(user, None, db)
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
-
-    access_token = await auth_service.create_access_token(data={"sub": email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": email})
-    await repository_users.update_token(user, refresh_token, db)
+    email, uid, refresh_token = await auth_service.rotate_refresh_token(credentials.credentials)
+    access_token = await auth_service.create_access_token(data={"sub": email, "uid": uid})
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
+@router.post('/logout', status_code=status.HTTP_204_NO_CONTENT)
+async def logout(token: str = Depends(auth_service.oauth2_scheme)):
+    """
+    Revokes the presented access token, so it stops working before it expires.
+
+    :http method: POST
+    :path: /logout
+    :param token: The access token of the user.
+    :type token: str
+    :raises HTTPException: If the access token is invalid or already revoked.
+    """
+    await auth_service.revoke_token(token)
+
+
+@router.get('/jwks')
+async def jwks():
+    """
+    Publishes the public keys that verify the tokens of this service (JWK set).
+
+    Other services can verify access tokens locally with these keys, picking the key by the ``kid``
+    header of the token. Only asymmetric keys (ES256, RS256) are published.
+
+    :http method: GET
+    :path: /jwks
+    :return: The JWK set.
+    :rtype: dict
+    """
+    return auth_service.keys.jwks()
+
+
 @router.get('/confirmed_email/{token}')
 async def confirmed_email(token: str, db: Session = Depends(get_db)):
     """
@@ -132,7 +175,7 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
 
 
 @router.post('/request_email')
-async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, request: Request,
+async def request_email(body: RequestEmail, request: Request,
                         db: Session = Depends(get_db)):
     """
     Initiates the process of confirming a user's email address by sending a confirmation email.
@@ -144,8 +187,6 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
     :path: /request_email
     :param body: The request body containing the user's email to request a confirmation email.
     :type body: RequestEmail
-    :param background_tasks: Allows for sending the confirmation email as a background task.
-    :type background_tasks: BackgroundTasks
     :param request: The incoming HTTP request used to construct the base URL for the confirmation link.
     :type request: Request
     :param db: The database session.
@@ -159,5 +200,5 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
     if user.confirmed:
         return {"message": "Your email is already confirmed"}
     if user:
-        background_tasks.add_task(send_email, user.email, user.username, request.base_url)
+        await send_email(user.email, user.username, str(request.base_url), db)
     return {"message": "Check your email for confirmation."}
\ No newline at end of file
@@ -1,28 +1,43 @@
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Depends, status, Query, Request
-from fastapi_limiter.depends import RateLimiter
+from fastapi import APIRouter, HTTPException, Depends, status, Query, Request, Response
 from sqlalchemy.orm import Session
 
-from src.database.db import get_db
+from src.database.db import get_db, get_read_db
 from src.database.models import User
-from src.schemas import ContactBase, ContactResponse, ContactUpdate
+from src.schemas import ContactBase, ContactResponse, ContactUpdate, contact_list_adapter
 from src.repository import contacts as repository_contacts
 from src.services.auth import auth_service
+from src.services.rate_limit_policy import describe, rate_limit
 
 
 router = APIRouter(prefix='/contacts', tags=["contacts"]) # до цього apі-роутера будемо звертатися далі для створення роутів
 
 
+def contacts_response(contacts) -> Response:
+    """
+    Validates and serializes a list of contacts in one pass with the prebuilt ``contact_list_adapter``.
+
+    Returning the ready JSON skips FastAPI's per-item ``response_model`` validation and ``jsonable_encoder``.
+
+    :param contacts: Contacts as ORM objects or dictionaries.
+    :type contacts: list
+    :return: The JSON response with the list of contacts.
+    :rtype: Response
+    """
+    validated = contact_list_adapter.validate_python(contacts, from_attributes=True)
+    return Response(content=contact_list_adapter.dump_json(validated), media_type="application/json")
+
+
 @router.get("/birthdays", response_model=list[ContactResponse]) # для пошуку днів народж. у найбл. 7 днів. Цю функцію слід ставити перед ф-цією пошуку контакту за {contact_id}, інакше фаст-апі проводить пошук саме за {contact_id}, а не днем народження
-async def get_upcoming_birthdays(db: Session = Depends(get_db), 
+async def get_upcoming_birthdays(db: Session = Depends(get_read_db), 
                                  current_user: User = Depends(auth_service.get_current_user)):
     """
     Retrieves a list of contacts for the authenticated user whose birthdays fall within the next 7 days.
 
     :http method: GET
     :path: /birthdays
-    :param db: The database session.
+    :param db: The read-only database session (replica when configured).
     :type db: Session
     :param current_user: The currently authenticated user.
     :type current_user: User
@@ -33,13 +48,13 @@ async def get_upcoming_birthdays(db: Session = Depends(get_db),
     bd_contacts = await repository_contacts.get_upcoming_birthdays(current_user, db)
     if not bd_contacts:
         raise HTTPException(status_code=404, detail="No upcoming birthdays")
-    return bd_contacts
+    return contacts_response(bd_contacts)
 
 
-@router.get("/", response_model=List[ContactResponse], description='No more than 10 requests per minute',
-            dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+@router.get("/", response_model=List[ContactResponse], description=describe("contacts:list"),
+            dependencies=[Depends(rate_limit("contacts:list"))])
 async def get_contacts(request: Request,
-                       skip: int = 0, limit: int = 20, db: Session = Depends(get_db),
+                       skip: int = 0, limit: int = 20, db: Session = Depends(get_read_db),
                        current_user: User = Depends(auth_service.get_current_user),
                        first_name: str | None = Query(None), 
                        last_name: str | None = Query(None),
@@ -65,18 +80,18 @@ async def get_contacts(request: Request,
     :type last_name: str, optional
     :param email: Optional filter for the contact's email (supports partial matching).
     :type email: str, optional
-    :raises HTTPException: If the rate limit of 10 requests per minute is exceeded.
+    :raises HTTPException: If the user exceeds the ``contacts:list`` rate limit (429 with Retry-After).
     :return: A list of contacts matching the specified criteria.
     :rtype: List[ContactResponse]
     """
     print(f"Searching for contacts: current_user={current_user.email} first_name={first_name}, last_name={last_name}, email={email}")
     # Використовуємо або пошук, або просто повертаємо контакти
     contacts = await repository_contacts.get_contacts(db, current_user, first_name, last_name, email)
-    return contacts
+    return contacts_response(contacts)
 
 
 @router.get("/{contact_id}", response_model=ContactResponse)
-async def read_contact(contact_id: int, db: Session = Depends(get_db),
+async def read_contact(contact_id: int, db: Session = Depends(get_read_db),
                        current_user: User = Depends(auth_service.get_current_user)):
     """
     Retrieves a single contact by its ID for the authenticated user.
@@ -99,8 +114,8 @@ async def read_contact(contact_id: int, db: Session = Depends(get_db),
     return contact
 
 
-@router.post("/", response_model=ContactResponse, description='No more than 5 new contacts per minute',
-             dependencies=[Depends(RateLimiter(times=5, seconds=60))], status_code=status.HTTP_201_CREATED,
+@router.post("/", response_model=ContactResponse, description=describe("contacts:create"),
+             dependencies=[Depends(rate_limit("contacts:create"))], status_code=status.HTTP_201_CREATED,
              responses={201: {"description": "Contact created", "model": ContactResponse}})
 async def create_contact(request: Request,
                          body: ContactBase, 
@@ -117,14 +132,14 @@ async def create_contact(request: Request,
     :type db: Session
     :param current_user: The currently authenticated user.
     :type current_user: User
-    :raises HTTPException: If the rate limit of 5 requests per minute is exceeded.
+    :raises HTTPException: If the user exceeds the ``contacts:create`` rate limit (429 with Retry-After).
     :param request: The incoming HTTP request.
     :type request: Request
     :return: The newly created contact.
     :rtype: ContactResponse
     """
     new_contact = await repository_contacts.create_contact(body, current_user, db)
-    return ContactResponse.from_orm(new_contact)
+    return new_contact
 
 
 @router.put("/{contact_id}", response_model=ContactResponse) # All fields must be provided when updating a contact
@@ -0,0 +1,89 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from src.database.db import engine, replica_engine, slow_query_log
+from src.database.pool import pool_stats
+from src.middleware.admission import admission_controller
+from src.services.auth import auth_service
+from src.services.metrics import registry
+from src.services.revocation import revocation_list
+
+# службові дані - лише для METRICS_TOKEN або ADMIN_EMAILS
+router = APIRouter(prefix="/metrics", tags=["metrics"], dependencies=[Depends(auth_service.require_admin)])
+
+
+@router.get("", response_class=PlainTextResponse)
+async def get_prometheus_metrics():
+    """
+    Returns the metrics of this worker in the Prometheus text format.
+
+    Includes request latency histograms and counters by route template and status, requests in flight,
+    SQL statements and their time per route, Redis round trips per route and user-cache hits and misses.
+
+    :http method: GET
+    :path: /metrics
+    :return: The metrics page.
+    :rtype: PlainTextResponse
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/pool")
+async def get_pool_metrics():
+    """
+    Returns the connection pool saturation metrics of this worker.
+
+    Includes checkout wait time (average, maximum and histogram buckets), pool timeouts,
+    and the current and peak numbers of connections in use and in overflow.
+
+    :http method: GET
+    :path: /pool
+    :return: The pool metrics of the primary database and, if configured, of the read replica.
+    :rtype: dict
+    """
+    metrics = {"primary": pool_stats(engine)}
+    if replica_engine is not None:
+        metrics["replica"] = pool_stats(replica_engine)
+    return metrics
+
+
+@router.get("/admission")
+async def get_admission_metrics():
+    """
+    Returns the admission-control state of this worker per route group.
+
+    :http method: GET
+    :path: /admission
+    :return: In-flight and queued requests, recent queue delay, admitted and shed counters.
+    :rtype: dict
+    """
+    return admission_controller.snapshot()
+
+
+@router.get("/revocation")
+async def get_revocation_metrics():
+    """
+    Returns the state of the revoked access-token filter of this worker.
+
+    :http method: GET
+    :path: /revocation
+    :return: Whether the filter is loaded, its size, the number of checks and of lookups sent to Redis.
+    :rtype: dict
+    """
+    return revocation_list.stats()
+
+
+@router.get("/slow_queries")
+async def get_slow_queries():
+    """
+    Returns the recent slow SQL statements of this worker, newest first.
+
+    Every entry has the statement, its normalized form, the types of its parameters (not the values),
+    the duration, the database and, for the first occurrences of each statement, its ``EXPLAIN`` plan.
+
+    :http method: GET
+    :path: /slow_queries
+    :return: The threshold, the sample rate, the number of recorded statements and the entries.
+    :rtype: dict
+    """
+    return slow_query_log.snapshot()
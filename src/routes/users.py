@@ -1,18 +1,30 @@
-from fastapi import APIRouter, Depends, status, UploadFile, File
+from fastapi import APIRouter, Depends, status, UploadFile, File, HTTPException
+from PIL import Image
 from sqlalchemy.orm import Session
-import cloudinary
-import cloudinary.uploader
 
 from src.database.db import get_db
 from src.database.models import User
 from src.repository import users as repository_users
 from src.services.auth import auth_service
+from src.services.storage import avatar_url, avatar_urls, read_upload, resize_avatar, store_avatar
 from src.conf.config import settings
 from src.schemas import UserDb
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
+def user_with_avatars(user: User) -> UserDb:
+    """
+    Builds the user response with the URLs of all avatar sizes.
+
+    :param user: The user.
+    :type user: User
+    :return: The user information.
+    :rtype: UserDb
+    """
+    return UserDb.model_validate(user).model_copy(update={"avatars": avatar_urls(user.avatar_hash)})
+
+
 @router.get("/me/", response_model=UserDb)
 async def read_users_me(current_user: User = Depends(auth_service.get_current_user)):
     """
@@ -25,7 +37,7 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
     :return: The current user's information.
     :rtype: UserDb
     """
-    return current_user
+    return user_with_avatars(current_user)
 
 
 @router.patch('/avatar', response_model=UserDb)
@@ -34,6 +46,9 @@ async def update_avatar_user(file: UploadFile = File(), current_user: User = Dep
     """
     Updates the avatar image for the currently authenticated user in the current session.
 
+    The upload is skipped if the file is the user's current avatar or is already stored
+    for another user (avatars are stored under the SHA-256 of their content).
+
     :http method: PATCH
     :path: /avatar
     :param file: The file to be uploaded as the user's avatar.
@@ -42,18 +57,27 @@ async def update_avatar_user(file: UploadFile = File(), current_user: User = Dep
     :type current_user: User
     :param db: The database session.
     :type db: Session
+    :raises HTTPException: If the file is too large (413) or is not an image (400).
     :return: The updated user information with the new avatar.
     :rtype: UserDb
     """
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
-    )
-
-    r = cloudinary.uploader.upload(file.file, public_id=f'ContactsApp/{current_user.username}', overwrite=True)
-    src_url = cloudinary.CloudinaryImage(f'ContactsApp/{current_user.username}')\
-                        .build_url(width=250, height=250, crop='fill', version=r.get('version'))
-    user = await repository_users.update_avatar(current_user.email, src_url, db)
-    return user
\ No newline at end of file
+    data, avatar_hash = await read_upload(file, settings.avatar_max_bytes + 1)
+    if len(data) > settings.avatar_max_bytes:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File is too large")
+    user = await repository_users.get_user_by_email(current_user.email, db)
+    if user.avatar_hash == avatar_hash:  # той самий файл, що вже стоїть - нічого не завантажуємо
+        return user_with_avatars(user)
+    if await repository_users.avatar_exists(avatar_hash, db):  # такий файл вже є у сховищі (ключ - хеш вмісту)
+        src_url = avatar_url(avatar_hash)
+    else:
+        try:
+            # зменшуємо в окремому процесі, а завантажуємо в окремому потоці - event loop не блокується
+            images = await resize_avatar(data)
+        except Image.DecompressionBombError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Image is too large")
+        except OSError:  # UnidentifiedImageError, обрізаний або пошкоджений файл
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File is not an image")
+        src_url = await store_avatar(avatar_hash, images)
+    user = await repository_users.update_avatar(current_user.email, src_url, db, avatar_hash=avatar_hash)
+    auth_service.forget_user(current_user.email)
+    return user_with_avatars(user)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, TypeAdapter
 from typing import Optional
 from datetime import date, datetime
 
@@ -13,6 +13,7 @@ class ContactBase(BaseModel): # визначає поля класу Contacts
 
 
 class ContactResponse(ContactBase): # модель відповіді при поверненні даних Contacts клієнту
+    email: str # мейл вже перевірений при збереженні; повторна перевірка EmailStr на кожен контакт у відповіді - найдорожча частина серіалізації
     id: int
     created_at: datetime
     owner_id: int
@@ -21,6 +22,10 @@ class ContactResponse(ContactBase): # модель відповіді при п
         from_attributes = True # цей атрибут використовується для увімкнення режиму ORM для цієї моделі
 
 
+# побудований один раз валідатор/серіалізатор списків контактів (замість from_orm для кожного елемента)
+contact_list_adapter = TypeAdapter(list[ContactResponse])
+
+
 class ContactUpdate(ContactBase): # для оновлення контакту.
     first_name: Optional[str] # всі поля optional - щоб можна було оновити вибіркові поля
     last_name: Optional[str]
@@ -46,6 +51,7 @@ class UserDb(BaseModel):
     email: str
     created_at: datetime
     avatar: str
+    avatars: dict[int, str] = {}  # URL аватарки кожного розміру, напр. 32x32 для списків контактів
 
     class Config:
         from_attributes = True
@@ -1,18 +1,35 @@
+import asyncio
+import hmac
+import math
 import pickle
+import random
+import time
+import uuid
 from typing import Optional
 
 import redis
-from jose import JWTError, jwt
+from jose import JWTError
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 
-from src.database.db import get_db
+from src.database.db import get_read_db
 from src.repository import users as repository_users
 
 from src.conf.config import settings
+from src.services.jwt_keys import key_ring
+from src.services.metrics import instrumented_redis, observe_user_cache
+from src.services.revocation import REVOKED_CHANNEL, REVOKED_KEY, revocation_list
+
+# видаляє лок, лише якщо він досі наш: протухлий лок міг уже взяти інший воркер
+RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
 
 
 class Auth:
@@ -22,11 +39,14 @@ class Auth:
     This class provides methods for password hashing, generating access/refresh tokens,
     decoding tokens, and verifying user identity through email confirmation.
     """
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-    SECRET_KEY = settings.secret_key
-    ALGORITHM = settings.algorithm
+    # хеші з іншою кількістю раундів вважаються застарілими і перераховуються при вході (verify_and_update)
+    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds,
+                               bcrypt__min_rounds=settings.bcrypt_rounds, bcrypt__max_rounds=settings.bcrypt_rounds)
+    keys = key_ring  # ключі підпису токенів (kid у заголовку), див. src/services/jwt_keys.py
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    r = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+    r = instrumented_redis(host=settings.redis_host, port=settings.redis_port, db=0)
+    user_loads: dict[str, asyncio.Future] = {}  # завантаження юзерів з бази, що зараз виконуються в цьому процесі
+    user_load_time = 0.05  # оцінка (EWMA) часу завантаження юзера з бази, секунд
 
     def verify_password(self, plain_password, hashed_password):
         """
@@ -41,6 +61,20 @@ class Auth:
         """
         return self.pwd_context.verify(plain_password, hashed_password)
 
+    def verify_and_update_password(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """
+        Verifies the password and, if it matches a hash of stale parameters (other bcrypt rounds),
+        hashes it again with the current ones.
+
+        :param plain_password: The password provided by the user.
+        :type plain_password: str
+        :param hashed_password: The stored hashed password.
+        :type hashed_password: str
+        :return: Whether the password matches, and the new hash to store or None.
+        :rtype: tuple[bool, str | None]
+        """
+        return self.pwd_context.verify_and_update(plain_password, hashed_password)
+
     def get_password_hash(self, password: str):
         """
         Hashes the password using the bcrypt algorithm.
@@ -55,7 +89,7 @@ class Auth:
     # define a function to generate a new access token
     async def create_access_token(self, data: dict, expires_delta: Optional[float] = None):
         """
-        Creates an access token for the user.
+        Creates an access token for the user. Every token gets a unique ``jti``, by which it can be revoked.
 
         :param data: The data to encode in the access token (e.g., user information).
         :type data: dict
@@ -69,8 +103,8 @@ class Auth:
             expire = datetime.utcnow() + timedelta(seconds=expires_delta)
         else:
             expire = datetime.utcnow() + timedelta(minutes=15)
-        to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "access_token"})
-        encoded_access_token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "access_token", "jti": uuid.uuid4().hex})
+        encoded_access_token = self.keys.encode(to_encode)
         return encoded_access_token
 
     # define a function to generate a new refresh token
@@ -81,7 +115,7 @@ class Auth:
         :param data: The data to encode in the refresh token (e.g., user information).
         :type data: dict
         :param expires_delta: The expiration time for the refresh token in seconds (optional).
-                            If not provided, the token will expire in 7 days.
+                            If not provided, the token will expire in ``REFRESH_TOKEN_TTL`` seconds (7 days).
         :type expires_delta: Optional[float]
         :return: The encoded refresh token.
         :rtype: str
@@ -90,9 +124,9 @@ class Auth:
         if expires_delta:
             expire = datetime.utcnow() + timedelta(seconds=expires_delta)
         else:
-            expire = datetime.utcnow() + timedelta(days=7)
+            expire = datetime.utcnow() + timedelta(seconds=settings.refresh_token_ttl)
         to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"})
-        encoded_refresh_token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        encoded_refresh_token = self.keys.encode(to_encode)
         return encoded_refresh_token
 
     async def decode_refresh_token(self, refresh_token: str):
@@ -106,7 +140,7 @@ class Auth:
         :raises HTTPException: If the token is invalid or has an invalid scope.
         """
         try:
-            payload = jwt.decode(refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.keys.decode(refresh_token)
             if payload['scope'] == 'refresh_token':
                 email = payload['sub']
                 return email
@@ -114,7 +148,78 @@ class Auth:
         except JWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate credentials')
 
-    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    async def issue_refresh_token(self, email: str, uid: int, family: str | None = None) -> str:
+        """
+        Creates a refresh token and registers it in Redis as the only valid token of its family.
+
+        A family is one login session: it starts at login and every refresh replaces its token with a new one.
+        A user can have many families (devices) at once; they are listed in ``refresh_sessions:{email}``.
+
+        :param email: The email of the user.
+        :type email: str
+        :param uid: The id of the user.
+        :type uid: int
+        :param family: The family to continue, or None to start a new session.
+        :type family: str | None
+        :return: The encoded refresh token.
+        :rtype: str
+        """
+        family = family or uuid.uuid4().hex
+        jti = uuid.uuid4().hex
+        token = await self.create_refresh_token(data={"sub": email, "uid": uid, "fid": family, "jti": jti})
+        ttl = settings.refresh_token_ttl
+        pipe = self.r.pipeline()
+        pipe.set(f"refresh_token:{jti}", family, ex=ttl)
+        pipe.set(f"refresh_family:{family}", jti, ex=ttl)
+        pipe.sadd(f"refresh_sessions:{email}", family)
+        pipe.expire(f"refresh_sessions:{email}", ttl)
+        pipe.execute()
+        return token
+
+    async def rotate_refresh_token(self, refresh_token: str) -> tuple[str, int, str]:
+        """
+        Exchanges a refresh token for a new one of the same family.
+
+        The old token is consumed with an atomic ``GETDEL``, so of two concurrent refreshes with the same token
+        only one succeeds. A token that was already used means it was stolen (or replayed): the whole family
+        is revoked and the user has to log in again on that device.
+
+        :param refresh_token: The refresh token presented by the client.
+        :type refresh_token: str
+        :raises HTTPException: If the token is invalid, expired, already used or revoked.
+        :return: The email and id of the user, and the new refresh token.
+        :rtype: tuple[str, int, str]
+        """
+        try:
+            payload = self.keys.decode(refresh_token)
+        except JWTError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate credentials')
+        if payload.get('scope') != 'refresh_token':
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid scope for token')
+        email, uid, family, jti = payload['sub'], payload.get('uid'), payload.get('fid'), payload.get('jti')
+        if not family or not jti or self.r.getdel(f"refresh_token:{jti}") is None:
+            if family:  # повторне використання - відкликаємо всю сесію
+                self.revoke_refresh_family(email, family)
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+        return email, uid, await self.issue_refresh_token(email, uid, family)
+
+    def revoke_refresh_family(self, email: str, family: str) -> None:
+        """
+        Revokes one login session: its current refresh token stops working.
+
+        :param email: The email of the user.
+        :type email: str
+        :param family: The family id of the session.
+        :type family: str
+        """
+        jti = self.r.getdel(f"refresh_family:{family}")
+        pipe = self.r.pipeline()
+        if jti is not None:
+            pipe.delete(f"refresh_token:{jti.decode()}")
+        pipe.srem(f"refresh_sessions:{email}", family)
+        pipe.execute()
+
+    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)):
         """
         Retrieves the current user based on the provided access token.
 
@@ -124,7 +229,7 @@ class Auth:
 
         :param token: The access token provided by the user.
         :type token: str
-        :param db: The database session dependency.
+        :param db: The read-only database session dependency.
         :type db: Session
         :raises HTTPException: If the token is invalid or the user is not found.
         :return: The user object.
@@ -138,7 +243,7 @@ class Auth:
 
         try:
             # Decode JWT
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.keys.decode(token)
             if payload['scope'] == 'access_token':
                 email = payload["sub"]
                 if email is None:
@@ -147,18 +252,197 @@ class Auth:
                 raise credentials_exception
         except JWTError as e:
             raise credentials_exception
+        if self.is_access_token_revoked(payload.get("jti")):
+            raise credentials_exception
 
-        user = self.r.get(f"user:{email}")
+        user = await self.get_cached_user(email, db)
         if user is None:
-            user = await repository_users.get_user_by_email(email, db)
-            if user is None:
-                raise credentials_exception
-            self.r.set(f"user:{email}", pickle.dumps(user))
-            self.r.expire(f"user:{email}", 900)
+            raise credentials_exception
+        return user
+
+    async def require_admin(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)) -> None:
+        """
+        Allows the request only to an administrator: a client with the ``METRICS_TOKEN`` bearer token
+        (e.g. the Prometheus scraper), or a user whose email is in ``ADMIN_EMAILS``.
+
+        :param token: The bearer token of the request.
+        :type token: str
+        :param db: The read-only database session dependency.
+        :type db: Session
+        :raises HTTPException: 401 if the token is missing or invalid, 403 if the user is not an administrator.
+        """
+        if settings.metrics_token and hmac.compare_digest(token.encode(), settings.metrics_token.encode()):
+            return
+        user = await self.get_current_user(token, db)
+        if user.email.lower() not in {email.lower() for email in settings.admin_emails}:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+
+    async def revoke_token(self, token: str) -> None:
+        """
+        Validates an access token and revokes it.
+
+        :param token: The access token.
+        :type token: str
+        :raises HTTPException: If the token is invalid, has no ``jti`` or is already revoked.
+        """
+        try:
+            payload = self.keys.decode(token)
+        except JWTError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+        jti = payload.get("jti")
+        if payload.get("scope") != "access_token" or not jti or self.is_access_token_revoked(jti):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+        self.revoke_access_token(jti, payload["exp"])
+
+    def revoke_access_token(self, jti: str, exp: float) -> None:
+        """
+        Revokes an access token before it expires.
+
+        The id is kept in Redis until the token would expire anyway and is published to the other workers,
+        which add it to their :data:`~src.services.revocation.revocation_list`.
+
+        :param jti: The id of the access token.
+        :type jti: str
+        :param exp: The expiration time of the token (Unix timestamp).
+        :type exp: float
+        """
+        ttl = max(math.ceil(exp - time.time()), 1)
+        pipe = self.r.pipeline()
+        pipe.set(f"{REVOKED_KEY}{jti}", 1, ex=ttl)
+        pipe.publish(REVOKED_CHANNEL, jti)
+        pipe.execute()
+        revocation_list.add(jti)
+
+    def is_access_token_revoked(self, jti: str | None) -> bool:
+        """
+        Checks whether the access token was revoked. Redis is queried only if the local Bloom filter
+        can't rule the token out.
+
+        :param jti: The id of the access token, or None for tokens issued without one.
+        :type jti: str | None
+        :return: True if the token is revoked.
+        :rtype: bool
+        """
+        if not jti or not revocation_list.might_contain(jti):
+            return False
+        return bool(self.r.exists(f"{REVOKED_KEY}{jti}"))
+
+    def should_refresh_early(self, ttl: int) -> bool:
+        """
+        Decides whether a cache hit should reload the user before the entry expires.
+
+        The probability grows as the remaining TTL approaches the time the reload takes
+        (probabilistic early expiration), so concurrent requests don't all miss at the same moment.
+
+        :param ttl: Remaining TTL of the cache entry in seconds (negative if it has none).
+        :type ttl: int
+        :return: True if this request should reload the user.
+        :rtype: bool
+        """
+        beta = settings.user_cache_early_refresh_beta
+        if beta <= 0 or ttl < 0:
+            return False
+        return ttl <= -self.user_load_time * beta * math.log(1 - random.random())
+
+    async def get_cached_user(self, email: str, db: Session):
+        """
+        Returns the user from the Redis cache, loading it from the database on a miss.
+
+        :param email: The email of the user.
+        :type email: str
+        :param db: The database session used on a cache miss.
+        :type db: Session
+        :return: The user object, or None if the user does not exist.
+        :rtype: User | None
+        """
+        pipe = self.r.pipeline()
+        pipe.get(f"user:{email}")
+        pipe.ttl(f"user:{email}")
+        cached, ttl = pipe.execute()
+        observe_user_cache(cached is not None)
+        if cached is None:
+            return await self.load_user(email, db)
+        user = pickle.loads(cached)
+        if self.should_refresh_early(ttl):
+            return await self.load_user(email, db, stale=user)
+        return user
+
+    async def load_user(self, email: str, db: Session, stale=None):
+        """
+        Loads the user from the database and caches it, once per email at a time (single-flight).
+
+        Concurrent calls for the same email in this process wait for the first one instead of querying
+        the database, and each gets its own detached copy of the user (unpickled from the cached bytes):
+        the loaded object belongs to the session of the first request, which may commit or close it.
+        With ``USER_CACHE_LOCK_MS`` set, workers also take a short Redis lock: a worker that doesn't get it
+        returns the stale user, if any, or waits for the lock holder to fill the cache.
+
+        :param email: The email of the user.
+        :type email: str
+        :param db: The database session.
+        :type db: Session
+        :param stale: The cached user being refreshed early, if any.
+        :type stale: User | None
+        :return: The user object, or None if the user does not exist.
+        :rtype: User | None
+        """
+        loading = self.user_loads.get(email)
+        if loading is not None:
+            pickled = await asyncio.shield(loading)
+            return pickle.loads(pickled) if pickled is not None else None
+        loading = self.user_loads[email] = asyncio.get_running_loop().create_future()
+        loading.add_done_callback(lambda future: future.cancelled() or future.exception())
+        try:
+            user, pickled = await self.load_user_once(email, db, stale)
+        except BaseException as err:
+            loading.set_exception(err)
+            raise
         else:
-            user = pickle.loads(user)
+            loading.set_result(pickled)
+        finally:
+            del self.user_loads[email]
         return user
-    
+
+    async def load_user_once(self, email: str, db: Session, stale=None):
+        """
+        Loads the user under the optional Redis lock.
+
+        :return: The user and its pickled form for the waiting requests (None if the user does not exist).
+        :rtype: tuple[User | None, bytes | None]
+        """
+        lock_key, token = f"lock:user:{email}", uuid.uuid4().hex
+        lock_ms = settings.user_cache_lock_ms
+        if lock_ms and not self.r.set(lock_key, token, nx=True, px=lock_ms):
+            if stale is not None:  # кеш оновлює інший воркер
+                return stale, pickle.dumps(stale)
+            deadline = time.monotonic() + lock_ms / 1000
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.02)
+                cached = self.r.get(f"user:{email}")
+                if cached is not None:
+                    return pickle.loads(cached), cached
+            # лок протух, а кеш порожній - завантажуємо самі
+        try:
+            start = time.monotonic()
+            user = await repository_users.get_user_by_email(email, db)
+            self.user_load_time = self.user_load_time * 0.8 + (time.monotonic() - start) * 0.2
+            if user is None:
+                return None, None
+            pickled = pickle.dumps(user)
+            self.r.set(f"user:{email}", pickled, ex=settings.user_cache_ttl)
+            return user, pickled
+        finally:
+            if lock_ms:
+                self.r.eval(RELEASE_LOCK, 1, lock_key, token)
+
+    def forget_user(self, email: str) -> None:
+        """
+        Drops the cached user, so the next request loads the updated row from the database.
+
+        :param email: The email of the user.
+        :type email: str
+        """
+        self.r.delete(f"user:{email}")
 
     def create_email_token(self, data: dict):
         """
@@ -174,7 +458,7 @@ class Auth:
         to_encode = data.copy()
         expire = datetime.utcnow() + timedelta(days=7)
         to_encode.update({"iat": datetime.utcnow(), "exp": expire})
-        token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        token = self.keys.encode(to_encode)
         return token
     
 
@@ -189,7 +473,7 @@ class Auth:
         :rtype: str
         """
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.keys.decode(token)
             email = payload["sub"]
             return email
         except JWTError as e:
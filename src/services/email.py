@@ -1,10 +1,14 @@
-from pathlib import Path
+from email.message import EmailMessage
+from email.utils import formataddr
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+from fastapi_mail import ConnectionConfig
 from pydantic import EmailStr
+from sqlalchemy.orm import Session
 
+from src.repository import outbox as repository_outbox
 from src.services.auth import auth_service
+from src.services.email_templates import TEMPLATE_FOLDER, render
+from src.services.mail_dispatcher import MailDispatcher
 from src.conf.config import settings
 
 conf = ConnectionConfig(
@@ -18,35 +22,95 @@ conf = ConnectionConfig(
     MAIL_SSL_TLS=True,
     USE_CREDENTIALS=True,
     VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
+    TEMPLATE_FOLDER=TEMPLATE_FOLDER,
 )
 
+mail_dispatcher = MailDispatcher(
+    hostname=conf.MAIL_SERVER,
+    port=conf.MAIL_PORT,
+    username=conf.MAIL_USERNAME if conf.USE_CREDENTIALS else None,
+    password=conf.MAIL_PASSWORD if conf.USE_CREDENTIALS else None,
+    use_tls=conf.MAIL_SSL_TLS,
+    start_tls=conf.MAIL_STARTTLS,
+    validate_certs=conf.VALIDATE_CERTS,
+    timeout=conf.TIMEOUT,
+    pool_size=settings.mail_pool_size,
+    batch_size=settings.mail_batch_size,
+    queue_size=settings.mail_queue_size,
+    idle_timeout=settings.mail_idle_timeout,
+)
+
+
+def build_message(recipient: str, subject: str, html: str) -> EmailMessage:
+    """
+    Builds an HTML email from the configured sender.
+
+    :param recipient: The recipient's email address.
+    :type recipient: str
+    :param subject: The subject of the email.
+    :type subject: str
+    :param html: The HTML body.
+    :type html: str
+    :return: The message ready for :data:`mail_dispatcher`.
+    :rtype: EmailMessage
+    """
+    message = EmailMessage()
+    message["From"] = formataddr((conf.MAIL_FROM_NAME or "", conf.MAIL_FROM))
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(html, subtype="html")
+    return message
+
+
+def build_confirmation_email(email: str, username: str, host: str) -> EmailMessage:
+    """
+    Builds the email with a confirmation link.
+
+    :param email: The recipient's email address.
+    :type email: str
+    :param username: The username of the recipient.
+    :type username: str
+    :param host: The base URL of the application, used to construct the confirmation link.
+    :type host: str
+    :return: The confirmation email.
+    :rtype: EmailMessage
+    """
+    token_verification = auth_service.create_email_token({"sub": email})
+    html = render("email_template.html", host=host, username=username, token=token_verification)
+    return build_message(email, "Confirm your email ", html)
+
+
+def build_birthday_digest_email(email: str, username: str, contacts: list[dict]) -> EmailMessage:
+    """
+    Builds the daily email with the upcoming birthdays of the user's contacts.
 
-async def send_email(email: EmailStr, username: str, host: str):
+    :param email: The recipient's email address.
+    :type email: str
+    :param username: The username of the recipient.
+    :type username: str
+    :param contacts: The contacts with ``first_name``, ``last_name``, ``email`` and ``date`` of the birthday.
+    :type contacts: list[dict]
+    :return: The digest email.
+    :rtype: EmailMessage
+    """
+    html = render("birthday_digest.html", username=username, contacts=contacts)
+    return build_message(email, "Upcoming birthdays of your contacts", html)
+
+
+async def send_email(email: EmailStr, username: str, host: str, db: Session) -> None:
     """
-    Sends an email to the specified recipient with a confirmation link.
+    Queues an email with a confirmation link to the specified recipient.
 
-    This function generates an email verification token, formats the email content 
-    using an HTML template, and sends it to the recipient's email address.
+    The email is added to the outbox and committed; the outbox worker (:mod:`src.workers.outbox`) builds it
+    with :func:`build_confirmation_email` and sends it over the shared SMTP connections of :data:`mail_dispatcher`.
 
     :param email: The recipient's email address.
     :type email: EmailStr
     :param username: The username of the recipient.
-    :type username: str 
+    :type username: str
     :param host: The base URL of the application, used to construct the confirmation link.
     :type host: str
-    :raises ConnectionErrors: If there is an issue with the email server connection.
-    """
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": token_verification},
-            subtype=MessageType.html
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
-        print(err)
+    :param db: The database session.
+    :type db: Session
+    """
+    await repository_outbox.create_email(email, "confirm_email", {"username": username, "host": host}, db)
@@ -0,0 +1,75 @@
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template, select_autoescape
+
+from src.conf.config import settings
+
+TEMPLATE_FOLDER = Path(__file__).parent / 'templates'
+
+# одне спільне середовище на процес: шаблони компілюються один раз, а байткод кешується на диску,
+# тож новий воркер не парсить шаблони заново
+template_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_FOLDER),
+    bytecode_cache=FileSystemBytecodeCache(settings.email_template_cache_dir),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+    cache_size=-1,
+)
+
+
+def load_templates() -> list[str]:
+    """
+    Compiles all email templates, so the first email doesn't pay for it. Called once when a worker starts.
+
+    :return: The names of the loaded templates.
+    :rtype: list[str]
+    """
+    names = template_env.list_templates()
+    for name in names:
+        template_env.get_template(name)
+    return names
+
+
+def get_template(name: str) -> Template:
+    """
+    Returns a compiled template from the shared environment.
+
+    :param name: The file name of the template, e.g. ``"email_template.html"``.
+    :type name: str
+    :return: The compiled template.
+    :rtype: Template
+    """
+    return template_env.get_template(name)
+
+
+def render(name: str, **context) -> str:
+    """
+    Renders one email.
+
+    :param name: The file name of the template.
+    :type name: str
+    :param context: The template variables.
+    :return: The rendered email body.
+    :rtype: str
+    """
+    return get_template(name).render(**context)
+
+
+def render_many(name: str, contexts: Iterable[dict]) -> Iterator[str]:
+    """
+    Renders the same template for many recipients (e.g. birthday reminders).
+
+    The template is looked up once and the bodies are produced lazily, so a mass send can stream them
+    to the outbox or the mail dispatcher without holding all of them in memory.
+
+    :param name: The file name of the template.
+    :type name: str
+    :param contexts: The template variables of every email.
+    :type contexts: Iterable[dict]
+    :return: The rendered bodies, in the order of ``contexts``.
+    :rtype: Iterator[str]
+    """
+    render_template = get_template(name).render
+    for context in contexts:
+        yield render_template(context)
@@ -0,0 +1,102 @@
+from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
+
+from src.conf.config import JwtKey, settings
+
+DEFAULT_KID = "default"
+
+
+class SigningKey:
+    """
+    One key of the ring, parsed once: the signer (None for verify-only keys) and the verifier.
+    """
+    def __init__(self, config: JwtKey):
+        self.kid = config.kid
+        self.algorithm = config.algorithm
+        self.symmetric = config.algorithm.startswith("HS")
+        if config.key is None and (self.symmetric or config.public_key is None):
+            raise ValueError(f"JWT key {config.kid!r} has neither a key nor a public key")
+        self.signer: Key | None = jwk.construct(config.key, config.algorithm) if config.key is not None else None
+        if self.symmetric:
+            self.verifier = self.signer
+        elif config.public_key is not None:
+            self.verifier = jwk.construct(config.public_key, config.algorithm)
+        else:
+            self.verifier = self.signer.public_key()
+
+
+class KeyRing:
+    """
+    The keys that sign and verify tokens, kept in memory as parsed key objects.
+
+    New tokens are signed with the active key and carry its id in the ``kid`` header. Every key of the ring
+    verifies tokens, so a key can be rotated without invalidating the sessions signed with the previous one.
+    Tokens without ``kid`` were issued before the ring existed; they are verified with the ``default`` key.
+    """
+    def __init__(self, keys: list[JwtKey], active_kid: str | None = None):
+        """
+        :param keys: The keys of the ring.
+        :type keys: list[JwtKey]
+        :param active_kid: The id of the key that signs new tokens; the first key if None.
+        :type active_kid: str | None
+        :raises ValueError: If the active key is unknown or can't sign.
+        """
+        self.keys = {config.kid: SigningKey(config) for config in keys}
+        self.active = self.keys.get(active_kid or keys[0].kid)
+        if self.active is None or self.active.signer is None:
+            raise ValueError(f"JWT key {active_kid!r} can't sign tokens")
+
+    def encode(self, claims: dict) -> str:
+        """
+        Signs the claims with the active key.
+
+        :param claims: The claims of the token.
+        :type claims: dict
+        :return: The encoded token.
+        :rtype: str
+        """
+        return jwt.encode(claims, self.active.signer, algorithm=self.active.algorithm,
+                          headers={"kid": self.active.kid})
+
+    def decode(self, token: str) -> dict:
+        """
+        Verifies the token with the key named in its ``kid`` header and returns its claims.
+
+        :param token: The encoded token.
+        :type token: str
+        :raises JWTError: If the token is malformed, expired, signed with an unknown key or has a bad signature.
+        :return: The claims of the token.
+        :rtype: dict
+        """
+        kid = jwt.get_unverified_header(token).get("kid", DEFAULT_KID)
+        key = self.keys.get(kid)
+        if key is None:
+            raise JWTError(f"Unknown signing key {kid!r}")
+        return jwt.decode(token, key.verifier, algorithms=[key.algorithm])
+
+    def jwks(self) -> dict:
+        """
+        Returns the public keys of the ring as a JWK set, so other services can verify tokens themselves.
+        Symmetric keys are secret and are never included.
+
+        :return: The JWK set.
+        :rtype: dict
+        """
+        return {"keys": [{**key.verifier.to_dict(), "kid": key.kid, "alg": key.algorithm, "use": "sig"}
+                         for key in self.keys.values() if not key.symmetric]}
+
+
+def create_key_ring() -> KeyRing:
+    """
+    Creates the key ring from ``JWT_KEYS`` and ``JWT_ACTIVE_KID``, or a ring of the single
+    ``SECRET_KEY``/``ALGORITHM`` key if ``JWT_KEYS`` is empty.
+
+    :return: The key ring.
+    :rtype: KeyRing
+    """
+    if settings.jwt_keys:
+        return KeyRing(settings.jwt_keys, settings.jwt_active_kid)
+    return KeyRing([JwtKey(kid=DEFAULT_KID, algorithm=settings.algorithm, key=settings.secret_key)])
+
+
+key_ring = create_key_ring()
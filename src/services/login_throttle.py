@@ -0,0 +1,133 @@
+import math
+
+import redis
+
+from src.conf.config import settings
+from src.services.metrics import instrumented_redis
+
+
+class LoginThrottle:
+    """
+    Counts failed logins per account and client IP pair and per client IP in Redis and blocks further attempts
+    with exponential backoff.
+
+    After ``free_attempts`` failures of an account from one IP (or of an IP, with its own, higher, allowance)
+    every further failure blocks it for ``backoff_base * 2 ** (failures - free_attempts - 1)`` seconds, up to
+    ``backoff_max``. The account is blocked only for the IP the failures come from, so an attacker cannot lock
+    the owner out of their account. An attack on one account from many IPs is caught by a second, per-account
+    counter of failures from all IPs: over ``account_total_free_attempts`` every login into the account is
+    delayed by the same backoff, up to ``delay_max`` seconds, instead of being rejected - it slows the attack
+    down while the owner can still log in. :meth:`check` is one Redis round trip, done before the user is loaded
+    or the password is hashed, so an attack costs neither database queries nor bcrypt time. Failure counters
+    expire ``window`` seconds after the last failure; a successful login resets the counter of the account from
+    that IP, but neither the total of the account nor the counter of the IP.
+    """
+    def __init__(self, r: redis.Redis, account_free_attempts: int = settings.login_account_free_attempts,
+                 ip_free_attempts: int = settings.login_ip_free_attempts,
+                 account_total_free_attempts: int = settings.login_account_total_free_attempts,
+                 backoff_base: float = settings.login_backoff_base,
+                 backoff_max: float = settings.login_backoff_max, delay_max: float = settings.login_account_delay_max,
+                 window: int = settings.login_failure_window):
+        """
+        :param r: The Redis client.
+        :type r: redis.Redis
+        :param account_free_attempts: Failures of one account from one IP before it is blocked for that IP.
+        :type account_free_attempts: int
+        :param ip_free_attempts: Failures from one IP before it is blocked.
+        :type ip_free_attempts: int
+        :param account_total_free_attempts: Failures of one account from all IPs before its logins are delayed.
+        :type account_total_free_attempts: int
+        :param backoff_base: The first block in seconds; doubles with every further failure.
+        :type backoff_base: float
+        :param backoff_max: The longest block in seconds.
+        :type backoff_max: float
+        :param delay_max: The longest delay of a login into an account attacked from many IPs, in seconds.
+        :type delay_max: float
+        :param window: Seconds after the last failure when the counters are forgotten.
+        :type window: int
+        """
+        self.r = r
+        self.free_attempts = {"account": account_free_attempts, "ip": ip_free_attempts}
+        self.account_total_free_attempts = account_total_free_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.delay_max = delay_max
+        self.window = window
+
+    @staticmethod
+    def subjects(email: str, ip: str) -> dict[str, str]:
+        return {"account": f"{email.strip().lower()}:{ip}", "ip": ip}
+
+    @staticmethod
+    def total_key(email: str) -> str:
+        return f"login_failures:account_total:{email.strip().lower()}"
+
+    def check(self, email: str, ip: str) -> tuple[float, float]:
+        """
+        Checks whether the account is blocked for the IP or the IP is blocked, and how much the login into
+        the account is delayed.
+
+        :param email: The email the client tries to log in with.
+        :type email: str
+        :param ip: The client IP address.
+        :type ip: str
+        :return: 0 if the attempt is allowed, otherwise the number of seconds until it is; and the number of
+            seconds to wait before checking the password (0 unless the account is attacked from many IPs).
+        :rtype: tuple[float, float]
+        """
+        pipe = self.r.pipeline(transaction=False)
+        for kind, subject in self.subjects(email, ip).items():
+            pipe.pttl(f"login_block:{kind}:{subject}")
+        pipe.get(self.total_key(email))
+        *blocks, total = pipe.execute()
+        total = int(total or 0)
+        delay = 0.0
+        if total > self.account_total_free_attempts:
+            delay = min(self.delay_max, self.backoff(total, self.account_total_free_attempts))
+        return max(0, *blocks) / 1000, delay
+
+    def backoff(self, failures: int, free_attempts: int) -> float:
+        return min(self.backoff_max, self.backoff_base * 2 ** (failures - free_attempts - 1))
+
+    def record_failure(self, email: str, ip: str) -> float:
+        """
+        Counts a failed login and blocks the account for the IP and the IP if they are over their allowance.
+
+        :param email: The email the client tried to log in with.
+        :type email: str
+        :param ip: The client IP address.
+        :type ip: str
+        :return: 0, or the number of seconds the client now has to wait.
+        :rtype: float
+        """
+        subjects = self.subjects(email, ip)
+        pipe = self.r.pipeline(transaction=False)
+        for kind, subject in subjects.items():
+            pipe.incr(f"login_failures:{kind}:{subject}")
+            pipe.expire(f"login_failures:{kind}:{subject}", self.window)
+        pipe.incr(self.total_key(email))
+        pipe.expire(self.total_key(email), self.window)
+        counts = pipe.execute()[:4:2]
+        retry_after = 0.0
+        for (kind, subject), failures in zip(subjects.items(), counts):
+            if failures > self.free_attempts[kind]:
+                delay = self.backoff(failures, self.free_attempts[kind])
+                pipe.set(f"login_block:{kind}:{subject}", 1, px=math.ceil(delay * 1000))
+                retry_after = max(retry_after, delay)
+        pipe.execute()
+        return retry_after
+
+    def record_success(self, email: str, ip: str) -> None:
+        """
+        Resets the failure counter of the account from the IP after a successful login.
+
+        :param email: The email of the account.
+        :type email: str
+        :param ip: The client IP address.
+        :type ip: str
+        """
+        account = self.subjects(email, ip)["account"]
+        self.r.delete(f"login_failures:account:{account}", f"login_block:account:{account}")
+
+
+login_throttle = LoginThrottle(instrumented_redis(host=settings.redis_host, port=settings.redis_port, db=0))
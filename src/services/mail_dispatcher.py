@@ -0,0 +1,188 @@
+import asyncio
+from email.message import EmailMessage
+
+import aiosmtplib
+
+
+class MailDispatcher:
+    """
+    Sends outgoing emails over a small pool of persistent SMTP connections.
+
+    Messages are put into a bounded queue. Each of ``pool_size`` workers keeps one SMTP connection open
+    and sends up to ``batch_size`` queued messages over it at a time, so a burst of signups costs
+    ``pool_size`` TLS handshakes instead of one per email. When the queue is full, :meth:`submit` waits
+    until the workers catch up (backpressure). A connection idle for ``idle_timeout`` seconds is closed.
+    """
+    def __init__(self, hostname: str, port: int, username: str | None = None, password: str | None = None,
+                 use_tls: bool = False, start_tls: bool = False, validate_certs: bool = True, timeout: float = 60,
+                 pool_size: int = 2, batch_size: int = 20, queue_size: int = 1000, idle_timeout: float = 30):
+        """
+        :param hostname: The SMTP server host.
+        :type hostname: str
+        :param port: The SMTP server port.
+        :type port: int
+        :param username: The SMTP login, or None to send without authentication.
+        :type username: str | None
+        :param password: The SMTP password.
+        :type password: str | None
+        :param use_tls: Connect over implicit TLS.
+        :type use_tls: bool
+        :param start_tls: Upgrade the connection with STARTTLS.
+        :type start_tls: bool
+        :param validate_certs: Validate the server certificate.
+        :type validate_certs: bool
+        :param timeout: Timeout of SMTP operations in seconds.
+        :type timeout: float
+        :param pool_size: Number of SMTP connections (and workers).
+        :type pool_size: int
+        :param batch_size: Maximum number of messages a worker sends in one go.
+        :type batch_size: int
+        :param queue_size: Maximum number of queued messages before :meth:`submit` waits.
+        :type queue_size: int
+        :param idle_timeout: Seconds after which an unused connection is closed.
+        :type idle_timeout: float
+        """
+        self.smtp_options = dict(hostname=hostname, port=port, username=username, password=password,
+                                 use_tls=use_tls, start_tls=start_tls, validate_certs=validate_certs,
+                                 timeout=timeout)
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.idle_timeout = idle_timeout
+        self.queue: asyncio.Queue | None = None
+        self.workers: list[asyncio.Task] = []
+        self.sent = 0
+        self.failed = 0
+        self.connections = 0
+
+    async def start(self) -> None:
+        """
+        Starts the workers. Called on application startup; :meth:`submit` also starts them if needed.
+        """
+        if self.workers:
+            return
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.workers = [asyncio.create_task(self.worker()) for _ in range(self.pool_size)]
+
+    async def close(self) -> None:
+        """
+        Sends the queued messages, then stops the workers and closes their connections.
+        """
+        if not self.workers:
+            return
+        await self.queue.join()
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def submit(self, message: EmailMessage) -> None:
+        """
+        Queues a message for delivery, waiting while the queue is full.
+
+        :param message: The email to send.
+        :type message: EmailMessage
+        """
+        if not self.workers:
+            await self.start()
+        await self.queue.put((message, None))
+
+    async def deliver(self, message: EmailMessage) -> None:
+        """
+        Queues a message and waits until it is sent.
+
+        :param message: The email to send.
+        :type message: EmailMessage
+        :raises aiosmtplib.SMTPException: If the message could not be sent.
+        :raises OSError: If the SMTP server is unreachable.
+        :raises Exception: Any other error of sending the message, e.g. a ``ValueError`` of its encoding.
+        """
+        if not self.workers:
+            await self.start()
+        result = asyncio.get_running_loop().create_future()
+        await self.queue.put((message, result))
+        await result
+
+    async def join(self) -> None:
+        """
+        Waits until every queued message has been sent or has failed.
+        """
+        if self.queue is not None:
+            await self.queue.join()
+
+    async def next_batch(self) -> list[tuple[EmailMessage, asyncio.Future | None]]:
+        batch = [await self.queue.get()]
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(**self.smtp_options)
+        await smtp.connect()  # логін теж тут, якщо задані username і password
+        self.connections += 1
+        return smtp
+
+    async def send(self, smtp: aiosmtplib.SMTP | None, message: EmailMessage):
+        # з'єднання могло закритися на боці сервера - одна спроба з новим з'єднанням
+        for attempt in range(2):
+            try:
+                if smtp is None or not smtp.is_connected:
+                    smtp = await self.connect()
+                await smtp.send_message(message)
+                self.sent += 1
+                return smtp, None
+            except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, OSError) as err:
+                smtp, error = None, err
+            except Exception as err:  # відмова сервера або непередбачена помилка (напр. кодування листа)
+                error = err
+                break
+        print(error)
+        self.failed += 1
+        return smtp, error
+
+    async def worker(self) -> None:
+        smtp = None
+        batch = []
+        try:
+            while True:
+                try:
+                    batch = await asyncio.wait_for(self.next_batch(), timeout=self.idle_timeout)
+                except asyncio.TimeoutError:
+                    smtp = await self.disconnect(smtp)
+                    continue
+                while batch:
+                    smtp, error = await self.send(smtp, batch[0][0])
+                    self.finish(batch.pop(0)[1], error)
+        finally:
+            for message, result in batch:  # воркер зупинили посеред пакета - не лишаємо відправників чекати
+                if result is not None and not result.done():
+                    result.cancel()
+                self.queue.task_done()
+            await self.disconnect(smtp)
+
+    def finish(self, result: asyncio.Future | None, error: Exception | None) -> None:
+        # завжди: і відповідь тому, хто чекає в deliver, і task_done для join/close
+        if result is not None and not result.done():
+            if error is None:
+                result.set_result(None)
+            else:
+                result.set_exception(error)
+        self.queue.task_done()
+
+    async def disconnect(self, smtp: aiosmtplib.SMTP | None) -> None:
+        if smtp is not None and smtp.is_connected:
+            try:
+                await smtp.quit()
+            except aiosmtplib.SMTPException:
+                smtp.close()
+        return None
+
+    def stats(self) -> dict:
+        """
+        Returns the dispatcher counters.
+
+        :return: Queued, sent and failed messages, and the number of SMTP connections opened.
+        :rtype: dict
+        """
+        return {"queued": self.queue.qsize() if self.queue is not None else 0,
+                "sent": self.sent, "failed": self.failed, "connections": self.connections}
@@ -0,0 +1,274 @@
+import bisect
+import contextvars
+
+import redis
+from redis import asyncio as redis_asyncio
+
+
+class Counter:
+    """
+    Monotonic counter with labels, in the Prometheus text format.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, labels, value
+
+
+class Gauge(Counter):
+    """
+    Value that goes up and down, e.g. requests in flight.
+    """
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, *labels: str) -> None:
+        self.inc(-amount, *labels)
+
+
+class Histogram:
+    """
+    Distribution of observed values in cumulative buckets, plus their count and sum.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.values: dict[tuple, list] = {}  # мітки -> [лічильники кошиків..., +Inf, сума]
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self.values.get(labels)
+        if counts is None:
+            counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self):
+        bounds = [*map(str, self.buckets), "+Inf"]
+        for labels, counts in self.values.items():
+            total = 0
+            for bound, count in zip(bounds, counts):
+                total += count
+                yield f"{self.name}_bucket", labels + (bound,), total
+            yield f"{self.name}_count", labels, total
+            yield f"{self.name}_sum", labels, counts[-1]
+
+
+class Registry:
+    """
+    The metrics of this worker. Updates are plain dictionary operations on the event loop thread, so
+    recording a request costs microseconds; each worker process is scraped separately.
+    """
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format (version 0.0.4).
+
+        :return: The metrics page.
+        :rtype: str
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            names = metric.labels + (("le",) if metric.kind == "histogram" else ())
+            for name, labels, value in metric.samples():
+                pairs = ",".join(f'{label}="{escape(str(v))}"' for label, v in zip(names, labels))
+                lines.append(f"{name}{{{pairs}}} {value}" if pairs else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and status.",
+    ("method", "route", "status")))
+http_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests being processed."))
+db_queries = registry.register(Counter(
+    "db_queries_total", "SQL statements executed by requests of the route.", ("route",)))
+db_query_duration = registry.register(Counter(
+    "db_query_seconds_total", "Time spent in SQL statements by requests of the route.", ("route",)))
+db_queries_per_request = registry.register(Histogram(
+    "db_queries_per_request", "SQL statements per request of the route.", ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)))
+redis_round_trips = registry.register(Counter(
+    "redis_round_trips_total", "Redis round trips (a pipeline is one) made by requests of the route.", ("route",)))
+user_cache = registry.register(Counter(
+    "user_cache_requests_total", "Lookups of the current user in the Redis cache.", ("result",)))
+
+
+class RequestStats:
+    """
+    Counters of one HTTP request, filled by the database and Redis hooks.
+    """
+    __slots__ = ("db_queries", "db_time", "redis_round_trips", "statements")
+
+    def __init__(self, track_statements: bool = False):
+        """
+        :param track_statements: Also count every distinct SQL statement (for N+1 detection).
+        :type track_statements: bool
+        """
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.redis_round_trips = 0
+        self.statements: dict[str, int] | None = {} if track_statements else None
+
+    def repeated_statements(self, threshold: int) -> dict[str, int]:
+        """
+        Returns the statements executed at least ``threshold`` times - usually a lazy load in a loop (N+1).
+
+        :param threshold: The number of executions that is suspicious.
+        :type threshold: int
+        :return: The statements and how many times each ran.
+        :rtype: dict[str, int]
+        """
+        return {statement: count for statement, count in (self.statements or {}).items() if count >= threshold}
+
+    def server_timing(self, total: float) -> str:
+        """
+        Formats the counters as a ``Server-Timing`` header value, shown by the browser developer tools.
+
+        :param total: The time of the request so far, in seconds.
+        :type total: float
+        :return: The header value.
+        :rtype: str
+        """
+        return (f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries", '
+                f'redis;desc="{self.redis_round_trips} round trips", app;dur={total * 1000:.1f}')
+
+
+# статистика поточного запиту; потоки пулу FastAPI отримують копію контексту з тим самим об'єктом
+current_request: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar("current_request",
+                                                                                      default=None)
+
+
+def observe_query(seconds: float, statement: str) -> None:
+    """
+    Adds one SQL statement to the statistics of the current request, if any.
+
+    :param seconds: The execution time of the statement.
+    :type seconds: float
+    :param statement: The SQL text, with parameter placeholders.
+    :type statement: str
+    """
+    stats = current_request.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_time += seconds
+        if stats.statements is not None:
+            stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+
+def observe_user_cache(hit: bool) -> None:
+    user_cache.inc(1, "hit" if hit else "miss")
+
+
+class InstrumentedConnection(redis.Connection):
+    """
+    Redis connection that counts round trips of the current request: one per command or per pipeline.
+    """
+    def send_packed_command(self, command, check_health: bool = True) -> None:
+        stats = current_request.get()
+        if stats is not None:
+            stats.redis_round_trips += 1
+        super().send_packed_command(command, check_health)
+
+
+class InstrumentedAsyncConnection(redis_asyncio.Connection):
+    """
+    The asyncio counterpart of :class:`InstrumentedConnection`.
+    """
+    async def send_packed_command(self, command, check_health: bool = True) -> None:
+        stats = current_request.get()
+        if stats is not None:
+            stats.redis_round_trips += 1
+        await super().send_packed_command(command, check_health)
+
+
+def instrumented_redis(host: str, port: int, db: int = 0) -> redis.Redis:
+    """
+    Creates a Redis client whose round trips are counted per request.
+
+    :param host: The Redis host.
+    :type host: str
+    :param port: The Redis port.
+    :type port: int
+    :param db: The Redis database number.
+    :type db: int
+    :return: The Redis client.
+    :rtype: redis.Redis
+    """
+    pool = redis.ConnectionPool(connection_class=InstrumentedConnection, host=host, port=port, db=db)
+    return redis.Redis(connection_pool=pool)
+
+
+def instrumented_async_redis(host: str, port: int, db: int = 0, **kwargs) -> redis_asyncio.Redis:
+    """
+    Creates an asyncio Redis client whose round trips are counted per request, like :func:`instrumented_redis`.
+    Commands of background tasks (the rate-limit sync, the revocation listener) run outside a request
+    and are not counted.
+
+    :param host: The Redis host.
+    :type host: str
+    :param port: The Redis port.
+    :type port: int
+    :param db: The Redis database number.
+    :type db: int
+    :param kwargs: Other connection options, e.g. ``decode_responses``.
+    :return: The asyncio Redis client.
+    :rtype: redis.asyncio.Redis
+    """
+    pool = redis_asyncio.ConnectionPool(connection_class=InstrumentedAsyncConnection, host=host, port=port,
+                                        db=db, **kwargs)
+    return redis_asyncio.Redis(connection_pool=pool)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+    """
+    Records a finished HTTP request with the database and Redis work it did.
+
+    :param method: The HTTP method.
+    :type method: str
+    :param route: The route template, e.g. ``/api/contacts/{contact_id}``.
+    :type route: str
+    :param status: The response status code.
+    :type status: int
+    :param seconds: The latency of the request.
+    :type seconds: float
+    :param stats: The counters of the request.
+    :type stats: RequestStats
+    """
+    status = str(status)
+    http_requests.inc(1, method, route, status)
+    http_request_duration.observe(seconds, method, route, status)
+    db_queries_per_request.observe(stats.db_queries, route)
+    if stats.db_queries:
+        db_queries.inc(stats.db_queries, route)
+        db_query_duration.inc(stats.db_time, route)
+    if stats.redis_round_trips:
+        redis_round_trips.inc(stats.redis_round_trips, route)
@@ -0,0 +1,84 @@
+"""
+Picks the bcrypt rounds for this host.
+
+Every extra round doubles the time of hashing (and of every login). The command measures bcrypt here and
+prints the largest number of rounds whose hash takes at most the target time; put it into ``.env``::
+
+    python -m src.services.password_cost --target-ms 250
+    BCRYPT_ROUNDS = 12
+
+After the change, stored hashes of other rounds are rehashed at the next successful login of each user.
+"""
+import argparse
+import statistics
+import time
+
+from passlib.hash import bcrypt
+
+MIN_ROUNDS = 10  # менше - занадто слабкий хеш, незалежно від заліза
+MAX_ROUNDS = 16
+
+
+def measure(rounds: int, samples: int = 3) -> float:
+    """
+    Measures how long hashing one password with the given rounds takes on this host.
+
+    :param rounds: The bcrypt rounds.
+    :type rounds: int
+    :param samples: Number of hashes; the median is returned.
+    :type samples: int
+    :return: The time of one hash in seconds.
+    :rtype: float
+    """
+    handler = bcrypt.using(rounds=rounds)
+    times = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        handler.hash("calibration password")
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def calibrate(target: float, min_rounds: int = MIN_ROUNDS, max_rounds: int = MAX_ROUNDS,
+              samples: int = 3) -> tuple[int, float]:
+    """
+    Finds the largest rounds whose hash takes at most ``target`` seconds, but not less than ``min_rounds``.
+
+    :param target: The target time of one hash in seconds.
+    :type target: float
+    :param min_rounds: The lowest acceptable rounds.
+    :type min_rounds: int
+    :param max_rounds: The highest rounds to consider.
+    :type max_rounds: int
+    :param samples: Number of hashes per measurement.
+    :type samples: int
+    :return: The rounds and the measured time of one hash with them.
+    :rtype: tuple[int, float]
+    """
+    rounds, elapsed = min_rounds, measure(min_rounds, samples)
+    # кожен раунд подвоює час - міряємо наступний, лише поки прогноз вкладається в ціль
+    while rounds < max_rounds and elapsed * 2 <= target:
+        next_elapsed = measure(rounds + 1, samples)
+        if next_elapsed > target:
+            break
+        rounds, elapsed = rounds + 1, next_elapsed
+    return rounds, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-ms", type=float, default=250, help="target time of one hash, milliseconds")
+    parser.add_argument("--min-rounds", type=int, default=MIN_ROUNDS)
+    parser.add_argument("--max-rounds", type=int, default=MAX_ROUNDS)
+    parser.add_argument("--samples", type=int, default=3, help="hashes per measurement")
+    args = parser.parse_args()
+
+    rounds, elapsed = calibrate(args.target_ms / 1000, args.min_rounds, args.max_rounds, args.samples)
+    print(f"# one hash takes {elapsed * 1000:.0f} ms on this host")
+    if elapsed * 1000 > args.target_ms:
+        print(f"# even --min-rounds {args.min_rounds} is slower than the target on this host")
+    print(f"BCRYPT_ROUNDS = {rounds}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+import asyncio
+import ipaddress
+import math
+import time
+from functools import lru_cache
+
+from fastapi import HTTPException, Request, status
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+
+
+class Bucket:
+    """
+    Local token bucket of one rate-limit key, plus the hits not yet reported to Redis.
+    """
+    __slots__ = ("times", "seconds", "capacity", "tokens", "updated", "pending", "count", "blocked_until")
+
+    def __init__(self, times: int, seconds: int, burst: int, now: float):
+        self.times = times
+        self.seconds = seconds
+        self.capacity = times + burst
+        self.tokens = float(self.capacity)
+        self.updated = now
+        self.pending = 0
+        self.count = 0
+        self.blocked_until = 0.0
+
+
+class RateLimitBackend:
+    """
+    Keeps the token buckets of all limiters of this worker in memory and reconciles them with Redis in batches.
+
+    The hot path of a request is a dictionary lookup. Hits are reported to Redis by a background task
+    every ``RATE_LIMIT_SYNC_INTERVAL`` seconds, or sooner when a key collects ``RATE_LIMIT_OVERSHOOT``
+    unreported hits. Redis holds one fixed-window counter per key shared by all workers; when it reaches
+    the limit the key is blocked locally until the window ends. One key can therefore exceed its limit
+    by at most ``RATE_LIMIT_OVERSHOOT`` requests per worker. With an overshoot of 0 every hit is reported
+    to Redis before the request continues.
+    """
+    def __init__(self, overshoot: int = settings.rate_limit_overshoot,
+                 sync_interval: float = settings.rate_limit_sync_interval, clock=time.monotonic, wall_clock=time.time):
+        """
+        :param overshoot: Unreported hits of one key that trigger a sync; 0 - report every hit before the request.
+        :type overshoot: int
+        :param sync_interval: Seconds between background syncs.
+        :type sync_interval: float
+        :param clock: Monotonic clock of the buckets (replaced in tests).
+        :param wall_clock: Wall clock of the Redis windows, shared by all workers (replaced in tests).
+        """
+        self.overshoot = overshoot
+        self.sync_interval = sync_interval
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.redis = None
+        self.buckets: dict[str, Bucket] = {}
+        self.flush_event = asyncio.Event()
+        self.task = None
+
+    async def init(self, redis) -> None:
+        """
+        Connects the backend to Redis and starts the background sync task.
+
+        :param redis: The asyncio Redis client.
+        :type redis: redis.asyncio.Redis
+        """
+        self.redis = redis
+        self.flush_event = asyncio.Event()
+        self.task = asyncio.create_task(self.sync_loop())
+
+    async def close(self) -> None:
+        """
+        Stops the background task and reports the remaining hits.
+        """
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await self.sync()
+
+    def hit(self, key: str, times: int, seconds: int, burst: int = 0) -> float:
+        """
+        Takes one token from the local bucket of the key.
+
+        The bucket refills at ``times / seconds`` tokens per second and holds up to ``times + burst`` tokens.
+
+        :param key: The rate-limit key.
+        :type key: str
+        :param times: Number of allowed requests per window.
+        :type times: int
+        :param seconds: Window length in seconds.
+        :type seconds: int
+        :param burst: Extra requests allowed at once on top of ``times``.
+        :type burst: int
+        :return: 0 if the request is allowed, otherwise the number of seconds to wait.
+        :rtype: float
+        """
+        now = self.clock()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = Bucket(times, seconds, burst, now)
+        if now < bucket.blocked_until:
+            return bucket.blocked_until - now
+        bucket.tokens = min(bucket.capacity, bucket.tokens + (now - bucket.updated) * times / seconds)
+        bucket.updated = now
+        if bucket.tokens < 1:
+            return (1 - bucket.tokens) * seconds / times
+        bucket.tokens -= 1
+        bucket.pending += 1
+        if self.redis is not None and bucket.pending >= max(self.overshoot, 1):
+            self.flush_event.set()
+        return 0.0
+
+    async def sync(self) -> None:
+        """
+        Reports the pending hits of all keys to Redis in one pipeline and applies the global counters
+        to the local buckets.
+        """
+        if self.redis is None:
+            return
+        pending = [(key, bucket) for key, bucket in self.buckets.items() if bucket.pending]
+        if not pending:
+            return
+        wall = self.wall_clock()
+        hits = [bucket.pending for key, bucket in pending]
+        pipe = self.redis.pipeline(transaction=False)
+        for (key, bucket), count in zip(pending, hits):
+            redis_key = f"rate_limit:{key}:{int(wall // bucket.seconds)}"
+            pipe.incrby(redis_key, count)
+            pipe.expire(redis_key, bucket.seconds)
+            bucket.pending = 0
+        try:
+            results = await pipe.execute()
+        except RedisError as err:
+            print(err)
+            for (key, bucket), count in zip(pending, hits):  # повернемо хіти, щоб відправити їх наступного разу
+                bucket.pending += count
+            return
+        now = self.clock()
+        for (key, bucket), count in zip(pending, results[::2]):
+            bucket.count = count
+            bucket.tokens = max(0.0, min(bucket.tokens, bucket.capacity - count))
+            if count >= bucket.capacity:
+                bucket.blocked_until = now + bucket.seconds - wall % bucket.seconds
+
+    async def check(self, key: str) -> float:
+        """
+        Reports the pending hits to Redis right away and checks the global counter of the key.
+
+        :param key: The rate-limit key.
+        :type key: str
+        :return: 0 if the key is within its limit, otherwise the number of seconds to wait.
+        :rtype: float
+        """
+        await self.sync()
+        bucket = self.buckets.get(key)
+        if bucket is None or bucket.count <= bucket.capacity:
+            return 0.0
+        return max(bucket.blocked_until - self.clock(), 0.0) or 1.0
+
+    def prune(self) -> None:
+        """
+        Drops buckets that are full again and have nothing to report, so memory stays bounded.
+        """
+        now = self.clock()
+        idle = [key for key, bucket in self.buckets.items()
+                if not bucket.pending and now - bucket.updated > bucket.seconds and now >= bucket.blocked_until]
+        for key in idle:
+            del self.buckets[key]
+
+    async def sync_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_event.wait(), timeout=self.sync_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_event.clear()
+            await self.sync()
+            self.prune()
+
+
+rate_limit_backend = RateLimitBackend()
+
+
+@lru_cache(maxsize=8)
+def _networks(proxies: tuple[str, ...]) -> tuple:
+    return tuple(ipaddress.ip_network(proxy, strict=False) for proxy in proxies)
+
+
+def is_trusted_proxy(address: str) -> bool:
+    """
+    Checks whether the address belongs to one of ``TRUSTED_PROXIES``.
+
+    :param address: The IP address.
+    :type address: str
+    :return: True for a trusted proxy.
+    :rtype: bool
+    """
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _networks(tuple(settings.trusted_proxies)))
+
+
+def client_ip(request: Request) -> str:
+    """
+    Returns the IP address of the client.
+
+    ``X-Forwarded-For`` is used only when the request comes from one of ``TRUSTED_PROXIES``: the client is then
+    the right-most address that is not a trusted proxy. Addresses to the left of it are set by the client itself
+    and are ignored. Otherwise the peer address of the connection is the client.
+
+    :param request: The incoming HTTP request.
+    :type request: Request
+    :return: The client IP address.
+    :rtype: str
+    """
+    peer = request.client.host if request.client else ""
+    forwarded = request.headers.get("X-Forwarded-For")
+    if not forwarded or not is_trusted_proxy(peer):
+        return peer
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer  # увесь ланцюжок - наші проксі
+
+
+def client_identifier(request: Request) -> str:
+    """
+    Identifies the client by its IP address plus the route path.
+
+    :param request: The incoming HTTP request.
+    :type request: Request
+    :return: The rate-limit key of the client for this route.
+    :rtype: str
+    """
+    return f"{client_ip(request)}:{request.scope['path']}"
+
+
+class TokenBucketLimiter:
+    """
+    Rate-limit dependency backed by :data:`rate_limit_backend`.
+
+    Usage: ``dependencies=[Depends(TokenBucketLimiter(times=10, seconds=60))]``.
+    """
+    def __init__(self, times: int, seconds: int, burst: int = 0, identifier=client_identifier):
+        """
+        :param times: Number of allowed requests per window.
+        :type times: int
+        :param seconds: Window length in seconds.
+        :type seconds: int
+        :param burst: Extra requests allowed at once on top of ``times``.
+        :type burst: int
+        :param identifier: Function that builds the rate-limit key from the request.
+        :type identifier: Callable[[Request], str]
+        """
+        self.times = times
+        self.seconds = seconds
+        self.burst = burst
+        self.identifier = identifier
+
+    async def __call__(self, request: Request):
+        """
+        Allows the request or rejects it with 429 and a ``Retry-After`` header.
+
+        :param request: The incoming HTTP request.
+        :type request: Request
+        :raises HTTPException: If the limit is exceeded.
+        """
+        key = self.identifier(request)
+        retry_after = rate_limit_backend.hit(key, self.times, self.seconds, self.burst)
+        if not retry_after and rate_limit_backend.overshoot == 0:
+            retry_after = await rate_limit_backend.check(key)
+        if retry_after:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too Many Requests",
+                                headers={"Retry-After": str(math.ceil(retry_after))})
@@ -0,0 +1,61 @@
+from fastapi import Request
+from jose import JWTError
+
+from src.conf.config import settings
+from src.services.auth import auth_service
+from src.services.rate_limit import TokenBucketLimiter, client_ip
+
+
+def user_identity(request: Request) -> str:
+    """
+    Identifies the caller for rate limiting without touching the database or the user cache.
+
+    The identity comes from the claims of a valid access token: the user id (``uid``), or the email (``sub``)
+    for tokens issued before ``uid`` was added. Anonymous callers and invalid tokens fall back to the client IP.
+
+    :param request: The incoming HTTP request.
+    :type request: Request
+    :return: The identity of the caller.
+    :rtype: str
+    """
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            payload = auth_service.keys.decode(token)
+        except JWTError:
+            payload = {}
+        if payload.get("scope") == "access_token":
+            return f"user:{payload.get('uid') or payload.get('sub')}"
+    return f"ip:{client_ip(request)}"
+
+
+def rate_limit(policy: str) -> TokenBucketLimiter:
+    """
+    Builds the rate-limit dependency of a route from the policy declared in ``settings.rate_limit_policies``.
+
+    Every user gets an own bucket per policy. Use the dependency in the ``dependencies`` of the route decorator:
+    FastAPI resolves them before the endpoint parameters, so a rejected request never opens a database session
+    or loads the user.
+
+    :param policy: The policy name, for example ``"contacts:list"``.
+    :type policy: str
+    :return: The rate-limit dependency.
+    :rtype: TokenBucketLimiter
+    """
+    limits = settings.rate_limit_policies[policy]
+    return TokenBucketLimiter(limits.times, limits.seconds, limits.burst,
+                              identifier=lambda request: f"{policy}:{user_identity(request)}")
+
+
+def describe(policy: str) -> str:
+    """
+    Describes the limits of a policy for the OpenAPI documentation of a route.
+
+    :param policy: The policy name.
+    :type policy: str
+    :return: A human-readable description of the limits.
+    :rtype: str
+    """
+    limits = settings.rate_limit_policies[policy]
+    burst = f" (bursts of up to {limits.times + limits.burst})" if limits.burst else ""
+    return f"No more than {limits.times} requests per {limits.seconds} seconds per user{burst}"
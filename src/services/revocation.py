@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import math
+import time
+
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+
+REVOKED_KEY = "revoked_token:"
+REVOKED_CHANNEL = "revoked_tokens"
+
+
+class BloomFilter:
+    """
+    Set of strings that answers "maybe present" or "surely absent" using ``-n·ln(p)/ln(2)²`` bits.
+
+    Items can't be removed; the filter is rebuilt instead (see :class:`RevocationList`).
+    """
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        :param capacity: Expected number of items.
+        :type capacity: int
+        :param error_rate: Share of false positives at ``capacity`` items.
+        :type error_rate: float
+        """
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item: str):
+        # подвійне хешування: k позицій з двох 64-бітних половин одного дайджесту
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
+
+
+class RevocationList:
+    """
+    In-process mirror of the revoked access-token ids kept in Redis.
+
+    Revoked ids are stored in Redis as ``revoked_token:<jti>`` keys that expire together with the token,
+    and announced on the ``revoked_tokens`` channel. Every worker keeps them in a :class:`BloomFilter`
+    fed by that channel, so checking a token that was not revoked needs no I/O; only a filter hit is
+    confirmed in Redis. The filter is rebuilt from Redis every ``rebuild_interval`` seconds (dropping
+    expired ids) and after reconnecting to Redis (catching up on missed messages). Until the filter
+    is loaded, :meth:`might_contain` answers True, so every token is checked in Redis.
+    """
+    def __init__(self, capacity: int = settings.revocation_bloom_capacity,
+                 error_rate: float = settings.revocation_bloom_error_rate,
+                 rebuild_interval: float = settings.revocation_rebuild_interval):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.ready = False
+        self.loaded = 0.0
+        self.redis = None
+        self.task = None
+        self.checks = 0
+        self.hits = 0
+
+    async def init(self, redis) -> None:
+        """
+        Loads the revoked ids and starts listening for new ones.
+
+        :param redis: The asyncio Redis client (with ``decode_responses=True``).
+        :type redis: redis.asyncio.Redis
+        """
+        self.redis = redis
+        self.task = asyncio.create_task(self.listen())
+
+    async def close(self) -> None:
+        """
+        Stops listening; the list answers "maybe revoked" for every token afterwards.
+        """
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        self.ready = False
+
+    def add(self, jti: str) -> None:
+        self.bloom.add(jti)
+
+    def might_contain(self, jti: str) -> bool:
+        """
+        Checks the token id against the local filter.
+
+        :param jti: The id of the access token.
+        :type jti: str
+        :return: False if the token is surely not revoked, True if Redis has to be asked.
+        :rtype: bool
+        """
+        self.checks += 1
+        if self.ready and jti not in self.bloom:
+            return False
+        self.hits += 1
+        return True
+
+    async def reload(self) -> None:
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        async for key in self.redis.scan_iter(match=f"{REVOKED_KEY}*", count=1000):
+            bloom.add(key[len(REVOKED_KEY):])
+        self.bloom, self.ready, self.loaded = bloom, True, time.monotonic()
+
+    async def listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                # спершу підписка, потім завантаження - так жоден id не загубиться між ними
+                await pubsub.subscribe(REVOKED_CHANNEL)
+                await self.reload()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None:
+                        self.bloom.add(message["data"])
+                    if time.monotonic() - self.loaded > self.rebuild_interval:
+                        await self.reload()
+            except RedisError as err:
+                print(err)
+                self.ready = False  # поки немає зв'язку, кожен токен перевіряємо в Redis
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def stats(self) -> dict:
+        """
+        Returns the filter counters of this worker.
+
+        :return: Whether the filter is loaded, its size, and the checks and hits (lookups sent to Redis).
+        :rtype: dict
+        """
+        return {"ready": self.ready, "items": self.bloom.count, "bits": self.bloom.size,
+                "checks": self.checks, "hits": self.hits}
+
+
+revocation_list = RevocationList()
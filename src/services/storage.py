@@ -0,0 +1,275 @@
+import asyncio
+import functools
+import hashlib
+import io
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import cloudinary
+import cloudinary.uploader
+from fastapi import UploadFile
+from PIL import Image, ImageOps
+
+from src.conf.config import settings
+
+AVATAR_SIZE = 250
+AVATAR_SIZES = sorted(set(settings.avatar_variant_sizes) | {AVATAR_SIZE})
+
+
+def to_png(image: Image.Image) -> bytes:
+    output = io.BytesIO()
+    image.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+def resize_variants(data: bytes, sizes: list[int]) -> dict[int, bytes]:
+    """
+    Crops the image to a square around its center and scales it to every size (the same result as
+    Cloudinary's ``crop='fill'``), decoding it only once. Runs in a worker process, so it only takes
+    and returns bytes.
+
+    :param data: The uploaded image.
+    :type data: bytes
+    :param sizes: The sides of the variants in pixels.
+    :type sizes: list[int]
+    :raises PIL.UnidentifiedImageError: If the data is not an image.
+    :return: The PNG image of every size.
+    :rtype: dict[int, bytes]
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        # кожен менший варіант робимо з попереднього більшого - так швидше, ніж щоразу з оригіналу
+        variants, source = {}, image
+        for size in sorted(sizes, reverse=True):
+            source = ImageOps.fit(source, (size, size), Image.Resampling.LANCZOS)
+            variants[size] = to_png(source)
+    return variants
+
+
+class StorageBackend(ABC):
+    """
+    Interface of the avatar storage. :meth:`upload` is blocking; :func:`store_avatar` calls it
+    in a thread, so the event loop keeps serving other requests during an upload.
+
+    Avatars are stored under content-addressed keys, so a key never changes its content and its URLs
+    can be cached forever (:meth:`thumbnail_url`).
+    """
+    def __init__(self):
+        self.thumbnail_url = functools.lru_cache(maxsize=4096)(self.url)
+
+    @abstractmethod
+    def upload(self, key: str, images: dict[int, bytes]) -> None:
+        """
+        Stores the square variants of one avatar under the key.
+
+        :param key: The name of the avatar in the storage, e.g. ``"ContactsApp/<sha256>"``.
+        :type key: str
+        :param images: The PNG image of every size.
+        :type images: dict[int, bytes]
+        """
+
+    @abstractmethod
+    def url(self, key: str, size: int = AVATAR_SIZE) -> str:
+        """
+        Returns the public URL of one size of the stored avatar.
+
+        :param key: The name of the avatar in the storage.
+        :type key: str
+        :param size: The side of the image in pixels.
+        :type size: int
+        :return: The URL of the image.
+        :rtype: str
+        """
+
+
+class CloudinaryStorage(StorageBackend):
+    """
+    Stores avatars in Cloudinary. The SDK is configured once, when the storage is created.
+
+    Only the largest variant is uploaded; the smaller ones are generated by Cloudinary right at upload
+    (eager transformations), so the first request of a small avatar doesn't wait for a transform.
+    """
+    def __init__(self, cloud_name: str, api_key: str, api_secret: str):
+        super().__init__()
+        cloudinary.config(cloud_name=cloud_name, api_key=api_key, api_secret=api_secret, secure=True)
+
+    def upload(self, key: str, images: dict[int, bytes]) -> None:
+        largest = max(images)
+        eager = [{"width": size, "height": size, "crop": "fill"} for size in images if size != largest]
+        cloudinary.uploader.upload(io.BytesIO(images[largest]), public_id=key, overwrite=False, eager=eager)
+
+    def url(self, key: str, size: int = AVATAR_SIZE) -> str:
+        return cloudinary.CloudinaryImage(key).build_url(width=size, height=size, crop='fill')
+
+
+class LocalStorage(StorageBackend):
+    """
+    Stores avatars as files in a local directory served under ``base_url``. Used in development and tests.
+    """
+    def __init__(self, root: str, base_url: str):
+        super().__init__()
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    def path(self, key: str, size: int = AVATAR_SIZE) -> Path:
+        """
+        Returns the file of one size of the avatar.
+
+        :param key: The name of the avatar in the storage.
+        :type key: str
+        :param size: The side of the image in pixels.
+        :type size: int
+        :raises ValueError: If the key points outside the storage directory (e.g. contains ``..``).
+        :return: The path of the file.
+        :rtype: Path
+        """
+        path = self.root / f"{key}_{size}.png"
+        if not path.resolve().is_relative_to(self.root.resolve()):
+            raise ValueError(f"Avatar key {key!r} is outside of the storage")
+        return path
+
+    def upload(self, key: str, images: dict[int, bytes]) -> None:
+        for size, data in images.items():
+            path = self.path(key, size)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)  # читачі не побачать напівзаписаний файл
+
+    def url(self, key: str, size: int = AVATAR_SIZE) -> str:
+        return f"{self.base_url}/{key}_{size}.png"
+
+
+def create_storage() -> StorageBackend:
+    """
+    Creates the avatar storage selected by ``AVATAR_STORAGE`` (``cloudinary`` or ``local``).
+
+    :return: The storage backend.
+    :rtype: StorageBackend
+    """
+    if settings.avatar_storage == "local":
+        return LocalStorage(settings.avatar_local_dir, settings.avatar_base_url)
+    return CloudinaryStorage(settings.cloudinary_name, settings.cloudinary_api_key, settings.cloudinary_api_secret)
+
+
+avatar_storage = create_storage()
+resize_pool: ProcessPoolExecutor | None = None
+
+
+async def read_upload(file: UploadFile, limit: int, chunk_size: int = 64 * 1024) -> tuple[bytes, str]:
+    """
+    Reads the uploaded file in chunks, hashing it on the way.
+
+    :param file: The uploaded file.
+    :type file: UploadFile
+    :param limit: Stop after this many bytes; a longer result means the file is too large.
+    :type limit: int
+    :param chunk_size: Size of one read in bytes.
+    :type chunk_size: int
+    :return: The content (at most ``limit`` bytes) and its SHA-256 hex digest.
+    :rtype: tuple[bytes, str]
+    """
+    digest, chunks, size = hashlib.sha256(), [], 0
+    while size < limit:
+        chunk = await file.read(min(chunk_size, limit - size))
+        if not chunk:
+            break
+        digest.update(chunk)
+        chunks.append(chunk)
+        size += len(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+
+def avatar_key(avatar_hash: str) -> str:
+    """
+    Returns the storage key of the avatar with the given content hash.
+
+    :param avatar_hash: SHA-256 hex digest of the uploaded file.
+    :type avatar_hash: str
+    :return: The storage key.
+    :rtype: str
+    """
+    return f"ContactsApp/{avatar_hash}"
+
+
+def avatar_url(avatar_hash: str, size: int = AVATAR_SIZE) -> str:
+    """
+    Returns the URL of one size of the avatar; it is computed once per hash and size.
+
+    :param avatar_hash: SHA-256 hex digest of the uploaded file.
+    :type avatar_hash: str
+    :param size: The side of the image in pixels.
+    :type size: int
+    :return: The URL of the image.
+    :rtype: str
+    """
+    return avatar_storage.thumbnail_url(avatar_key(avatar_hash), size)
+
+
+def avatar_urls(avatar_hash: str | None) -> dict[int, str]:
+    """
+    Returns the URLs of all sizes of the avatar; they are computed once per hash and size.
+
+    :param avatar_hash: SHA-256 hex digest of the uploaded file, or None if the user has no uploaded avatar.
+    :type avatar_hash: str | None
+    :return: The URL of every size, e.g. ``{32: ..., 64: ..., 128: ..., 250: ...}``.
+    :rtype: dict[int, str]
+    """
+    if not avatar_hash:
+        return {}
+    return {size: avatar_url(avatar_hash, size) for size in AVATAR_SIZES}
+
+
+async def resize_avatar(data: bytes, sizes: list[int] = AVATAR_SIZES) -> dict[int, bytes]:
+    """
+    Makes the avatar variants in the pool of worker processes, so CPU-heavy decoding doesn't block
+    the event loop.
+
+    :param data: The uploaded image.
+    :type data: bytes
+    :param sizes: The sides of the variants in pixels.
+    :type sizes: list[int]
+    :raises PIL.UnidentifiedImageError: If the data is not an image.
+    :raises PIL.Image.DecompressionBombError: If the image has too many pixels.
+    :raises OSError: If the image is truncated or corrupt.
+    :return: The PNG image of every size.
+    :rtype: dict[int, bytes]
+    """
+    global resize_pool
+    if resize_pool is None:
+        resize_pool = ProcessPoolExecutor(max_workers=settings.avatar_resize_workers)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(resize_pool, resize_variants, data, sizes)
+    except BrokenProcessPool:  # процес пулу впав (напр. OOM) - наступний запит створить новий пул
+        resize_pool = None
+        raise
+
+
+async def store_avatar(avatar_hash: str, images: dict[int, bytes]) -> str:
+    """
+    Uploads the avatar variants in a thread and returns the URL of the main (250x250) size.
+
+    :param avatar_hash: SHA-256 hex digest of the uploaded file.
+    :type avatar_hash: str
+    :param images: The PNG image of every size.
+    :type images: dict[int, bytes]
+    :return: The URL of the avatar.
+    :rtype: str
+    """
+    await asyncio.to_thread(avatar_storage.upload, avatar_key(avatar_hash), images)
+    return avatar_url(avatar_hash)
+
+
+def shutdown_resize_pool() -> None:
+    """
+    Stops the worker processes of :func:`resize_avatar`.
+    """
+    global resize_pool
+    if resize_pool is not None:
+        resize_pool.shutdown(cancel_futures=True)
+        resize_pool = None
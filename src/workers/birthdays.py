@@ -0,0 +1,126 @@
+"""
+Daily birthday digest job.
+
+Finds the contacts with birthdays in the next ``BIRTHDAY_DIGEST_DAYS`` days for all users at once and adds
+one digest email per user to the email outbox; the outbox worker (``python -m src.workers.outbox``) sends
+them. Users that already got a digest today are skipped, so a rerun doesn't send duplicates::
+
+    python -m src.workers.birthdays              # once, e.g. from cron: 0 8 * * *
+    python -m src.workers.birthdays --at 08:00   # stay running and send every day at 08:00
+"""
+import argparse
+import asyncio
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy.orm import Session
+
+from src.conf.config import settings
+from src.database.db import SessionLocal
+from src.database.models import EmailOutbox
+from src.repository import outbox as repository_outbox
+from src.repository.contacts import iter_upcoming_birthdays_by_owner
+
+
+def next_birthday(birthday: date, today: date) -> date:
+    """
+    Returns the next date (today or later) of the birthday; February 29 falls on February 28 in other years.
+
+    :param birthday: The date of birth.
+    :type birthday: date
+    :param today: The first day to consider.
+    :type today: date
+    :return: The next birthday.
+    :rtype: date
+    """
+    for year in (today.year, today.year + 1):
+        try:
+            day = birthday.replace(year=year)
+        except ValueError:
+            day = date(year, 2, 28)
+        if day >= today:
+            return day
+
+
+async def enqueue_digests(db: Session, today: date, days: int = settings.birthday_digest_days,
+                          chunk_size: int = settings.birthday_digest_chunk_size) -> int:
+    """
+    Adds one birthday digest per user to the outbox, committing after every chunk of owners.
+
+    :param db: The database session.
+    :type db: Session
+    :param today: The first day of the window.
+    :type today: date
+    :param days: The length of the window in days.
+    :type days: int
+    :param chunk_size: Number of owners per query and per commit.
+    :type chunk_size: int
+    :return: The number of digests added.
+    :rtype: int
+    """
+    since = datetime.combine(today, time.min)
+    queued, pending = 0, []
+
+    async def flush():
+        # хто вже отримав дайджест сьогодні (повторний запуск) - пропускаємо
+        recipients = [owner.email for owner, contacts in pending]
+        done = {recipient for recipient, in db.query(EmailOutbox.recipient)
+                .filter(EmailOutbox.kind == "birthday_digest", EmailOutbox.created_at >= since,
+                        EmailOutbox.recipient.in_(recipients))}
+        count = 0
+        for owner, contacts in pending:
+            if owner.email in done:
+                continue
+            upcoming = sorted(({"first_name": row.first_name, "last_name": row.last_name, "email": row.email,
+                                "date": next_birthday(row.birthday, today)} for row in contacts),
+                              key=lambda contact: contact["date"])
+            for contact in upcoming:
+                contact["date"] = contact["date"].isoformat()
+            repository_outbox.add_email(owner.email, "birthday_digest",
+                                        {"username": owner.username, "contacts": upcoming}, db)
+            count += 1
+        db.commit()
+        pending.clear()
+        return count
+
+    async for owner, contacts in iter_upcoming_birthdays_by_owner(db, today, days, chunk_size):
+        pending.append((owner, contacts))
+        if len(pending) >= chunk_size:
+            queued += await flush()
+    if pending:
+        queued += await flush()
+    return queued
+
+
+async def run_once(today: date | None = None) -> int:
+    db = SessionLocal()
+    try:
+        queued = await enqueue_digests(db, today or date.today())
+    finally:
+        db.close()
+    print(f"Birthday digests queued: {queued}")
+    return queued
+
+
+async def run_daily(at: time) -> None:
+    while True:
+        now = datetime.now()
+        next_run = datetime.combine(now.date(), at)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        await asyncio.sleep((next_run - now).total_seconds())
+        await run_once()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--at", type=time.fromisoformat, help="run every day at this time (HH:MM)")
+    parser.add_argument("--date", type=date.fromisoformat, help="first day of the window (default: today)")
+    args = parser.parse_args()
+    if args.at:
+        asyncio.run(run_daily(args.at))
+    else:
+        asyncio.run(run_once(args.date))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Delivery worker of the email outbox.
+
+Claims due emails from the ``email_outbox`` table in batches, sends them over the pooled SMTP connections
+of :data:`src.services.email.mail_dispatcher` and records the result. Failed emails are retried with
+exponential backoff. Run as many workers as needed, on any host with access to the database::
+
+    python -m src.workers.outbox
+    python -m src.workers.outbox --once   # send what is due and exit
+"""
+import argparse
+import asyncio
+from email.message import EmailMessage
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from src.conf.config import settings
+from src.database.db import SessionLocal
+from src.repository import outbox as repository_outbox
+from src.repository.outbox import ClaimedEmail
+from src.services.email import build_birthday_digest_email, build_confirmation_email, mail_dispatcher
+from src.services.email_templates import load_templates
+from src.services.mail_dispatcher import MailDispatcher
+
+# як з рядка outbox побудувати лист, для кожного kind
+BUILDERS: dict[str, Callable[[ClaimedEmail], EmailMessage]] = {
+    "confirm_email": lambda email: build_confirmation_email(email.recipient, email.payload["username"],
+                                                            email.payload["host"]),
+    "birthday_digest": lambda email: build_birthday_digest_email(email.recipient, email.payload["username"],
+                                                                 email.payload["contacts"]),
+}
+
+
+async def deliver(email: ClaimedEmail, dispatcher: MailDispatcher) -> str | None:
+    """
+    Builds and sends one outbox email.
+
+    :param email: The claimed outbox row.
+    :type email: ClaimedEmail
+    :param dispatcher: The mail dispatcher.
+    :type dispatcher: MailDispatcher
+    :return: None if the email was sent, otherwise the error message.
+    :rtype: str | None
+    """
+    try:
+        await dispatcher.deliver(BUILDERS[email.kind](email))
+    except Exception as err:
+        return f"{type(err).__name__}: {err}"
+    return None
+
+
+async def process_batch(db: Session, dispatcher: MailDispatcher, batch_size: int = settings.outbox_batch_size) -> int:
+    """
+    Claims one batch of due emails, sends them concurrently and records the results. The batch costs
+    a constant number of statements: the claim, its updates and the result updates, with two commits.
+
+    :param db: The database session.
+    :type db: Session
+    :param dispatcher: The mail dispatcher.
+    :type dispatcher: MailDispatcher
+    :param batch_size: Maximum number of emails to claim.
+    :type batch_size: int
+    :return: The number of claimed emails.
+    :rtype: int
+    """
+    emails = await repository_outbox.claim_emails(batch_size, settings.outbox_lease_seconds,
+                                                  settings.outbox_max_attempts, db)
+    errors = await asyncio.gather(*(deliver(email, dispatcher) for email in emails))
+    await repository_outbox.record_results(list(zip(emails, errors)), settings.outbox_max_attempts,
+                                           settings.outbox_backoff_base, settings.outbox_backoff_max, db)
+    return len(emails)
+
+
+async def run(once: bool = False, batch_size: int = settings.outbox_batch_size,
+              poll_interval: float = settings.outbox_poll_interval) -> None:
+    """
+    Processes the outbox until stopped. A full batch is followed by the next one right away;
+    otherwise the worker sleeps for ``poll_interval`` seconds.
+
+    :param once: Process the due emails and return instead of polling.
+    :type once: bool
+    :param batch_size: Maximum number of emails claimed at once.
+    :type batch_size: int
+    :param poll_interval: Pause between polls of an empty outbox, in seconds.
+    :type poll_interval: float
+    """
+    load_templates()
+    await mail_dispatcher.start()
+    try:
+        while True:
+            db = SessionLocal()
+            try:
+                claimed = await process_batch(db, mail_dispatcher, batch_size)
+            finally:
+                db.close()
+            if claimed < batch_size:
+                if once:
+                    return
+                await asyncio.sleep(poll_interval)
+    finally:
+        await mail_dispatcher.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="send the due emails and exit")
+    parser.add_argument("--batch-size", type=int, default=settings.outbox_batch_size)
+    parser.add_argument("--poll-interval", type=float, default=settings.outbox_poll_interval)
+    args = parser.parse_args()
+    asyncio.run(run(args.once, args.batch_size, args.poll_interval))
+
+
+if __name__ == "__main__":
+    main()
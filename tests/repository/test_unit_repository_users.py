@@ -8,7 +8,8 @@ from src.schemas import UserModel, UserDb, UserResponse
 from src.repository.users import (
     get_user_by_email,
     create_user,
-    update_token,
+    gravatar_url,
+    update_password,
     confirmed_email,
     update_avatar
     )
@@ -97,141 +98,61 @@ class TestUsers(unittest.IsolatedAsyncioTestCase):
         self.assertIsNone(result)
 
 
-    @patch("src.repository.users.Gravatar")
-    async def test_create_user_with_avatar(self, mock_gravatar):
+    async def test_create_user_with_avatar(self):
         body = UserModel(
                          id=1,
                          username="AnnaAl", 
                          email="test@mail.com", 
                          password="annaa_pass"
                         )
-        
-        # Мок Gravatar
-        mock_gravatar_instance = mock_gravatar.return_value
-        mock_gravatar_instance.get_image.return_value = "http://gravatar.com/avatar/mockavatar"
-
-        # Моковий об'єкт new_user:
-        new_user = User(
-            id=None, # спочатку None
-            username=body.username,
-            email=body.email,
-            password=body.password,
-            avatar=None, # спочатку None
-            created_at=None, # спочатку None
-        )
-        # Налаштування мок-об'єкта:
-        self.session.add.return_value = None # імітація додавання даних в базу даних, return_value = None - щоб нічого зайвого не робилося 
-        self.session.commit.return_value = None # імітація коміту в базу даних
-        
-        avatar_url = "http://gravatar.com/avatar/mockavatar"
 
-        # Симулюємо поведінку db.refresh(new_user)
-        def mock_refresh(user):
-            user.id = 1  # Призначаємо моковий ID
-            user.created_at = datetime.datetime.now()  # Призначаємо моковий час створення
-            user.avatar = avatar_url  # Призначаємо моковий аватар
+        # Моковий юзер, якого повертає INSERT ... RETURNING:
+        new_user = User(id=1, username=body.username, email=body.email, password=body.password,
+                        avatar="https://www.gravatar.com/avatar/97dfebf4098c0f5c16bca61e2b76c373",
+                        created_at=datetime.datetime.now())
+        self.session.scalars.return_value.first.return_value = new_user
 
-        self.session.refresh.side_effect = mock_refresh # моковий "рефреш": додає user_id i created_at до нашого тествого юзера
-        
         # Виклик функції
         result = await create_user(body=body, db=self.session)
 
-        # Оновлюємо new_user після рефрешу
-        mock_refresh(new_user)
-
-        # Перевірка результату
-        self.assertEqual(result.id, 1)
-        self.assertEqual(result.username, new_user.username)
-        self.assertEqual(result.email, new_user.email)
-        self.assertEqual(result.password, new_user.password)
-        self.assertIsNotNone(result.created_at)
-        self.assertEqual(result.created_at, new_user.created_at)
-        self.assertEqual(result.avatar, avatar_url)
+        # Перевірка результату: один INSERT, аватар пораховано локально, без окремого SELECT/refresh
+        self.assertIs(result, new_user)
+        statement = self.session.scalars.call_args.args[0]
+        self.assertEqual(statement.compile().params["avatar"], gravatar_url(body.email))
+        self.assertEqual(statement.compile().params["email"], body.email)
+        self.session.commit.assert_called_once()
+        self.session.refresh.assert_not_called()
+        self.session.query.assert_not_called()
 
 
-    @patch("src.repository.users.Gravatar")
-    async def test_create_user_no_avatar(self, mock_gravatar):
+    async def test_create_user_conflict(self):
         body = UserModel(
                          id=1,
                          username="AnnaAl", 
                          email="test@mail.com", 
                          password="annaa_pass"
                         )
-        
-        # Мок Gravatar
-        mock_gravatar_instance = mock_gravatar.return_value
-        mock_gravatar_instance.get_image.side_effect = Exception("Gravatar service error")
-
-        # Моковий об'єкт new_user:
-        new_user = User(
-            id=None, # спочатку None
-            username=body.username,
-            email=body.email,
-            password=body.password,
-            avatar=None, # спочатку None
-            created_at=None, # спочатку None
-        )
-        # Налаштування мок-об'єкта:
-        self.session.add.return_value = None # імітація додавання даних в базу даних, return_value = None - щоб нічого зайвого не робилося 
-        self.session.commit.return_value = None # імітація коміту в базу даних
-
-        # Симулюємо поведінку db.refresh(new_user)
-        def mock_refresh(user):
-            user.id = 1  # Призначаємо моковий ID
-            user.created_at = datetime.datetime.now()  # Призначаємо моковий час створення
-            user.avatar = None  # Через помилку аватар залишається None
+        # ON CONFLICT DO NOTHING нічого не повертає - такий email вже є
+        self.session.scalars.return_value.first.return_value = None
 
-        self.session.refresh.side_effect = mock_refresh # моковий "рефреш": додає user_id i created_at до нашого тествого юзера
-        
-        # Виклик функції
-        result = await create_user(body=body, db=self.session)
+        result = await create_user(body=body, db=self.session, confirmation_host="http://testserver/")
 
-        # Оновлюємо new_user після рефрешу
-        mock_refresh(new_user)
-
-        # Перевірка результату
-        self.assertEqual(result.id, 1)
-        self.assertEqual(result.username, new_user.username)
-        self.assertEqual(result.email, new_user.email)
-        self.assertEqual(result.password, new_user.password)
-        self.assertIsNotNone(result.created_at)
-        self.assertEqual(result.created_at, new_user.created_at)
-        self.assertIsNone(result.avatar)  # Перевіряємо, що аватар залишився None
-
-    async def test_update_token(self):
-        # створюю тествого юзера:
-        user = User(id=5, username="Anna_An", email="anna_an@gmail.com", refresh_token=None)
-
-        # new token:
-        new_token = "the_new_refresh_token"
-
-        # викликаю функцію:
-        result = await update_token(user=user, token=new_token, db=self.session)
-
-        # Перевірка, чи оновлено токен
-        self.assertEqual(user.refresh_token, new_token)
-
-        # Перевірка, чи викликано commit
-        self.session.commit.assert_called_once()
+        self.assertIsNone(result)
+        self.session.add.assert_not_called()  # лист в outbox теж не додається
+        self.session.commit.assert_not_called()
 
 
-    async def test_update_token_if_token_is_none(self):
-        user = User(id=5, username="Anna_An", email="anna_an@gmail.com", refresh_token="refresh_token_exists")
-        new_token=None
-        result = await update_token(user=user, token=new_token, db=self.session)
-        # Перевіряємо, що refresh_token змінено на None
-        self.assertIsNone(user.refresh_token)
-        # Перевіряємо, що commit викликано
-        self.session.commit.assert_called_once()
+    def test_gravatar_url(self):
+        # MD5 від email у нижньому регістрі і без пробілів, як у Gravatar
+        self.assertEqual(gravatar_url(" Foo@Example.com "),
+                         "https://www.gravatar.com/avatar/b48def645758b95537d4424c84d1a9ff")
 
 
-    async def test_update_token_calls_commit(self):
-        user = User(id=5, username="Anna_An", email="anna_an@gmail.com", refresh_token=None)
-        new_token="refresh_token"
-        result = await update_token(user=user, token=new_token, db=self.session)
-        # Перевіряємо, що refresh_token оновлено
-        self.assertEqual(user.refresh_token, new_token)
-        # Перевіряємо, що commit викликано
+    async def test_update_password(self):
+        user = User(id=5, username="Anna_An", email="anna_an@gmail.com", password="$2b$04$old")
+        await update_password(user=user, password_hash="$2b$12$new", db=self.session)
+        # Перевіряємо, що хеш замінено і збережено
+        self.assertEqual(user.password, "$2b$12$new")
         self.session.commit.assert_called_once()
 
 
@@ -1,20 +1,26 @@
 import pytest
-# from contextlib import contextmanager
+from contextlib import contextmanager
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 # from unittest.mock import patch
 
 from main import app
 from src.database.models import Base
-from src.database.db import get_db
+from src.database.db import get_db, get_read_db
+from src.database.pool import instrument
+from src.services import rate_limit
+from src.services.rate_limit import RateLimitBackend, TokenBucketLimiter
 from .utils import mock_redis, mock_rate_limiter  # Імпортуємо моки
 
+REAL_LIMITER_CALL = TokenBucketLimiter.__call__  # до того, як setup_mocks підмінить його моком
+
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+instrument(engine)  # ті самі хуки лічильників запитів, що й у робочої бази
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -41,6 +47,7 @@ def client(session):
             session.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     yield TestClient(app)
 
 
@@ -54,3 +61,42 @@ def setup_mocks():
 @pytest.fixture(scope="module")
 def user():
     return {"username": "deadpool", "email": "deadpool@example.com", "password": "123456789"}
+
+
+@pytest.fixture
+def max_queries():
+    """
+    Asserts an upper bound on the SQL statements run inside the block::
+
+        with max_queries(2):
+            client.get("/api/contacts/", headers=headers)
+
+    On failure the message lists the statements, so an N+1 (a lazy load per row) is easy to spot.
+    """
+    @contextmanager
+    def assert_max_queries(limit: int):
+        statements = []
+
+        def on_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "after_cursor_execute", on_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "after_cursor_execute", on_execute)
+        assert len(statements) <= limit, f"{len(statements)} queries, expected at most {limit}:\n" + \
+            "\n".join(statements)
+
+    return assert_max_queries
+
+
+@pytest.fixture
+def rate_limiter(monkeypatch):
+    """
+    Turns the real token buckets back on for one test, on a fresh backend of this worker only (no Redis sync).
+    """
+    backend = RateLimitBackend()
+    monkeypatch.setattr(TokenBucketLimiter, "__call__", REAL_LIMITER_CALL)
+    monkeypatch.setattr(rate_limit, "rate_limit_backend", backend)
+    return backend
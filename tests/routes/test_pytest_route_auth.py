@@ -1,10 +1,15 @@
-from unittest.mock import MagicMock
+import time
 
-from src.database.models import User
+from fastapi.testclient import TestClient
+from src.database.models import User, EmailOutbox
+from passlib.context import CryptContext
 
-def test_create_user(client, user, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email) #підміна функції send_email з доп. monkeypatch.
+from main import app
+from src.conf.config import settings
+from src.services.auth import auth_service
+from src.services.login_throttle import login_throttle
+
+def test_create_user(client, session, user):
     response = client.post(
         "/api/auth/signup",
         json=user,
@@ -13,6 +18,10 @@ def test_create_user(client, user, monkeypatch):
     data = response.json()
     assert data["user"]["email"] == user.get("email")
     assert "id" in data["user"]
+    # лист з підтвердженням не відправляється в запиті, а чекає на воркер в outbox
+    email = session.query(EmailOutbox).filter(EmailOutbox.recipient == user.get("email")).one()
+    assert email.kind == "confirm_email"
+    assert email.status == "pending"
 
 
 def test_repeat_create_user(client, user):
@@ -66,4 +75,143 @@ def test_login_wrong_email(client, user):
     )
     assert response.status_code == 401, response.text
     data = response.json()
-    assert data["detail"] == "Invalid email"
\ No newline at end of file
+    assert data["detail"] == "Invalid email"
+
+
+def login(client, user):
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get('email'), "password": user.get('password')},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["refresh_token"]
+
+
+def refresh(client, token):
+    return client.get("/api/auth/refresh_token", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_refresh_token_rotation(client, user):
+    token = login(client, user)
+    response = refresh(client, token)
+    assert response.status_code == 200, response.text
+    new_token = response.json()["refresh_token"]
+    assert new_token != token
+    # старий токен вже використано
+    response = refresh(client, token)
+    assert response.status_code == 401, response.text
+    assert response.json()["detail"] == "Invalid refresh token"
+
+
+def test_refresh_token_reuse_revokes_session(client, user):
+    token = login(client, user)
+    new_token = refresh(client, token).json()["refresh_token"]
+    assert refresh(client, token).status_code == 401
+    # повторне використання відкликало всю сесію, разом з новим токеном
+    assert refresh(client, new_token).status_code == 401
+
+
+def test_refresh_token_sessions_are_independent(client, user):
+    first, second = login(client, user), login(client, user)
+    refresh(client, first)
+    assert refresh(client, first).status_code == 401
+    response = refresh(client, second)
+    assert response.status_code == 200, response.text
+
+
+def test_logout_revokes_access_token(client, user):
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get('email'), "password": user.get('password')},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert client.get("/api/users/me", headers=headers).status_code == 200
+
+    response = client.post("/api/auth/logout", headers=headers)
+    assert response.status_code == 204, response.text
+    assert client.get("/api/users/me", headers=headers).status_code == 401
+    assert client.post("/api/auth/logout", headers=headers).status_code == 401
+
+
+def test_login_blocked_before_database(client, monkeypatch):
+    for _ in range(6):
+        response = client.post("/api/auth/login", data={"username": "victim@example.com", "password": "guess"})
+        assert response.status_code == 401, response.text
+
+    def get_user_by_email(*args):
+        raise AssertionError("blocked login must not query the database")
+
+    monkeypatch.setattr("src.repository.users.get_user_by_email", get_user_by_email)
+    response = client.post("/api/auth/login", data={"username": "victim@example.com", "password": "guess"})
+    assert response.status_code == 429, response.text
+    assert response.json()["detail"] == "Too many failed login attempts"
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_owner_logs_in_while_account_is_attacked(client, user, monkeypatch):
+    monkeypatch.setattr(settings, "trusted_proxies", ["127.0.0.1"])
+    # атака з кількох IP перевищує загальний ліміт акаунта: вхід сповільнюється, але не блокується
+    monkeypatch.setattr(login_throttle, "account_total_free_attempts", 10)
+    monkeypatch.setattr(login_throttle, "delay_max", 0.2)
+
+    def from_ip(ip: str):
+        async def app_behind_proxy(scope, receive, send):
+            scope["client"] = ("127.0.0.1", 50000)  # запити приходять через наш проксі
+            await app(scope, receive, send)
+        return TestClient(app_behind_proxy, headers={"X-Forwarded-For": ip})
+
+    for ip in ("198.51.100.1", "198.51.100.2"):
+        attacker = from_ip(ip)
+        statuses = [attacker.post("/api/auth/login",
+                                  data={"username": user.get('email'), "password": "guess"}).status_code
+                    for _ in range(7)]
+        assert statuses[-1] == 429
+
+    start = time.monotonic()
+    response = from_ip("203.0.113.10").post(
+        "/api/auth/login",
+        data={"username": user.get('email'), "password": user.get('password')},
+    )
+    assert response.status_code == 200, response.text
+    assert time.monotonic() - start >= 0.2
+
+
+def test_login_rehashes_password_with_stale_rounds(client, session, user):
+    current_user: User = session.query(User).filter(User.email == user.get('email')).first()
+    current_user.password = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash(user.get('password'))
+    session.commit()
+
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get('email'), "password": user.get('password')},
+    )
+    assert response.status_code == 200, response.text
+    current_user = session.query(User).filter(User.email == user.get('email')).first()
+    assert not auth_service.pwd_context.needs_update(current_user.password)
+    assert auth_service.verify_password(user.get('password'), current_user.password)
+
+
+def test_metrics_record_route_templates(client, user, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_token", "scrape-secret")
+    client.get("/api/auth/confirmed_email/not-a-token")
+
+    response = client.get("/api/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/api/auth/confirmed_email/{token}",status="422"} 1' in body
+    assert 'http_request_duration_seconds_bucket{method="POST",route="/api/auth/login",status="200",le="+Inf"}' in body
+    assert 'db_queries_total{route="/api/auth/login"}' in body
+    assert "http_requests_in_flight 1" in body  # сам запит /api/metrics
+
+
+def test_request_email_queues_confirmation(client, session):
+    other = {"username": "cable", "email": "cable@example.com", "password": "123456789"}
+    assert client.post("/api/auth/signup", json=other).status_code == 201
+
+    response = client.post("/api/auth/request_email", json={"email": other["email"]})
+
+    assert response.status_code == 200, response.text
+    emails = session.query(EmailOutbox).filter(EmailOutbox.recipient == other["email"]).all()
+    assert [email.kind for email in emails] == ["confirm_email", "confirm_email"]
+    assert emails[-1].payload == {"username": "cable", "host": "http://testserver/"}
@@ -4,6 +4,7 @@ import fakeredis # без цього в мене ну ніяк не мокавс
 from unittest.mock import AsyncMock, MagicMock, patch
 
 from src.database.models import User
+from src.services.auth import auth_service
 
 
 @pytest.fixture 
@@ -15,9 +16,7 @@ def mock_redis():
 
 
 @pytest.fixture() # тут готуємо токен для наших тестів
-def token(client, user, session, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+def token(client, user, session):
     client.post("/api/auth/signup", json=user)
     current_user: User = session.query(User).filter(User.email == user.get('email')).first()
     current_user.confirmed = True
@@ -453,4 +452,83 @@ def test_repeat_remove_contact(mock_redis, mock_remove_contact, client, token):
     # Перевіряємо відповіді
     assert response.status_code == 404, response.text
     data = response.json()
-    assert data["detail"] == "Contact not found"
\ No newline at end of file
+    assert data["detail"] == "Contact not found"
+
+
+@patch("src.services.auth.auth_service.r", new_callable=fakeredis.FakeStrictRedis)
+def test_get_contacts_query_count_does_not_grow(mock_redis, client, token, max_queries):
+    params = {"args": "value", "kwargs": "value"}
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def add_contacts(start: int, count: int):
+        for i in range(start, start + count):
+            response = client.post("/api/contacts", headers=headers, json={
+                "first_name": f"Name{i}", "last_name": "Last_Name", "email": f"n_plus_one{i}@example.com",
+                "phone": f"+38050000000{i}", "birthday": "1990-01-01", "additional_info": "",
+            }, params=params)
+            assert response.status_code == 201, response.text
+
+    def list_contacts():
+        with max_queries(2) as statements:
+            response = client.get("/api/contacts", headers=headers, params={**params, "limit": 100})
+        assert response.status_code == 200, response.text
+        return len(response.json()), statements
+
+    add_contacts(0, 1)
+    client.get("/api/contacts", headers=headers, params=params)  # юзер потрапляє в кеш, далі лише контакти
+    few, few_statements = list_contacts()
+    add_contacts(1, 4)
+    many, many_statements = list_contacts()
+
+    # ті самі запити для 1 і для 5 нових контактів - немає lazy load на кожен рядок
+    assert many == few + 4
+    assert many_statements == few_statements
+    assert len(many_statements) == 1
+
+
+@pytest.fixture()
+def other_token(client, session):
+    other = {"username": "wolverine", "email": "wolverine@example.com", "password": "123456789"}
+    client.post("/api/auth/signup", json=other)
+    session.query(User).filter(User.email == other["email"]).update({"confirmed": True})
+    session.commit()
+    response = client.post("/api/auth/login", data={"username": other["email"], "password": other["password"]})
+    return response.json()["access_token"]
+
+
+@patch("src.services.auth.auth_service.r", new_callable=fakeredis.FakeStrictRedis)
+def test_contacts_rate_limit_is_per_user_with_burst(mock_redis, client, token, other_token, rate_limiter):
+    params = {"args": "value", "kwargs": "value"}
+    headers = {"Authorization": f"Bearer {token}"}
+    # contacts:list - 10 запитів за 60 с плюс сплеск 5: одразу проходять 15
+    statuses = [client.get("/api/contacts", headers=headers, params=params).status_code for _ in range(16)]
+    assert statuses == [200] * 15 + [429]
+
+    response = client.get("/api/contacts", headers=headers, params=params)
+    assert response.status_code == 429, response.text
+    assert response.headers["Retry-After"] == "6"  # один токен на 60 / 10 секунд
+
+    # інший юзер з тієї ж IP має свій кошик
+    response = client.get("/api/contacts", headers={"Authorization": f"Bearer {other_token}"}, params=params)
+    assert response.status_code == 200, response.text
+
+
+@patch("src.services.auth.auth_service.r", new_callable=fakeredis.FakeStrictRedis)
+def test_rate_limited_request_skips_user_and_database(mock_redis, client, token, rate_limiter, max_queries):
+    params = {"args": "value", "kwargs": "value"}
+    headers = {"Authorization": f"Bearer {token}"}
+    for _ in range(15):
+        client.get("/api/contacts", headers=headers, params=params)
+
+    with patch.object(auth_service, "get_cached_user", AsyncMock()) as get_cached_user, max_queries(0):
+        response = client.get("/api/contacts", headers=headers, params=params)
+
+    assert response.status_code == 429, response.text
+    get_cached_user.assert_not_called()
+
+
+def test_anonymous_callers_are_limited_by_ip(client, token, rate_limiter):
+    # "root" - 2 запити за 5 секунд; без токена ключ - IP клієнта
+    assert [client.get("/").status_code for _ in range(3)] == [200, 200, 429]
+    assert client.get("/", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    assert client.get("/", headers={"Authorization": "Bearer not-a-token"}).status_code == 429
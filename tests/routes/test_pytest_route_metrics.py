@@ -0,0 +1,81 @@
+import pytest
+
+from src.conf.config import settings
+from src.database.models import User
+
+METRICS_PATHS = ["/api/metrics", "/api/metrics/pool", "/api/metrics/admission", "/api/metrics/revocation",
+                 "/api/metrics/slow_queries"]
+
+
+@pytest.fixture(scope="module")
+def token(client, user, session):
+    client.post("/api/auth/signup", json=user)
+    current_user: User = session.query(User).filter(User.email == user.get('email')).first()
+    current_user.confirmed = True
+    session.commit()
+    response = client.post("/api/auth/login", data={"username": user.get('email'), "password": user.get('password')})
+    return response.json()["access_token"]
+
+
+@pytest.fixture
+def admin(monkeypatch, user):
+    monkeypatch.setattr(settings, "admin_emails", [user["email"].upper()])  # регістр email не важливий
+
+
+@pytest.fixture
+def metrics_token(monkeypatch):
+    monkeypatch.setattr(settings, "metrics_token", "scrape-secret")
+    return "scrape-secret"
+
+
+@pytest.mark.parametrize("path", METRICS_PATHS)
+def test_metrics_require_authentication(client, path):
+    response = client.get(path)
+    assert response.status_code == 401, response.text
+
+
+@pytest.mark.parametrize("path", METRICS_PATHS)
+def test_metrics_forbidden_for_regular_user(client, token, path):
+    response = client.get(path, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 403, response.text
+
+
+def test_metrics_token_is_accepted(client, metrics_token):
+    response = client.get("/api/metrics", headers={"Authorization": f"Bearer {metrics_token}"})
+    assert response.status_code == 200, response.text
+    assert response.text.startswith("# HELP http_requests_total")
+
+    response = client.get("/api/metrics", headers={"Authorization": "Bearer not-the-token"})
+    assert response.status_code == 401, response.text
+
+
+def test_pool_metrics(client, token, admin):
+    response = client.get("/api/metrics/pool", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    primary = response.json()["primary"]
+    assert {"checkouts", "timeouts", "wait_seconds_avg", "wait_seconds_max", "wait_seconds_buckets",
+            "in_use_peak", "overflow_peak"} <= primary.keys()
+    assert "le_inf" in primary["wait_seconds_buckets"]
+
+
+def test_admission_metrics(client, token, admin):
+    response = client.get("/api/metrics/admission", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert "auth" in data  # група запитів логіну з цього модуля
+    assert {"in_flight", "queued", "queue_delay", "admitted", "shed"} <= data["auth"].keys()
+
+
+def test_revocation_metrics(client, token, admin):
+    response = client.get("/api/metrics/revocation", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    assert response.json().keys() == {"ready", "items", "bits", "checks", "hits"}
+
+
+def test_slow_queries_metrics(client, token, admin):
+    response = client.get("/api/metrics/slow_queries", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data.keys() == {"threshold_ms", "sample_rate", "recorded", "queries"}
+    assert data["threshold_ms"] == 200
+    assert isinstance(data["queries"], list)
@@ -0,0 +1,256 @@
+import asyncio
+import hashlib
+import io
+import pickle
+import struct
+import zlib
+
+import fakeredis
+import httpx
+import pytest
+from PIL import Image
+from sqlalchemy import event
+from unittest.mock import AsyncMock, patch
+
+from main import app
+from src.conf.config import settings
+from src.database.db import get_db, get_read_db
+from src.database.models import User
+from src.repository import users as repository_users
+from src.services.auth import auth_service
+from src.services.storage import LocalStorage
+from .conftest import engine, TestingSessionLocal
+
+
+@pytest.fixture()
+def checkouts(client):
+    # Використовуємо справжню get_read_db (з LazySession) замість перевизначеної в conftest,
+    # але з тестовою базою, і рахуємо видачі з'єднань з пулу
+    counter = {"count": 0}
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        counter["count"] += 1
+
+    override = app.dependency_overrides.pop(get_read_db)
+    event.listen(engine, "checkout", on_checkout)
+    with patch("src.database.db.SessionLocal", TestingSessionLocal):
+        yield counter
+    event.remove(engine, "checkout", on_checkout)
+    app.dependency_overrides[get_read_db] = override
+
+
+@pytest.fixture()
+def db_user(session, user):
+    current_user = User(username=user["username"], email=user["email"], password="hashed", confirmed=True,
+                        avatar="http://avatar.url")
+    session.add(current_user)
+    session.commit()
+    session.refresh(current_user)
+    yield current_user
+    session.delete(current_user)
+    session.commit()
+
+
+@pytest.fixture()
+def token(user):
+    return asyncio.run(auth_service.create_access_token(data={"sub": user["email"]}))
+
+
+@patch("src.services.auth.auth_service.r", new_callable=fakeredis.FakeStrictRedis)
+def test_read_users_me_cached_no_checkout(mock_redis, client, db_user, token, checkouts):
+    # Юзер вже в кеші Redis - база не потрібна зовсім
+    mock_redis.set(f"user:{db_user.email}", pickle.dumps(db_user))
+
+    response = client.get("/api/users/me/", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["email"] == db_user.email
+    assert checkouts["count"] == 0
+
+
+@patch("src.services.auth.auth_service.r", new_callable=fakeredis.FakeStrictRedis)
+def test_read_users_me_cache_miss_checks_out(mock_redis, client, db_user, token, checkouts):
+    response = client.get("/api/users/me/", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["email"] == db_user.email
+    assert checkouts["count"] == 1
+
+
+@patch("src.services.auth.auth_service.r", new_callable=fakeredis.FakeStrictRedis)
+def test_read_users_me_query_count(mock_redis, client, db_user, token, max_queries):
+    headers = {"Authorization": f"Bearer {token}"}
+    with max_queries(1):  # промах кешу - один SELECT юзера
+        assert client.get("/api/users/me/", headers=headers).status_code == 200
+    with max_queries(0):  # тепер юзер у кеші
+        assert client.get("/api/users/me/", headers=headers).status_code == 200
+
+
+@patch("src.services.auth.auth_service.r", new_callable=fakeredis.FakeStrictRedis)
+def test_concurrent_cache_misses_load_user_once(mock_redis, db_user, token):
+    # Поки перший запит вантажить юзера з бази, решта чекають на його результат
+    async def slow_get_user(email, db):
+        await asyncio.sleep(0.05)
+        return db_user
+
+    async def run():
+        return await asyncio.gather(*(auth_service.get_current_user(token, db=None) for _ in range(10)))
+
+    with patch("src.services.auth.repository_users.get_user_by_email",
+               new=AsyncMock(side_effect=slow_get_user)) as get_user:
+        users = asyncio.run(run())
+
+    assert get_user.await_count == 1
+    assert all(current_user.email == db_user.email for current_user in users)
+    assert 0 < mock_redis.ttl(f"user:{db_user.email}") <= 900
+    assert not auth_service.user_loads
+
+
+@patch("src.services.auth.auth_service.r", new_callable=fakeredis.FakeStrictRedis)
+def test_waiter_gets_own_user_after_leader_commits(mock_redis, db_user, token, monkeypatch):
+    # справжні залежності: одна сесія основної бази на запит, коміт маршруту робить expire юзера
+    monkeypatch.delitem(app.dependency_overrides, get_db, raising=False)
+    monkeypatch.delitem(app.dependency_overrides, get_read_db, raising=False)
+    monkeypatch.setattr("src.database.db.SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr("src.database.db.ReplicaSessionLocal", None)
+    headers = {"Authorization": f"Bearer {token}"}
+    get_user_by_email, load_user = repository_users.get_user_by_email, auth_service.load_user
+    loads = []
+
+    async def run():
+        loading = asyncio.Event()
+
+        async def slow_get_user(email, db):
+            user = await get_user_by_email(email, db)
+            loading.set()
+            await asyncio.sleep(0.05)  # тим часом другий запит стає в чергу за цим завантаженням
+            return user
+
+        async def ordered_load_user(email, db, stale=None):
+            waiter = bool(loads)
+            loads.append(email)
+            user = await load_user(email, db, stale)
+            if waiter:  # другий запит читає юзера, коли перший уже закомітив і закрив свою сесію
+                await leader
+            return user
+
+        with patch.object(repository_users, "get_user_by_email", slow_get_user), \
+                patch.object(auth_service, "load_user", ordered_load_user):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                leader = asyncio.create_task(client.post("/api/contacts/", headers=headers, json={
+                    "first_name": "Leader", "last_name": "Last_Name", "email": "leader@example.com",
+                    "phone": "+380500000099", "birthday": "1990-01-01", "additional_info": "",
+                }, params={"args": "value", "kwargs": "value"}))
+                await loading.wait()
+                me = await client.get("/api/users/me/", headers=headers)
+                return await leader, me
+
+    created, me = asyncio.run(run())
+
+    assert len(loads) == 2
+    assert created.status_code == 201, created.text
+    assert me.status_code == 200, me.text
+    assert me.json()["email"] == db_user.email
+
+
+@pytest.mark.parametrize("taken_over", [False, True])
+def test_user_lock_is_released_only_by_its_holder(monkeypatch, db_user, taken_over):
+    pytest.importorskip("lupa")  # Lua-скрипти у fakeredis
+    r = fakeredis.FakeStrictRedis()
+    monkeypatch.setattr(auth_service, "r", r)
+    monkeypatch.setattr(settings, "user_cache_lock_ms", 100)
+    lock_key = f"lock:user:{db_user.email}"
+
+    async def slow_get_user(email, db):
+        if taken_over:  # лок протух під час завантаження, і його взяв інший воркер
+            r.set(lock_key, "other-worker")
+        return db_user
+
+    with patch.object(repository_users, "get_user_by_email", slow_get_user):
+        user = asyncio.run(auth_service.get_current_user(token=asyncio.run(
+            auth_service.create_access_token(data={"sub": db_user.email})), db=None))
+
+    assert user.email == db_user.email
+    assert r.get(lock_key) == (b"other-worker" if taken_over else None)
+
+
+def png(width: int, height: int) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(output, format="PNG")
+    return output.getvalue()
+
+
+@patch("src.services.auth.auth_service.r", new_callable=fakeredis.FakeStrictRedis)
+def test_update_avatar_resizes_and_stores_locally(mock_redis, client, db_user, token, tmp_path):
+    storage = LocalStorage(str(tmp_path), "/media")
+    image = png(800, 600)
+    avatar_hash = hashlib.sha256(image).hexdigest()
+    with patch("src.services.storage.avatar_storage", storage):
+        response = client.patch("/api/users/avatar", headers={"Authorization": f"Bearer {token}"},
+                                files={"file": ("avatar.png", image, "image/png")})
+
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["avatar"] == f"/media/ContactsApp/{avatar_hash}_250.png"
+    assert data["avatars"] == {str(size): f"/media/ContactsApp/{avatar_hash}_{size}.png"
+                               for size in (32, 64, 128, 250)}
+    for size in (32, 64, 128, 250):
+        with Image.open(storage.path(f"ContactsApp/{avatar_hash}", size)) as variant:
+            assert variant.size == (size, size)
+
+
+@patch("src.services.auth.auth_service.r", new_callable=fakeredis.FakeStrictRedis)
+def test_update_avatar_skips_upload_of_same_content(mock_redis, client, db_user, token, tmp_path):
+    storage = LocalStorage(str(tmp_path), "/media")
+    image = png(300, 300)
+    with patch("src.services.storage.avatar_storage", storage), \
+            patch.object(storage, "upload", wraps=storage.upload) as upload:
+        for _ in range(2):
+            response = client.patch("/api/users/avatar", headers={"Authorization": f"Bearer {token}"},
+                                    files={"file": ("avatar.png", image, "image/png")})
+            assert response.status_code == 200, response.text
+
+    assert upload.call_count == 1
+    assert response.json()["avatar"].endswith(f"{hashlib.sha256(image).hexdigest()}_250.png")
+
+
+@patch("src.services.auth.auth_service.r", new_callable=fakeredis.FakeStrictRedis)
+def test_update_avatar_rejects_non_image(mock_redis, client, db_user, token, tmp_path):
+    with patch("src.services.storage.avatar_storage", LocalStorage(str(tmp_path), "/media")):
+        response = client.patch("/api/users/avatar", headers={"Authorization": f"Bearer {token}"},
+                                files={"file": ("avatar.png", b"not an image", "image/png")})
+
+    assert response.status_code == 400, response.text
+
+
+def png_chunk(kind: bytes, data: bytes = b"") -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def png_of_size(width: int, height: int) -> bytes:
+    # заголовок з розмірами і майже порожні дані - Pillow перевіряє розміри ще до декодування пікселів
+    header = png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+    return b"\x89PNG\r\n\x1a\n" + header + png_chunk(b"IDAT", zlib.compress(b"\0")) + png_chunk(b"IEND")
+
+
+@patch("src.services.auth.auth_service.r", new_callable=fakeredis.FakeStrictRedis)
+def test_update_avatar_rejects_truncated_image_and_decompression_bomb(mock_redis, client, db_user, token, tmp_path):
+    output = io.BytesIO()
+    Image.new("RGB", (300, 300), "red").save(output, format="PNG")
+    truncated = output.getvalue()[:200]
+    bomb = png_of_size(50000, 50000)  # 2.5 млрд пікселів при кількох байтах файлу
+
+    with patch("src.services.storage.avatar_storage", LocalStorage(str(tmp_path), "/media")):
+        for data, detail in ((truncated, "File is not an image"), (bomb, "Image is too large")):
+            response = client.patch("/api/users/avatar", headers={"Authorization": f"Bearer {token}"},
+                                    files={"file": ("avatar.png", data, "image/png")})
+            assert response.status_code == 400, response.text
+            assert response.json()["detail"] == detail
+
+
+def test_local_storage_rejects_keys_outside_root(tmp_path):
+    storage = LocalStorage(str(tmp_path / "media"), "/media")
+
+    with pytest.raises(ValueError):
+        storage.upload("ContactsApp/../../../x", {250: b"png"})
+    assert not (tmp_path / "x_250.png").exists()
@@ -8,12 +8,14 @@ from unittest.mock import AsyncMock, patch
 def mock_redis():
     # Мокання Redis
     fake_redis = fakeredis.FakeStrictRedis()
-    with patch("src.services.auth.redis.StrictRedis", return_value=fake_redis):
+    # клієнти сервісів створюються при імпорті, тож підмінюємо саме їх
+    with patch("src.services.auth.auth_service.r", fake_redis), \
+            patch("src.services.login_throttle.login_throttle.r", fake_redis):
         yield fake_redis
 
 
 @contextmanager
 def mock_rate_limiter():
-    # Мок FastAPILimiter
-    with patch("fastapi_limiter.depends.RateLimiter.__call__", AsyncMock(return_value=None)):
+    # Мок лімітера запитів
+    with patch("src.services.rate_limit.TokenBucketLimiter.__call__", AsyncMock(return_value=None)):
         yield
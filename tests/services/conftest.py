@@ -0,0 +1,63 @@
+import asyncio
+import socket
+
+import pytest
+from aiosmtpd.controller import Controller
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database.models import Base
+
+
+class RecordingHandler:
+    # Локальний SMTP-сервер замість справжнього: запам'ятовує листи і сесії (з'єднання)
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bounce"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.messages.append(envelope)
+        self.sessions.add(id(session))
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture()
+def smtp_server():
+    def start(delay: float = 0, **server_kwargs):
+        handler = RecordingHandler(delay)
+        controller = Controller(handler, hostname="127.0.0.1", port=free_port(), **server_kwargs)
+        controller.start()
+        servers.append(controller)
+        return handler, controller
+
+    servers = []
+    yield start
+    for controller in servers:
+        controller.stop()
+
+
+
+@pytest.fixture()
+def db():
+    # окрема порожня база в пам'яті для кожного тесту
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
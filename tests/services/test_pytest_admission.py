@@ -0,0 +1,133 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from fastapi.testclient import TestClient
+
+from main import app
+from src.middleware.admission import AdmissionController, AdmissionMiddleware, admission_controller
+
+
+def make_controller(**options) -> AdmissionController:
+    options = {"max_in_flight": 2, "target_delay": 0.05, "max_queue_time": 1.0,
+               "low_priority": ["/api/contacts/birthdays"], **options}
+    return AdmissionController(**options)
+
+
+def test_waiting_requests_are_admitted_in_fifo_order():
+    controller = make_controller(max_in_flight=1)
+    group = controller.group("/api/contacts")
+    order = []
+
+    async def request(i: int):
+        assert await controller.admit(group, low_priority=False) == 0
+        order.append(i)
+
+    async def run():
+        assert await controller.admit(group, low_priority=False) == 0
+        tasks = []
+        for i in range(3):
+            tasks.append(asyncio.create_task(request(i)))
+            await asyncio.sleep(0)  # задача стає в чергу
+        assert [not waiter.done() for waiter in group.waiting] == [True] * 3
+        for _ in range(3):
+            group.release()  # слот переходить до першого в черзі
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+
+    assert order == [0, 1, 2]
+    assert group.in_flight == 1
+
+
+def test_low_priority_is_shed_when_group_is_full():
+    controller = make_controller(max_in_flight=1)
+    group = controller.group("/api/contacts")
+
+    async def run():
+        await controller.admit(group, low_priority=False)
+        return await controller.admit(group, low_priority=True)
+
+    assert asyncio.run(run()) >= 1
+    assert group.shed == 1
+    assert group.waiting == []  # низький пріоритет не стає в чергу
+
+
+def test_low_priority_is_shed_on_queue_delay_while_critical_is_admitted():
+    controller = make_controller(max_in_flight=10, target_delay=0.05)
+    group = controller.group("/api/contacts")
+    for _ in range(20):  # черга останнім часом трималась довго
+        group.observe_wait(0.5, group.updated)
+
+    async def run():
+        return (await controller.admit(group, low_priority=True),
+                await controller.admit(group, low_priority=False))
+
+    shed, critical = asyncio.run(run())
+
+    assert shed > 0
+    assert critical == 0
+    assert group.in_flight == 1
+
+
+def test_queued_request_gives_up_after_max_queue_time():
+    controller = make_controller(max_in_flight=1, max_queue_time=0.05)
+    group = controller.group("/api/contacts")
+
+    async def run():
+        await controller.admit(group, low_priority=False)
+        return await controller.admit(group, low_priority=False)
+
+    assert asyncio.run(run()) == 0.05
+    assert group.shed == 1
+    assert group.in_flight == 1
+
+
+def test_saturated_group_sheds_low_priority_and_admits_critical():
+    controller = make_controller(max_in_flight=2, max_queue_time=5.0)
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def slow_app(scope, receive, send):
+            await gate.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        middleware = AdmissionMiddleware(slow_app, controller)
+
+        async def call(path: str) -> tuple[int, dict]:
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            await middleware({"type": "http", "path": path, "headers": []}, AsyncMock(), send)
+            return messages[0]["status"], dict(messages[0]["headers"])
+
+        busy = [asyncio.create_task(call("/api/contacts/")) for _ in range(2)]
+        await asyncio.sleep(0)
+        critical = asyncio.create_task(call("/api/contacts/1"))
+        status, headers = await call("/api/contacts/birthdays")
+        await asyncio.sleep(0)
+        assert not critical.done()  # чекає в черзі, а не отримує 503
+        gate.set()
+        return status, headers, await critical, await asyncio.gather(*busy)
+
+    status, headers, critical, busy = asyncio.run(run())
+
+    assert status == 503
+    assert int(headers[b"retry-after"]) >= 1
+    assert critical[0] == 200
+    assert [response[0] for response in busy] == [200, 200]
+    snapshot = controller.snapshot()["contacts"]
+    assert snapshot["admitted"] == 3 and snapshot["shed"] == 1 and snapshot["in_flight"] == 0
+
+
+def test_shed_response_has_cors_headers():
+    with patch.object(admission_controller, "admit", AsyncMock(return_value=2.0)):
+        response = TestClient(app).get("/api/contacts/birthdays", headers={"Origin": "http://localhost:3000"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
@@ -0,0 +1,83 @@
+import asyncio
+from datetime import date
+
+from sqlalchemy import event
+
+from src.database.models import Contact, EmailOutbox, User
+from src.repository.contacts import birthday_keys
+from src.workers.birthdays import enqueue_digests, next_birthday
+
+
+def add_user(db, name: str, confirmed: bool = True) -> User:
+    user = User(username=name, email=f"{name}@example.com", password="hashed", confirmed=confirmed)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def add_contact(db, owner: User, name: str, birthday: date) -> None:
+    db.add(Contact(first_name=name, last_name="Last", email=f"{name}@contacts.com", phone="1",
+                   birthday=birthday, owner_id=owner.id))
+    db.commit()
+
+
+def test_birthday_keys_cross_the_new_year_and_include_feb_29():
+    assert birthday_keys(date(2025, 12, 30), 3) == [1230, 1231, 101, 102]
+    assert birthday_keys(date(2025, 2, 27), 2) == [227, 228, 229, 301]
+    assert birthday_keys(date(2024, 2, 27), 2) == [227, 228, 229]
+
+
+def test_next_birthday():
+    assert next_birthday(date(1990, 1, 2), date(2025, 12, 30)) == date(2026, 1, 2)
+    assert next_birthday(date(1992, 2, 29), date(2025, 2, 27)) == date(2025, 2, 28)
+
+
+def test_one_digest_per_owner_in_chunks(db):
+    today = date(2025, 12, 30)
+    alice, bob, carol = add_user(db, "alice"), add_user(db, "bob"), add_user(db, "carol", confirmed=False)
+    add_contact(db, alice, "Jan", date(1990, 1, 2))
+    add_contact(db, alice, "Dec", date(1985, 12, 31))
+    add_contact(db, alice, "Later", date(1985, 3, 1))
+    add_contact(db, bob, "Today", date(2000, 12, 30))
+    add_contact(db, carol, "Unconfirmed", date(2000, 12, 31))
+    add_user(db, "dave")  # без контактів
+
+    queued = asyncio.run(enqueue_digests(db, today, days=7, chunk_size=1))
+
+    assert queued == 2
+    digests = {email.recipient: email.payload for email in
+               db.query(EmailOutbox).filter(EmailOutbox.kind == "birthday_digest")}
+    assert set(digests) == {"alice@example.com", "bob@example.com"}
+    assert [contact["first_name"] for contact in digests["alice@example.com"]["contacts"]] == ["Dec", "Jan"]
+    assert digests["alice@example.com"]["contacts"][1]["date"] == "2026-01-02"
+    assert digests["bob@example.com"]["username"] == "bob"
+
+
+def test_rerun_on_the_same_day_adds_nothing(db):
+    owner = add_user(db, "erin")
+    add_contact(db, owner, "Soon", date(1990, 6, 2))
+
+    assert asyncio.run(enqueue_digests(db, date(2025, 6, 1))) == 1
+    assert asyncio.run(enqueue_digests(db, date(2025, 6, 1))) == 0
+
+
+def test_owners_are_not_reloaded_after_commits(db):
+    today = date(2025, 6, 1)
+    for i in range(7):  # непідтверджений власник зсуває коміти всередину наступних чанків
+        owner = add_user(db, f"owner{i}", confirmed=i != 1)
+        add_contact(db, owner, f"Contact{i}", date(1990, 6, 2))
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.get_bind(), "after_cursor_execute", on_execute)
+    try:
+        assert asyncio.run(enqueue_digests(db, today, days=7, chunk_size=2)) == 6
+    finally:
+        event.remove(db.get_bind(), "after_cursor_execute", on_execute)
+
+    # 4 чанки: власники кожного - одним запитом, без SELECT на кожного після коміту
+    assert sum("FROM users" in statement for statement in statements) == 4
+    selects = [statement for statement in statements if statement.startswith("SELECT")]
+    assert len(selects) == 4 * 3 + 1 + 3  # 3 запити на чанк, порожній останній, перевірка outbox на кожен коміт
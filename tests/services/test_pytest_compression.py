@@ -0,0 +1,105 @@
+import asyncio
+import gzip
+import zlib
+
+import pytest
+
+from src.middleware import compression
+from src.middleware.compression import CompressionMiddleware, accepted_encodings
+
+BODY = b'{"first_name": "Test_Name", "last_name": "Last_Name"}' * 100
+
+
+def app_sending(*chunks: bytes, headers: list[tuple[bytes, bytes]] = ()):
+    async def app(scope, receive, send):
+        raw = [(b"content-type", b"application/json"), *headers]
+        if len(chunks) == 1:
+            raw.append((b"content-length", str(len(chunks[0])).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": raw})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return app
+
+
+def run(app, accept_encoding: str | None = "gzip", minimum_size: int = 1000):
+    """
+    Passes one request through the middleware and returns the response headers and the body messages.
+    """
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding is not None else []
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": headers}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(CompressionMiddleware(app, minimum_size=minimum_size)(scope, receive, send))
+    start, *bodies = messages
+    return {k.decode().lower(): v.decode() for k, v in start["headers"]}, bodies
+
+
+def test_small_response_is_not_compressed():
+    headers, bodies = run(app_sending(b'{"ok": true}'))
+
+    assert "content-encoding" not in headers
+    assert bodies[0]["body"] == b'{"ok": true}'
+
+
+def test_gzip_response():
+    headers, bodies = run(app_sending(BODY), "gzip, deflate")
+
+    assert headers["content-encoding"] == "gzip"
+    assert headers["vary"] == "Accept-Encoding"
+    assert int(headers["content-length"]) == len(bodies[0]["body"]) < len(BODY)
+    assert gzip.decompress(bodies[0]["body"]) == BODY
+
+
+@pytest.mark.skipif(compression.brotli is None, reason="brotli is not installed")
+def test_brotli_is_preferred_when_accepted():
+    headers, bodies = run(app_sending(BODY), "gzip, br")
+
+    assert headers["content-encoding"] == "br"
+    assert headers["vary"] == "Accept-Encoding"
+    assert compression.brotli.decompress(bodies[0]["body"]) == BODY
+
+
+def test_gzip_without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    headers, _ = run(app_sending(BODY), "br, gzip")
+
+    assert headers["content-encoding"] == "gzip"
+
+
+def test_refused_or_missing_encoding_is_not_compressed():
+    assert accepted_encodings("gzip;q=0, br; q=0.0, identity") == {"identity"}
+    for accept_encoding in (None, "identity", "gzip;q=0"):
+        headers, bodies = run(app_sending(BODY), accept_encoding)
+        assert "content-encoding" not in headers
+        assert bodies[0]["body"] == BODY
+
+
+def test_encoded_response_passes_through():
+    already = gzip.compress(BODY)
+    headers, bodies = run(app_sending(already, headers=[(b"content-encoding", b"gzip")]), "gzip, br")
+
+    assert headers["content-encoding"] == "gzip"
+    assert "vary" not in headers
+    assert bodies[0]["body"] == already  # не стискається вдруге
+
+
+def test_streaming_response_is_flushed_chunk_by_chunk():
+    chunks = [b"[", BODY, b",", BODY, b"]"]
+    headers, bodies = run(app_sending(*chunks), "gzip", minimum_size=10 ** 6)
+
+    # у потоці розмір заздалегідь невідомий - стискається навіть при великому minimum_size
+    assert headers["content-encoding"] == "gzip"
+    assert "content-length" not in headers
+    assert [message["more_body"] for message in bodies] == [True, True, True, True, False]
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    received = b""
+    for message, chunk in zip(bodies, chunks):
+        received += decompressor.decompress(message["body"])
+        assert received.endswith(chunk)  # кожна частина доходить до клієнта одразу, без буферизації
+    assert received == b"".join(chunks)
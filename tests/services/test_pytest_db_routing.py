@@ -0,0 +1,76 @@
+from unittest.mock import MagicMock
+
+import fakeredis
+import pytest
+from starlette.requests import Request
+
+from src.database import db
+
+
+def make_request(token: str = "token") -> Request:
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())],
+                    "client": ("127.0.0.1", 1234)})
+
+
+def open_session(dependency, request: Request):
+    lazy = next(dependency(request))
+    lazy.info  # перше звернення створює справжню сесію
+    return lazy._session
+
+
+@pytest.fixture
+def sticky_redis(monkeypatch):
+    r = fakeredis.FakeStrictRedis()
+    monkeypatch.setattr(db, "sticky_redis", r)
+    return r
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    replica_session = MagicMock()
+    monkeypatch.setattr(db, "ReplicaSessionLocal", MagicMock(return_value=replica_session))
+    return replica_session
+
+
+def test_without_replica_reads_share_primary_session_and_skip_redis(monkeypatch):
+    monkeypatch.setattr(db, "ReplicaSessionLocal", None)
+    sticky = MagicMock()
+    monkeypatch.setattr(db, "sticky_redis", sticky)
+    request = make_request()
+
+    read = open_session(db.get_read_db, request)
+    write = open_session(db.get_db, request)
+
+    assert write is read  # одна сесія на запит, хоч залежностей дві
+    assert "sticky_key" not in write.info
+    sticky.exists.assert_not_called()
+    write.close()
+
+
+def test_with_replica_reads_go_to_replica(sticky_redis, replica):
+    request = make_request()
+
+    assert open_session(db.get_read_db, request) is replica
+    assert open_session(db.get_db, request) is not replica
+
+
+def test_commit_makes_client_sticky_to_primary(sticky_redis, replica):
+    writer = make_request("writer")
+    primary = open_session(db.get_db, writer)
+    primary.commit()
+    primary.close()
+
+    assert sticky_redis.ttl(db.sticky_key(writer)) > 0
+    assert open_session(db.get_read_db, make_request("writer")) is not replica
+    assert open_session(db.get_read_db, make_request("reader")) is replica  # інших клієнтів не зачіпає
+
+
+def test_sticky_window_expires(sticky_redis, replica):
+    request = make_request()
+    primary = open_session(db.get_db, request)
+    primary.commit()
+    primary.close()
+
+    sticky_redis.delete(db.sticky_key(request))  # вікно REPLICA_STICKY_SECONDS минуло
+
+    assert open_session(db.get_read_db, make_request()) is replica
@@ -0,0 +1,39 @@
+from src.services.email_templates import get_template, load_templates, render, render_many, template_env
+
+
+def test_templates_are_compiled_once():
+    assert "email_template.html" in load_templates()
+
+    assert get_template("email_template.html") is get_template("email_template.html")
+
+
+def test_render_fills_the_confirmation_link():
+    html = render("email_template.html", host="http://testserver/", username="Alice", token="abc")
+
+    assert "Hi Alice," in html
+    assert 'href="http://testserver/api/auth/confirmed_email/abc"' in html
+
+
+def test_render_escapes_user_data():
+    html = render("email_template.html", host="http://testserver/", username="<b>Bob</b>", token="abc")
+
+    assert "&lt;b&gt;Bob&lt;/b&gt;" in html
+
+
+def test_render_many_keeps_order():
+    contexts = ({"host": "http://testserver/", "username": f"user{i}", "token": str(i)} for i in range(1000))
+
+    bodies = list(render_many("email_template.html", contexts))
+
+    assert len(bodies) == 1000
+    assert "Hi user999," in bodies[-1]
+    assert template_env.bytecode_cache is not None
+
+
+def test_render_birthday_digest():
+    html = render("birthday_digest.html", username="Alice",
+                  contacts=[{"first_name": "Bob", "last_name": "Smith", "email": "bob@example.com",
+                             "date": "2025-06-02"}])
+
+    assert "Hi Alice," in html
+    assert "2025-06-02 - Bob Smith (bob@example.com)" in html
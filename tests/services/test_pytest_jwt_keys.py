@@ -0,0 +1,61 @@
+import ecdsa
+import pytest
+from jose import JWTError, jwt
+
+from src.conf.config import JwtKey
+from src.services.jwt_keys import KeyRing
+
+
+def es256_key() -> str:
+    return ecdsa.SigningKey.generate(curve=ecdsa.NIST256p).to_pem().decode()
+
+
+def test_token_carries_kid_of_active_key():
+    ring = KeyRing([JwtKey(kid="old", key="old-secret"), JwtKey(kid="new", key="new-secret")], active_kid="new")
+
+    token = ring.encode({"sub": "user@example.com"})
+
+    assert jwt.get_unverified_header(token)["kid"] == "new"
+    assert ring.decode(token)["sub"] == "user@example.com"
+
+
+def test_rotation_keeps_tokens_of_previous_key_valid():
+    old_ring = KeyRing([JwtKey(kid="old", key="old-secret")])
+    token = old_ring.encode({"sub": "user@example.com"})
+
+    ring = KeyRing([JwtKey(kid="old", key="old-secret"), JwtKey(kid="new", key="new-secret")], active_kid="new")
+    assert ring.decode(token)["sub"] == "user@example.com"
+
+    # старий ключ прибрали з кільця - його токени більше не діють
+    with pytest.raises(JWTError):
+        KeyRing([JwtKey(kid="new", key="new-secret")]).decode(token)
+
+
+def test_token_without_kid_uses_default_key():
+    token = jwt.encode({"sub": "user@example.com"}, "secret", algorithm="HS256")
+
+    assert KeyRing([JwtKey(kid="default", key="secret")]).decode(token)["sub"] == "user@example.com"
+
+
+def test_es256_tokens_verify_with_published_key():
+    private_key = es256_key()
+    ring = KeyRing([JwtKey(kid="hs", key="secret"), JwtKey(kid="ec", algorithm="ES256", key=private_key)],
+                   active_kid="ec")
+    token = ring.encode({"sub": "user@example.com"})
+
+    jwks = ring.jwks()
+    assert [key["kid"] for key in jwks["keys"]] == ["ec"]
+    assert "d" not in jwks["keys"][0]
+    # інший сервіс перевіряє токен лише публічним ключем
+    verifier = KeyRing([JwtKey(kid="ec", algorithm="ES256", key=private_key)]).keys["ec"].verifier
+    public_key = verifier.to_pem().decode()
+    other_service = KeyRing([JwtKey(kid="ec", algorithm="ES256", public_key=public_key),
+                             JwtKey(kid="signer", key="another-secret")], active_kid="signer")
+    assert other_service.decode(token)["sub"] == "user@example.com"
+
+
+def test_verify_only_key_cant_be_active():
+    public_key = ecdsa.SigningKey.from_pem(es256_key()).get_verifying_key().to_pem().decode()
+
+    with pytest.raises(ValueError):
+        KeyRing([JwtKey(kid="ec", algorithm="ES256", public_key=public_key)])
@@ -0,0 +1,59 @@
+import fakeredis
+import pytest
+
+from src.services.login_throttle import LoginThrottle
+
+
+@pytest.fixture
+def throttle():
+    return LoginThrottle(fakeredis.FakeStrictRedis(), account_free_attempts=3, ip_free_attempts=10,
+                         account_total_free_attempts=20, backoff_base=1, backoff_max=8, delay_max=4, window=60)
+
+
+def test_backoff_doubles_after_free_attempts(throttle):
+    delays = [throttle.record_failure("User@Example.com", "10.0.0.1") for _ in range(7)]
+
+    assert delays == [0, 0, 0, 1, 2, 4, 8]
+    assert 7 < throttle.check("user@example.com", "10.0.0.1")[0] <= 8
+
+
+def test_account_is_blocked_only_for_attacking_ip(throttle):
+    for ip in ("10.0.0.1", "10.0.0.2"):
+        for _ in range(5):
+            throttle.record_failure("user@example.com", ip)
+
+    assert throttle.check("user@example.com", "10.0.0.1")[0] > 0
+    assert throttle.check("user@example.com", "10.0.0.2")[0] > 0
+    assert throttle.check("user@example.com", "192.168.0.7") == (0, 0)  # власник зі своєї IP не заблокований
+
+
+def test_ip_is_blocked_across_accounts(throttle):
+    for i in range(11):
+        throttle.record_failure(f"user{i}@example.com", "10.0.0.1")
+
+    assert throttle.check("someone@example.com", "10.0.0.1")[0] > 0
+    assert throttle.check("someone@example.com", "10.0.0.2") == (0, 0)
+
+
+def test_success_resets_account_but_not_ip(throttle):
+    for _ in range(4):
+        throttle.record_failure("user@example.com", "10.0.0.1")
+
+    throttle.record_success("user@example.com", "10.0.0.1")
+
+    assert throttle.check("user@example.com", "10.0.0.1") == (0, 0)
+    assert throttle.r.get("login_failures:ip:10.0.0.1") == b"4"
+
+
+def test_account_attacked_from_many_ips_is_delayed_not_blocked(throttle):
+    # кожна IP лишається в межах своїх дозволених спроб, але всього невдач по акаунту багато
+    for i in range(24):
+        assert throttle.record_failure("User@Example.com", f"10.0.{i}.1") == 0
+
+    retry_after, delay = throttle.check("user@example.com", "192.168.0.7")
+    assert retry_after == 0  # власник не заблокований
+    assert delay == 4  # 1, 2, 4, 8 - але не довше delay_max
+    assert throttle.check("other@example.com", "192.168.0.7") == (0, 0)
+
+    throttle.record_success("user@example.com", "192.168.0.7")
+    assert throttle.check("user@example.com", "192.168.0.7")[1] == 4  # вхід власника атаку не скидає
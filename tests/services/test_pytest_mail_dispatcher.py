@@ -0,0 +1,88 @@
+import asyncio
+
+import aiosmtplib
+import pytest
+
+from src.services.email import build_message
+from src.services.mail_dispatcher import MailDispatcher
+
+
+def make_dispatcher(controller, **options) -> MailDispatcher:
+    return MailDispatcher(hostname=controller.hostname, port=controller.port, **options)
+
+
+def test_messages_share_pooled_connections(smtp_server):
+    handler, controller = smtp_server()
+    dispatcher = make_dispatcher(controller, pool_size=2, batch_size=10)
+
+    async def run():
+        for i in range(50):
+            await dispatcher.submit(build_message(f"user{i}@example.com", "Hello", f"<p>{i}</p>"))
+        await dispatcher.close()
+
+    asyncio.run(run())
+
+    assert len(handler.messages) == 50
+    assert dispatcher.stats()["sent"] == 50
+    assert dispatcher.connections <= 2
+    assert len(handler.sessions) <= 2
+
+
+def test_submit_waits_when_queue_is_full(smtp_server):
+    handler, controller = smtp_server(delay=0.2)
+    dispatcher = make_dispatcher(controller, pool_size=1, batch_size=1, queue_size=1)
+
+    async def run():
+        await dispatcher.submit(build_message("first@example.com", "Hello", "<p>1</p>"))
+        await asyncio.sleep(0.05)  # воркер забрав перший лист і відправляє його
+        await dispatcher.submit(build_message("second@example.com", "Hello", "<p>2</p>"))
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(
+                dispatcher.submit(build_message("third@example.com", "Hello", "<p>3</p>")), timeout=0.05)
+        await dispatcher.close()
+
+    asyncio.run(run())
+
+    assert [envelope.rcpt_tos for envelope in handler.messages] == [["first@example.com"], ["second@example.com"]]
+
+
+def test_reconnects_after_server_closes_connection(smtp_server):
+    handler, controller = smtp_server(timeout=0.1)  # сервер закриває з'єднання після 0.1 с простою
+    dispatcher = make_dispatcher(controller, pool_size=1)
+
+    async def run():
+        await dispatcher.submit(build_message("first@example.com", "Hello", "<p>1</p>"))
+        await dispatcher.join()
+        await asyncio.sleep(0.3)
+        await dispatcher.submit(build_message("second@example.com", "Hello", "<p>2</p>"))
+        await dispatcher.close()
+
+    asyncio.run(run())
+
+    assert len(handler.messages) == 2
+    assert dispatcher.connections == 2
+
+
+def test_unexpected_error_fails_only_its_message(smtp_server, monkeypatch):
+    handler, controller = smtp_server()
+    dispatcher = make_dispatcher(controller, pool_size=1)
+    send_message = aiosmtplib.SMTP.send_message
+
+    async def broken_send_message(self, message, *args, **kwargs):
+        if message["To"] == "broken@example.com":
+            raise ValueError("cannot encode the message")
+        return await send_message(self, message, *args, **kwargs)
+
+    monkeypatch.setattr(aiosmtplib.SMTP, "send_message", broken_send_message)
+
+    async def run():
+        with pytest.raises(ValueError):
+            await asyncio.wait_for(dispatcher.deliver(build_message("broken@example.com", "Hello", "<p>1</p>")),
+                                   timeout=5)
+        await dispatcher.deliver(build_message("next@example.com", "Hello", "<p>2</p>"))  # воркер живий
+        await asyncio.wait_for(dispatcher.close(), timeout=5)
+
+    asyncio.run(run())
+
+    assert [envelope.rcpt_tos for envelope in handler.messages] == [["next@example.com"]]
+    assert dispatcher.stats()["failed"] == 1
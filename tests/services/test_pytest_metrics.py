@@ -0,0 +1,92 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+from starlette.testclient import TestClient
+
+from src.database.pool import instrument
+from src.middleware.metrics import MetricsMiddleware
+from src.services.metrics import (Counter, Histogram, InstrumentedAsyncConnection, Registry, RequestStats,
+                                  current_request, observe_query, redis_asyncio)
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.register(Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1)))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, "/a")
+
+    lines = registry.render().splitlines()
+
+    assert lines[:2] == ["# HELP latency_seconds Latency.", "# TYPE latency_seconds histogram"]
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="/a"} 4' in lines
+    assert 'latency_seconds_sum{route="/a"} 3.65' in lines
+
+
+def test_counter_escapes_label_values():
+    registry = Registry()
+    counter = registry.register(Counter("hits_total", "Hits.", ("path",)))
+    counter.inc(2, 'say "hi"')
+
+    assert 'hits_total{path="say \\"hi\\""} 2' in registry.render()
+
+
+def test_debug_mode_adds_server_timing_and_reports_n_plus_one(caplog):
+    async def app(scope, receive, send):
+        for _ in range(3):
+            observe_query(0.002, "SELECT * FROM users WHERE id = ?")
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    client = TestClient(MetricsMiddleware(app, debug=True, n_plus_one_threshold=3))
+    response = client.get("/")
+
+    assert response.headers["Server-Timing"].startswith('db;dur=6.0;desc="3 queries", redis;desc="0 round trips"')
+    assert "N+1 suspected in GET unmatched: 3 x SELECT * FROM users WHERE id = ?" in caplog.text
+
+
+def test_server_timing_is_off_by_default():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    assert "Server-Timing" not in TestClient(MetricsMiddleware(app)).get("/").headers
+
+
+def test_failed_statement_leaves_no_timing_state(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    instrument(engine)
+    stats = RequestStats()
+    token = current_request.set(stats)
+    try:
+        with engine.connect() as conn:
+            for _ in range(3):
+                with pytest.raises(exc.OperationalError):
+                    conn.execute(text("SELECT * FROM missing_table"))
+            conn.execute(text("SELECT 1"))
+            assert not any("start" in key for key in conn.info)  # нічого не накопичується на з'єднанні
+    finally:
+        current_request.reset(token)
+        engine.dispose()
+
+    assert stats.db_queries == 1
+
+
+def test_async_redis_round_trips_are_counted():
+    stats = RequestStats()
+
+    async def run():
+        current_request.set(stats)  # задача отримує копію контексту, як запит у middleware
+        connection = InstrumentedAsyncConnection()
+        await connection.send_packed_command(b"PING")
+        await connection.send_packed_command([b"INCR k", b"EXPIRE k 10"])  # pipeline - один round trip
+
+    with patch.object(redis_asyncio.Connection, "send_packed_command", AsyncMock()) as send:
+        asyncio.run(run())
+
+    assert stats.redis_round_trips == 2
+    assert send.await_count == 2
@@ -0,0 +1,116 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from src.database.models import EmailOutbox
+from src.repository import outbox as repository_outbox
+from src.services.mail_dispatcher import MailDispatcher
+from src.workers.outbox import process_batch
+
+
+def add_confirmation(db, recipient: str) -> EmailOutbox:
+    return repository_outbox.add_email(recipient, "confirm_email",
+                                       {"username": "user", "host": "http://testserver/"}, db)
+
+
+def run_batch(db, controller) -> int:
+    async def run():
+        dispatcher = MailDispatcher(hostname=controller.hostname, port=controller.port)
+        try:
+            return await process_batch(db, dispatcher, batch_size=10)
+        finally:
+            await dispatcher.close()
+
+    return asyncio.run(run())
+
+
+def test_worker_sends_due_emails(db, smtp_server):
+    handler, controller = smtp_server()
+    emails = [add_confirmation(db, f"user{i}@example.com") for i in range(3)]
+    later = add_confirmation(db, "later@example.com")
+    later.next_attempt_at = datetime.now() + timedelta(hours=1)
+    db.commit()
+
+    assert run_batch(db, controller) == 3
+
+    assert sorted(envelope.rcpt_tos[0] for envelope in handler.messages) == \
+        ["user0@example.com", "user1@example.com", "user2@example.com"]
+    assert all(email.status == "sent" and email.sent_at and email.attempts == 1 for email in emails)
+    assert later.status == "pending"
+    assert "api/auth/confirmed_email/" in handler.messages[0].content.decode()
+
+
+def test_worker_retries_with_backoff_then_gives_up(db, smtp_server, monkeypatch):
+    monkeypatch.setattr("src.workers.outbox.settings.outbox_max_attempts", 2)
+    handler, controller = smtp_server()
+    email = add_confirmation(db, "bounce@example.com")
+    db.commit()
+
+    run_batch(db, controller)
+    assert email.status == "pending"
+    assert email.attempts == 1
+    assert "550" in email.last_error
+    assert email.next_attempt_at > datetime.now()
+
+    email.next_attempt_at = datetime.now()  # настав час повторної спроби
+    db.commit()
+    run_batch(db, controller)
+    assert email.status == "failed"
+    assert email.attempts == 2
+    assert not handler.messages
+
+
+def test_claimed_emails_are_not_claimed_twice(db):
+    add_confirmation(db, "user@example.com")
+    db.commit()
+
+    first = asyncio.run(repository_outbox.claim_emails(10, 300, 8, db))
+    second = asyncio.run(repository_outbox.claim_emails(10, 300, 8, db))
+
+    assert [(email.recipient, email.attempts) for email in first] == [("user@example.com", 1)]
+    assert db.query(EmailOutbox).one().status == "sending"
+    assert second == []
+
+
+def test_expired_lease_after_last_attempt_is_failed(db):
+    # воркер падав або зависав на листі на кожній спробі - оренда минула, а спроби вичерпано
+    stuck = add_confirmation(db, "stuck@example.com")
+    retried = add_confirmation(db, "retried@example.com")
+    stuck.status = retried.status = "sending"
+    stuck.attempts, retried.attempts = 8, 3
+    db.commit()
+
+    claimed = asyncio.run(repository_outbox.claim_emails(10, 300, 8, db))
+
+    assert [(email.recipient, email.attempts) for email in claimed] == [("retried@example.com", 4)]
+    assert stuck.status == "failed" and stuck.attempts == 8
+    assert "Gave up after 8 attempts" in stuck.last_error
+    assert retried.status == "sending"
+
+
+def test_batch_statements_do_not_grow_with_batch_size(db, smtp_server):
+    handler, controller = smtp_server()
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def batch_statements(recipients: list[str]) -> int:
+        for recipient in recipients:
+            add_confirmation(db, recipient)
+        db.commit()
+        statements.clear()
+        run_batch(db, controller)
+        return len(statements)
+
+    event.listen(db.get_bind(), "after_cursor_execute", on_execute)
+    try:
+        one = batch_statements(["one@example.com"])
+        many = batch_statements([f"user{i}@example.com" for i in range(4)] + ["bounce@example.com"])
+    finally:
+        event.remove(db.get_bind(), "after_cursor_execute", on_execute)
+
+    assert len(handler.messages) == 5
+    assert one == 3  # SELECT, UPDATE sending, UPDATE sent
+    assert many == one + 1  # і один UPDATE для невдалих, а не запити на кожен лист
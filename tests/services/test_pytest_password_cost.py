@@ -0,0 +1,14 @@
+from src.services.password_cost import calibrate
+
+
+def test_calibrate_stops_at_max_rounds():
+    rounds, elapsed = calibrate(target=10, min_rounds=4, max_rounds=5, samples=1)
+
+    assert rounds == 5
+    assert 0 < elapsed < 10
+
+
+def test_calibrate_never_goes_below_min_rounds():
+    rounds, _ = calibrate(target=0, min_rounds=4, max_rounds=8, samples=1)
+
+    assert rounds == 4
@@ -0,0 +1,155 @@
+import asyncio
+
+import fakeredis
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from src.conf.config import settings
+from src.services import rate_limit
+from src.services.rate_limit import RateLimitBackend, TokenBucketLimiter, client_ip
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def wall_clock():
+    return Clock(1_700_000_000.0)  # початок 10-секундного вікна Redis
+
+
+def make_backend(clock, wall_clock, overshoot: int = 5, redis=None) -> RateLimitBackend:
+    backend = RateLimitBackend(overshoot=overshoot, sync_interval=1.0, clock=clock, wall_clock=wall_clock)
+    backend.redis = redis
+    return backend
+
+
+def make_request(peer: str = "203.0.113.7", forwarded: str | None = None, path: str = "/api/contacts") -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "path": path, "headers": headers, "client": (peer, 1234)})
+
+
+def test_bucket_refills_over_time(clock, wall_clock):
+    backend = make_backend(clock, wall_clock)
+
+    assert backend.hit("k", times=2, seconds=10) == 0
+    assert backend.hit("k", times=2, seconds=10) == 0
+    assert backend.hit("k", times=2, seconds=10) == pytest.approx(5.0)  # один токен на 5 секунд
+
+    clock.now += 5
+    assert backend.hit("k", times=2, seconds=10) == 0
+    assert backend.hit("k", times=2, seconds=10) == pytest.approx(5.0)
+
+
+def test_burst_adds_to_capacity(clock, wall_clock):
+    backend = make_backend(clock, wall_clock)
+
+    assert [backend.hit("k", times=2, seconds=10, burst=3) for _ in range(6)][:5] == [0] * 5
+    assert backend.hit("k", times=2, seconds=10, burst=3) > 0
+
+    clock.now += 1000  # повне поповнення - не більше times + burst
+    assert sum(backend.hit("k", times=2, seconds=10, burst=3) == 0 for _ in range(10)) == 5
+
+
+def test_sync_reports_hits_to_window_counter(clock, wall_clock):
+    redis = fakeredis.FakeAsyncRedis()
+    backend = make_backend(clock, wall_clock, redis=redis)
+    for _ in range(3):
+        backend.hit("k", times=10, seconds=10)
+
+    asyncio.run(backend.sync())
+
+    key = f"rate_limit:k:{int(wall_clock.now // 10)}"
+    assert asyncio.run(redis.get(key)) == b"3"
+    assert 0 < asyncio.run(redis.ttl(key)) <= 10
+    assert backend.buckets["k"].pending == 0
+    assert backend.buckets["k"].count == 3
+
+
+def test_workers_overshoot_at_most_overshoot_each(clock, wall_clock):
+    redis = fakeredis.FakeAsyncRedis()
+    overshoot, workers = 3, [make_backend(clock, wall_clock, overshoot=3, redis=redis) for _ in range(2)]
+    allowed = 0
+
+    async def run():
+        nonlocal allowed
+        for _ in range(100):
+            for worker in workers:
+                if worker.hit("k", times=10, seconds=10) == 0:
+                    allowed += 1
+                if worker.flush_event.is_set():  # так реагує фонова задача sync_loop
+                    worker.flush_event.clear()
+                    await worker.sync()
+
+    asyncio.run(run())
+
+    assert 10 <= allowed <= 10 + overshoot * len(workers)
+    for worker in workers:
+        assert worker.hit("k", times=10, seconds=10) > 0
+    assert any(worker.buckets["k"].blocked_until == pytest.approx(clock.now + 10) for worker in workers)
+
+    wall_clock.now += 10
+    clock.now += 10
+    assert workers[0].hit("k", times=10, seconds=10) == 0
+
+
+def test_redis_error_keeps_pending_hits(clock, wall_clock):
+    class BrokenRedis(fakeredis.FakeAsyncRedis):
+        def pipeline(self, transaction=True):
+            pipe = super().pipeline(transaction)
+
+            async def execute(*args, **kwargs):
+                raise rate_limit.RedisError("down")
+
+            pipe.execute = execute
+            return pipe
+
+    backend = make_backend(clock, wall_clock, redis=BrokenRedis())
+    backend.hit("k", times=10, seconds=10)
+
+    asyncio.run(backend.sync())
+
+    assert backend.buckets["k"].pending == 1  # відправимо наступного разу
+
+
+def test_limiter_without_overshoot_checks_redis(monkeypatch, clock, wall_clock):
+    redis = fakeredis.FakeAsyncRedis()
+    other_worker = make_backend(clock, wall_clock, overshoot=0, redis=redis)
+    backend = make_backend(clock, wall_clock, overshoot=0, redis=redis)
+    monkeypatch.setattr(rate_limit, "rate_limit_backend", backend)
+    limiter = TokenBucketLimiter(times=2, seconds=10)
+    request = make_request()
+
+    for _ in range(2):  # інший воркер вичерпав ліміт ключа
+        other_worker.hit(rate_limit.client_identifier(request), times=2, seconds=10)
+    asyncio.run(other_worker.sync())
+
+    with pytest.raises(HTTPException) as err:
+        asyncio.run(limiter(request))
+    assert err.value.status_code == 429
+    assert err.value.headers["Retry-After"] == "10"
+
+
+def test_forwarded_for_ignored_without_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(settings, "trusted_proxies", [])
+
+    assert client_ip(make_request("203.0.113.7", "1.2.3.4")) == "203.0.113.7"
+
+
+def test_forwarded_for_takes_right_most_untrusted_hop(monkeypatch):
+    monkeypatch.setattr(settings, "trusted_proxies", ["10.0.0.0/8", "127.0.0.1"])
+
+    # лівіші адреси клієнт може підставити сам; справжня - та, яку дописав наш проксі
+    assert client_ip(make_request("10.0.0.2", "1.2.3.4, 198.51.100.9, 10.0.0.5")) == "198.51.100.9"
+    assert client_ip(make_request("10.0.0.2", "10.0.0.9")) == "10.0.0.9"
+    assert client_ip(make_request("198.51.100.1", "1.2.3.4")) == "198.51.100.1"  # не через наш проксі
@@ -0,0 +1,49 @@
+import asyncio
+
+from fakeredis import FakeAsyncRedis
+
+from src.services.revocation import REVOKED_CHANNEL, REVOKED_KEY, BloomFilter, RevocationList
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"jti{i}")
+
+    assert all(f"jti{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other{i}" in bloom for i in range(10000))
+    assert false_positives < 300  # ~1% очікувано
+
+
+def test_revocation_list_checks_redis_until_loaded():
+    revocation_list = RevocationList(capacity=100, error_rate=0.01, rebuild_interval=60)
+
+    assert revocation_list.might_contain("jti")
+
+
+def test_revocation_list_loads_and_follows_redis():
+    async def run():
+        redis = FakeAsyncRedis(decode_responses=True)
+        await redis.set(f"{REVOKED_KEY}old", 1)
+        revocation_list = RevocationList(capacity=100, error_rate=0.01, rebuild_interval=60)
+        await revocation_list.init(redis)
+        try:
+            for _ in range(100):
+                if revocation_list.ready:
+                    break
+                await asyncio.sleep(0.01)
+            assert revocation_list.might_contain("old")
+            assert not revocation_list.might_contain("fresh")
+
+            # інший воркер відкликав токен
+            await redis.publish(REVOKED_CHANNEL, "fresh")
+            for _ in range(100):
+                if "fresh" in revocation_list.bloom:
+                    break
+                await asyncio.sleep(0.01)
+            assert revocation_list.might_contain("fresh")
+        finally:
+            await revocation_list.close()
+        assert revocation_list.stats()["checks"] == 3
+
+    asyncio.run(run())
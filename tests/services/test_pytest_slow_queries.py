@@ -0,0 +1,109 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from src.database.slow_queries import SlowQueryLog, normalize, parameters_shape
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'slow.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE contacts (id INTEGER PRIMARY KEY, email VARCHAR, owner_id INTEGER)"))
+        conn.execute(text("CREATE INDEX ix_contacts_owner ON contacts (owner_id)"))
+    yield engine
+    engine.dispose()
+
+
+def test_normalize_replaces_literals_and_in_lists():
+    first = normalize("SELECT * FROM contacts\n  WHERE owner_id = 7 AND email = 'a@b.c' AND id IN (?, ?, ?)")
+    second = normalize("SELECT * FROM contacts WHERE owner_id = 12 AND email = 'x''y' AND id IN (?, ?)")
+
+    assert first == second == "SELECT * FROM contacts WHERE owner_id = ? AND email = ? AND id IN (?, ...)"
+    assert normalize("SELECT anon_1 FROM t WHERE a = %(a_1)s AND b = $2") == "SELECT anon_1 FROM t WHERE a = ? AND b = ?"
+
+
+def test_parameters_shape_hides_values():
+    assert parameters_shape(("secret@example.com", 3)) == ["str", "int"]
+    assert parameters_shape({"email": "secret@example.com"}) == {"email": "str"}
+    assert parameters_shape([(1, "a"), (2, "b")], executemany=True) == {"rows": 2, "row": ["int", "str"]}
+
+
+def test_slow_statements_are_recorded_with_plan(engine, caplog):
+    log = SlowQueryLog(threshold=0, explain_first=1)
+    log.attach(engine)
+
+    with engine.connect() as conn:
+        for owner_id in (1, 2):
+            conn.execute(text("SELECT * FROM contacts WHERE owner_id = :owner_id"), {"owner_id": owner_id})
+    log.join(timeout=5)
+
+    queries = log.snapshot()["queries"]
+    assert [query["parameters"] for query in queries] == [["int"], ["int"]]
+    assert queries[0]["normalized"] == "SELECT * FROM contacts WHERE owner_id = ?"
+    # EXPLAIN знімається лише для першого повтору; найновіший запис - перший у списку
+    assert queries[0]["plan"] is None
+    assert any("ix_contacts_owner" in line for line in queries[1]["plan"])
+    assert "Slow query" in caplog.text
+    assert log.snapshot()["recorded"] == 2  # сам EXPLAIN у журнал не потрапляє
+
+
+def test_explain_does_not_wait_for_the_measured_pool(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", pool_size=1, max_overflow=0, pool_timeout=0.1)
+    log = SlowQueryLog(threshold=0, explain_first=1)
+    log.attach(engine)
+
+    with engine.connect() as conn:  # єдине з'єднання пулу зайняте, поки знімається план
+        conn.execute(text("SELECT 1"))
+        log.join(timeout=5)
+    engine.dispose()
+
+    entry = log.snapshot()["queries"][0]
+    assert entry["plan"] is not None, entry.get("plan_error")
+
+
+def test_fast_and_unsampled_statements_are_skipped(engine):
+    fast = SlowQueryLog(threshold=60)
+    unsampled = SlowQueryLog(threshold=0, sample_rate=0)
+    fast.attach(engine)
+    unsampled.attach(engine)
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    assert fast.snapshot()["queries"] == unsampled.snapshot()["queries"] == []
+
+
+def test_failed_statement_does_not_break_timing(engine):
+    log = SlowQueryLog(threshold=0, explain_first=0)
+    log.attach(engine)
+
+    with engine.connect() as conn:
+        with pytest.raises(exc.OperationalError):
+            conn.execute(text("SELECT * FROM missing_table"))
+        conn.execute(text("SELECT 1"))
+        assert "slow_query_start" not in conn.info
+
+    assert [query["statement"] for query in log.snapshot()["queries"]] == ["SELECT 1"]
+
+
+def test_ring_buffer_keeps_last_entries(engine):
+    log = SlowQueryLog(threshold=0, explain_first=0, size=2)
+    log.attach(engine)
+
+    with engine.connect() as conn:
+        for i in range(5):
+            conn.execute(text(f"SELECT {i}"))
+
+    snapshot = log.snapshot()
+    assert snapshot["recorded"] == 5
+    assert [query["statement"] for query in snapshot["queries"]] == ["SELECT 4", "SELECT 3"]
+
+
+def test_explain_error_is_kept_in_entry(engine):
+    log = SlowQueryLog(threshold=0)
+    entry = {"plan": None}
+
+    log.explain(engine, entry, "SELECT * FROM missing_table", ())
+
+    assert entry["plan"] is None
+    assert "missing_table" in entry["plan_error"]